@@ -8,6 +8,7 @@ from opik import opik_context
 from smolagents import LiteLLMModel, MessageRole, MultiStepAgent, ToolCallingAgent
 
 from second_brain_online.config import settings
+from agents_online import http_pool
 
 from .tools import (
     PineconeRetrieverTool,
@@ -20,6 +21,14 @@ from .tools import (
 )
 
 
+def _trace_context(traceparent: str | None) -> dict:
+    """Caller's trace and span ids from a W3C traceparent, for the Opik trace metadata."""
+    parts = (traceparent or "").strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return {}
+    return {"trace_id": parts[1], "parent_span_id": parts[2]}
+
+
 def get_agent(retriever_config_path: Path) -> "AgentWrapper":
     # Validate the config file exists
     if not retriever_config_path.exists():
@@ -149,6 +158,8 @@ class AgentWrapper:
 
     """
 
+        # Groq calls reuse the connections of the other tools
+        http_pool.configure_litellm()
         model = LiteLLMModel(
             model_id="groq/meta-llama/llama-4-scout-17b-16e-instruct",
             #api_base=settings.OPENROUTER_BASE_URL,
@@ -167,7 +178,7 @@ class AgentWrapper:
         return cls(agent)
 
     @opik.track(name="Agent.run")
-    def run(self, task: str, **kwargs) -> Any:
+    def run(self, task: str, traceparent: str | None = None, **kwargs) -> Any:
         # Add safety check for medical questions
         medical_keywords = ["diagnose", "prescription", "medical condition", "disease", "symptom"]
         if any(keyword in task.lower() for keyword in medical_keywords):
@@ -188,6 +199,9 @@ class AgentWrapper:
         }
         if hasattr(self.__agent, "step_number"):
             metadata["step_number"] = self.__agent.step_number
+        metadata["outbound_http"] = http_pool.stats()
+        # Links this run to the chat API request that invoked it, if any
+        metadata.update(_trace_context(traceparent or os.environ.get("TRACEPARENT")))
         opik_context.update_current_trace(
             tags=["agent"],
             metadata=metadata,
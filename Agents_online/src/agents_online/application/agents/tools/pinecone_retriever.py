@@ -7,7 +7,9 @@ from loguru import logger
 from opik import opik_context, track
 from smolagents import Tool
 
-from pinecone import Pinecone, ServerlessSpec
+from pinecone import ServerlessSpec
+
+from agents_online import http_pool
 
 class PineconeRetrieverTool(Tool):
     name = "pinecone_vector_search_retriever"
@@ -25,9 +27,9 @@ class PineconeRetrieverTool(Tool):
         super().__init__(**kwargs)
         config = yaml.safe_load(config_path.read_text())["parameters"]
         
-        # Initialize Pinecone with new API
+        # Initialize Pinecone with new API, sharing the client across tools
         pinecone_api_key = os.getenv("PINECONE_API_KEY", config.get("pinecone_api_key"))
-        self.pc = Pinecone(api_key=pinecone_api_key)
+        self.pc = http_pool.pinecone_client(pinecone_api_key)
         
         self.index_name = config["pinecone_index_name"]
         self.namespace = config.get("pinecone_namespace", "__default__")
@@ -4,6 +4,8 @@ import google.generativeai as genai
 import os
 from openai import OpenAI
 
+from agents_online import http_pool
+
 
 class GeminiSummarizerTool(Tool):
     name = "gemini_summarizer"
@@ -33,7 +35,7 @@ Respond only with the summary.
         if not api_key:
             raise ValueError("Google AI API key must be provided or set in GEMINI_API_KEY env var")
         
-        genai.configure(api_key=api_key)
+        http_pool.configure_gemini(api_key)
         
         # Initialize model with generation config
         self.model = genai.GenerativeModel(
@@ -97,10 +99,11 @@ Respond only with the summary.
         if not api_key:
             raise ValueError("OpenRouter API key must be provided or set in OPENROUTER_API_KEY env var")
         
-        # Initialize OpenRouter client for DeepSeek
+        # Initialize OpenRouter client for DeepSeek on the shared connection pool
         self.client = OpenAI(
             base_url="https://openrouter.ai/api/v1",
-            api_key=api_key
+            api_key=api_key,
+            http_client=http_pool.client()
         )
         
         # Store model configuration
@@ -83,6 +83,32 @@ class Settings(BaseSettings):
         description="Groq for tool calling agent.",
     )
 
+    # --- Outbound HTTP (shared by the model and vector-store clients) ---
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = Field(
+        default=20,
+        description="Maximum concurrent connections to any one host.",
+    )
+    HTTP_MAX_KEEPALIVE_PER_HOST: int = Field(
+        default=10,
+        description="Idle connections kept open per host for reuse.",
+    )
+    HTTP_KEEPALIVE_EXPIRY: float = Field(
+        default=60.0,
+        description="Seconds an idle connection is kept before closing.",
+    )
+    HTTP_CONNECT_TIMEOUT: float = Field(
+        default=5.0,
+        description="Seconds allowed to establish a connection.",
+    )
+    HTTP_TIMEOUT: float = Field(
+        default=120.0,
+        description="Seconds allowed for reads, writes and waiting for a pooled connection.",
+    )
+    HTTP2_ENABLED: bool = Field(
+        default=True,
+        description="Use HTTP/2 where the server supports it (requires the h2 package).",
+    )
+
     # --- Application Settings ---
     MAX_AGENT_STEPS: int = Field(
         default=10,
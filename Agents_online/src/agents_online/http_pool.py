@@ -0,0 +1,158 @@
+"""Shared outbound connections for the agent's model and vector-store clients.
+
+The agent, the summarizers and the retriever each used to build their own
+client, each with its own keep-alive pool, so a run paid for a fresh TLS
+handshake per integration. Here they share one ``httpx.Client``:
+
+- one connection pool per host, bounded by ``HTTP_MAX_CONNECTIONS_PER_HOST``;
+- HTTP/2 when the optional ``h2`` package is installed;
+- the same timeouts for every call.
+
+It is handed to the OpenAI SDK (DeepSeek via OpenRouter) and to LiteLLM
+(the Groq agent model). Gemini's SDK talks gRPC over a single multiplexed
+HTTP/2 channel, and Pinecone keeps its own urllib3 pool. Those two can't
+take an httpx client, so this module configures each of them once per
+process and shares the instance. Requests are counted per host, split into
+ones that opened a connection and ones that reused one; see ``stats()``.
+"""
+
+import threading
+from collections import defaultdict
+
+import httpx
+from loguru import logger
+
+from agents_online.config import settings
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+_lock = threading.Lock()
+_client: httpx.Client | None = None
+_counts: dict[str, dict[str, int]] = defaultdict(
+    lambda: {"requests": 0, "new_connections": 0, "errors": 0}
+)
+_gemini_key: str | None = None
+_pinecone: dict[str, object] = {}
+
+
+class _PerHostTransport(httpx.BaseTransport):
+    """Routes each request to a connection pool of its own host and counts reuse."""
+
+    def __init__(self, limits: httpx.Limits, http2: bool) -> None:
+        self.limits = limits
+        self.http2 = http2
+        self._pools: dict[tuple, httpx.HTTPTransport] = {}
+
+    def _pool(self, url: httpx.URL) -> httpx.HTTPTransport:
+        key = (url.raw_scheme, url.raw_host, url.port)
+        with _lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = httpx.HTTPTransport(
+                    limits=self.limits, http2=self.http2
+                )
+        return pool
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        opened = False
+        outer_trace = request.extensions.get("trace")
+
+        def trace(event: str, info: dict) -> None:
+            nonlocal opened
+            if event == "connection.connect_tcp.complete":
+                opened = True
+            if outer_trace is not None:
+                outer_trace(event, info)
+
+        request.extensions["trace"] = trace
+        failed = False
+        try:
+            return self._pool(request.url).handle_request(request)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with _lock:
+                counts = _counts[request.url.host]
+                counts["requests"] += 1
+                counts["new_connections"] += opened
+                counts["errors"] += failed
+
+    def close(self) -> None:
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+
+
+def client() -> httpx.Client:
+    """The process-wide outbound client, created on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            limits = httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_PER_HOST,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            )
+            http2 = settings.HTTP2_ENABLED and h2 is not None
+            _client = httpx.Client(
+                transport=_PerHostTransport(limits, http2),
+                timeout=httpx.Timeout(
+                    settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT
+                ),
+            )
+            logger.debug(f"Outbound HTTP pool created (http2={http2})")
+        return _client
+
+
+def configure_litellm() -> None:
+    """Send LiteLLM's provider calls (e.g. Groq) through the shared client."""
+    import litellm
+
+    litellm.client_session = client()
+
+
+def configure_gemini(api_key: str) -> None:
+    """Configure the Gemini SDK once per process instead of once per tool."""
+    global _gemini_key
+    import google.generativeai as genai
+
+    with _lock:
+        if _gemini_key != api_key:
+            genai.configure(api_key=api_key)
+            _gemini_key = api_key
+
+
+def pinecone_client(api_key: str):
+    """One Pinecone client, and so one connection pool, per API key."""
+    from pinecone import Pinecone
+
+    with _lock:
+        if api_key not in _pinecone:
+            _pinecone[api_key] = Pinecone(api_key=api_key)
+        return _pinecone[api_key]
+
+
+def stats() -> dict:
+    """Per-host request counts and how many of them reused a pooled connection."""
+    with _lock:
+        return {
+            host: {
+                **counts,
+                "reuse_ratio": 1 - counts["new_connections"] / counts["requests"]
+                if counts["requests"]
+                else 0.0,
+            }
+            for host, counts in _counts.items()
+        }
+
+
+def close() -> None:
+    global _client
+    with _lock:
+        current, _client = _client, None
+    if current is not None:
+        current.close()
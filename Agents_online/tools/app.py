@@ -52,12 +52,20 @@ EXAMPLE_QUERIES = {
     default=False,
     help="Show detailed agent reasoning",
 )
+@click.option(
+    "--traceparent",
+    envvar="TRACEPARENT",
+    type=str,
+    default=None,
+    help="W3C traceparent of the calling request, recorded on the agent trace",
+)
 def main(
     retriever_config_path: Path,
     ui: bool, 
     query: str, 
     example: str,
-    verbose: bool
+    verbose: bool,
+    traceparent: str
 ) -> None:
     """Run the Fitness AI Assistant in Gradio UI or CLI mode.
     
@@ -100,7 +108,7 @@ def main(
                 agent.agent.verbosity_level = 2
             
             logger.info("Processing query...")
-            result = agent.run(query)
+            result = agent.run(query, traceparent=traceparent)
             
             # Format and display result
             click.echo("\n🤖 Fitness AI Assistant Response:")
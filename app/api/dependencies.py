@@ -1,12 +1,17 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.core.security import verify_token
+from app.core.security import verify_token_cached
+from app.core.tracing import span
+from app.services.rate_limiter import rate_limiter, RateLimitDecision
+from typing import Optional
+import hashlib
 
 security = HTTPBearer()
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
-    payload = verify_token(token)
+    with span("auth.jwt"):
+        payload = verify_token_cached(token)
     
     if not payload:
         raise HTTPException(
@@ -14,4 +19,39 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid or expired token"
         )
     
-    return payload
\ No newline at end of file
+    return payload
+
+def rate_limit_identity(payload: dict, token: str) -> str:
+    """Rate limit key of a caller: the token's ``sub`` claim, or the token itself"""
+    identity = payload.get("sub")
+    if identity is None:
+        return "token:" + hashlib.sha256(token.encode()).hexdigest()
+    return str(identity)
+
+def rate_limit(route: str):
+    """Dependency taking one token from the caller's ``route`` bucket.
+    
+    Callers are keyed by the token's ``sub`` claim, or by the token itself
+    when it has none. Sets the X-RateLimit-* headers and raises 429 with
+    Retry-After once the bucket is empty. Returns the decision (None when
+    the route is unlimited) for endpoints that build their own Response.
+    """
+    async def check_rate_limit(
+        response: Response,
+        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user: dict = Depends(get_current_user)
+    ) -> Optional[RateLimitDecision]:
+        identity = rate_limit_identity(current_user, credentials.credentials)
+        decision = await rate_limiter.check(route, identity)
+        if decision is None:
+            return None
+        if not decision.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers=decision.headers()
+            )
+        response.headers.update(decision.headers())
+        return decision
+    
+    return check_rate_limit
\ No newline at end of file
@@ -1,122 +1,557 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, status
+from pydantic import ValidationError
 from app.schemas.chat import (
     MessageRequest, 
     MessageResponse, 
     EndSessionRequest, 
     EndSessionResponse,
-    MessageRole
+    MessageRole,
+    UserInfo
 )
-from app.api.dependencies import get_current_user
-from app.services.session_service import session_service
-from app.services.gemini_service import gemini_service
-from typing import Optional
+from app.api.dependencies import get_current_user, rate_limit, rate_limit_identity
+from app.api.websocket import CloseConnection, FrameSocket
+from app.core.security import verify_token_cached
+from app.services.rate_limiter import RateLimitDecision, rate_limiter
+from app.services.admission import (
+    AdmissionRejected,
+    DEADLINE_HEADER,
+    PRIORITY_HEADER,
+    LANE_INTERACTIVE,
+    parse_deadline,
+    parse_lane
+)
+from app.services.session_service import session_service, SessionTurn, InvalidCursorError
+from app.services.gemini_service import gemini_service, StreamInterrupted
+from app.services.session_lock import session_locks, SessionLease, SessionBusyError, POLICY_QUEUE
+from app.db.redis import FencingError
+from app.core.config import settings
+from app.core.metrics import CLIENT_CANCELLED, WS_CLOSED
+from fastapi.responses import StreamingResponse
+from typing import Awaitable, Dict, Optional, Tuple, TypeVar
+import anyio
+import asyncio
+import json
+import math
+import time
 
 router = APIRouter()
 
-@router.post("/message", response_model=MessageResponse)
+T = TypeVar("T")
+
+# Non-standard "Client Closed Request"; only ever seen in logs and metrics
+CLIENT_CLOSED_REQUEST = 499
+
+_MESSAGE_CANCELLED = CLIENT_CANCELLED.labels("message")
+_STREAM_CANCELLED = CLIENT_CANCELLED.labels("stream")
+_SOCKET_CANCELLED = CLIENT_CANCELLED.labels("ws")
+_SOCKET_REJECTED = WS_CLOSED.labels("unauthorized")
+
+class ClientDisconnected(Exception):
+    pass
+
+async def _wait_for_disconnect(http_request: Request):
+    # The body has been read, so the next message is the disconnect
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+
+async def _unless_disconnected(http_request: Request, work: Awaitable[T]) -> T:
+    """Await ``work``, cancelling it and raising ``ClientDisconnected`` if the client goes away first"""
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(http_request))
+    try:
+        await asyncio.wait((task, watcher), return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    if not task.done():
+        task.cancel()
+    try:
+        return await task
+    except asyncio.CancelledError:
+        raise ClientDisconnected() from None
+
+def _session_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Another message is being processed for this session"
+    )
+
+# Sent when the provider fails mid-reply; what arrived is stored as partial
+_REPLY_CUT_SHORT = "The reply was cut short, please retry"
+
+def _session_gone() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_410_GONE,
+        detail="Session has ended"
+    )
+
+def _overloaded(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The assistant is overloaded, please retry shortly",
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+    )
+
+def _admission(http_request: Request) -> Tuple[str, Optional[float]]:
+    """Priority lane and deadline the client asked for, then shed early if hopeless"""
+    lane = parse_lane(http_request.headers.get(PRIORITY_HEADER))
+    deadline = parse_deadline(http_request.headers.get(DEADLINE_HEADER))
+    gemini_service.admission.check(lane, deadline)
+    return lane, deadline
+
+def _check_session(session: Optional[Dict], user_id: Optional[str]):
+    """Raise unless ``session`` exists, is still active and belongs to ``user_id`` (when given)"""
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    if session.get("status") == "ended":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Session has already ended"
+        )
+    
+    # Verify session belongs to the user
+    if session.get("user_id") != user_id and user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Session does not belong to this user"
+        )
+
+async def _open_turn(request: MessageRequest, lease: Optional[SessionLease] = None) -> SessionTurn:
+    """Load and validate the request's session, or stage a new one"""
+    # Get or create session
+    if request.session_id:
+        # Load session metadata and recent history in one round trip
+        turn = await session_service.load_turn(
+            request.session_id,
+            fence=lease.token if lease else None
+        )
+        _check_session(turn.session if turn else None, request.user_id)
+    else:
+        # Create new session - user_id is required
+        if not request.user_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="user_id is required when creating a new session"
+            )
+        turn = session_service.new_turn(
+            user_id=request.user_id,
+            user_info=request.user
+        )
+    return turn
+
+@router.post("/message", response_model=MessageResponse, dependencies=[Depends(rate_limit("message"))])
 async def send_message(
     request: MessageRequest,
+    response: Response,
+    http_request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """Send a message to the AI chat"""
     try:
-        # Get or create session
+        lane, deadline = _admission(http_request)
         if request.session_id:
-            # Verify session exists
-            session = await session_service.get_session(request.session_id)
-            if not session:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Session not found"
-                )
-            if session.get("status") == "ended":
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Session has already ended"
-                )
-            session_id = request.session_id
-            
-            # Verify session belongs to the user
-            if session.get("user_id") != request.user_id and request.user_id:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Session does not belong to this user"
-                )
+            # Identical requests already in flight share one turn (coalesce policy)
+            key = (request.session_id, request.user_id, request.message)
+            work = session_locks.coalesce(key, lambda: _run_turn(request, lane, deadline))
         else:
-            # Create new session - user_id is required
-            if not request.user_id:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="user_id is required when creating a new session"
-                )
-            session_id = await session_service.create_session(
-                user_id=request.user_id,
-                user_info=request.user
-            )
+            work = _run_turn(request, lane, deadline)
+        # A client that hangs up gets nothing: the generation is cancelled
+        # and the turn is never committed
+        reply, cache_status = await _unless_disconnected(http_request, work)
+        response.headers["X-Response-Cache"] = cache_status
+        return reply
         
-        # Add user message to session
-        await session_service.add_message(
-            session_id=session_id,
+    except ClientDisconnected:
+        _MESSAGE_CANCELLED.inc()
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    except AdmissionRejected as e:
+        raise _overloaded(e)
+    except (SessionBusyError, FencingError):
+        raise _session_busy()
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in send_message: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while processing your message"
+        )
+
+async def _run_turn(
+    request: MessageRequest,
+    lane: str = LANE_INTERACTIVE,
+    deadline: Optional[float] = None
+) -> Tuple[MessageResponse, str]:
+    """One full turn, holding the session lock from history load to commit"""
+    async with session_locks.hold(request.session_id) as lease:
+        turn = await _open_turn(request, lease)
+        
+        # Stage user message; it is written together with the AI response
+        turn.add_message(
             role=MessageRole.USER,
             content=request.message,
             user_info=request.user
         )
         
-        # Get conversation history
-        history = await session_service.get_conversation_history(session_id)
-        
-        # Generate AI response
-        ai_response = await gemini_service.generate_response(
+        # Generate AI response (history excludes the staged message)
+        history = await turn.load_history()
+        ai_response, cache_status = await gemini_service.generate_reply(
             message=request.message,
-            conversation_history=history[:-1],  # Exclude the current message
-            user_info=request.user
+            conversation_history=list(history),
+            user_info=request.user,
+            lane=lane,
+            deadline=deadline
         )
         
-        # Add AI response to session
-        await session_service.add_message(
-            session_id=session_id,
+        # Add AI response and commit the turn in one pipelined write
+        turn.add_message(
             role=MessageRole.ASSISTANT,
             content=ai_response
         )
+        if not await turn.commit():
+            raise _session_gone()
         
-        return MessageResponse(
-            reply=ai_response,
-            session_id=session_id
-        )
-        
+    return MessageResponse(reply=ai_response, session_id=turn.session_id), cache_status
+
+async def _finish_streamed_turn(
+    turn: SessionTurn,
+    parts: list,
+    interrupted: bool,
+    lease: Optional[SessionLease],
+    cancelled_metric=None
+) -> Optional[HTTPException]:
+    """Commit a streamed turn and free its session, even while being cancelled.
+
+    A reply cut short, by the client going away (counted in
+    ``cancelled_metric``) or by the provider failing, is kept, marked
+    partial; if nothing was generated the turn is dropped. Returns None
+    once the turn is stored, otherwise the error to report: the session
+    ended, the lock was lost (busy, as for ``send_message``), or the
+    write failed.
+    """
+    if interrupted:
+        if cancelled_metric:
+            cancelled_metric.inc()
+        if not parts:
+            turn.discard()
+    if parts:
+        turn.add_message(role=MessageRole.ASSISTANT, content="".join(parts), partial=interrupted)
+    with anyio.CancelScope(shield=True):
+        try:
+            error = None if await turn.commit() else _session_gone()
+        except FencingError:
+            error = _session_busy()
+        except Exception as e:
+            print(f"Error persisting streamed reply: {e}")
+            error = HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="An error occurred while processing your message"
+            )
+        if lease:
+            await lease.release()
+    return error
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Events frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+@router.post("/message/stream")
+async def stream_message(
+    request: MessageRequest,
+    http_request: Request,
+    current_user: dict = Depends(get_current_user),
+    rate: Optional[RateLimitDecision] = Depends(rate_limit("stream"))
+):
+    """Send a message and stream the AI reply as Server-Sent Events"""
+    lease = None
+    try:
+        lane, deadline = _admission(http_request)
+        # Held until the streamed reply is committed
+        lease = await session_locks.acquire(request.session_id) if request.session_id else None
+        turn = await _open_turn(request, lease)
+        history = list(await turn.load_history())
+    except AdmissionRejected as e:
+        raise _overloaded(e)
+    except (SessionBusyError, FencingError):
+        if lease:
+            await lease.release()
+        raise _session_busy()
     except HTTPException:
+        if lease:
+            await lease.release()
         raise
     except Exception as e:
-        print(f"Error in send_message: {e}")
+        if lease:
+            await lease.release()
+        print(f"Error in stream_message: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while processing your message"
         )
+    
+    turn.add_message(
+        role=MessageRole.USER,
+        content=request.message,
+        user_info=request.user
+    )
+    
+    async def event_stream():
+        parts = []
+        complete = disconnected = failed = False
+        error = None
+        try:
+            yield _sse({"session_id": turn.session_id}, event="session")
+            async for chunk in gemini_service.stream_response(
+                message=request.message,
+                conversation_history=history,
+                user_info=request.user,
+                lane=lane,
+                deadline=deadline
+            ):
+                parts.append(chunk)
+                yield _sse({"delta": chunk})
+            complete = True
+        except AdmissionRejected as e:
+            # Shed while queued, after the response had started; nothing is
+            # persisted for this turn.
+            turn.discard()
+            yield _sse(
+                {"detail": "The assistant is overloaded, please retry shortly", "retry_after": math.ceil(e.retry_after)},
+                event="error"
+            )
+        except StreamInterrupted:
+            failed = True
+        except (anyio.get_cancelled_exc_class(), GeneratorExit):
+            # The client disconnected: Starlette cancels the response, which
+            # tears down the generation (and frees its slot) with it
+            disconnected = not complete
+            raise
+        finally:
+            # Runs on completion and on client disconnect
+            error = await _finish_streamed_turn(
+                turn, parts, disconnected or failed, lease, _STREAM_CANCELLED if disconnected else None
+            )
+        # "done" is only sent once the whole reply is stored
+        if (complete or failed) and error is not None:
+            yield _sse({"detail": error.detail}, event="error")
+        elif complete:
+            yield _sse({"reply": "".join(parts), "session_id": turn.session_id}, event="done")
+        elif failed:
+            yield _sse({"detail": _REPLY_CUT_SHORT}, event="error")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            **(rate.headers() if rate else {})
+        }
+    )
+
+class _SocketChat:
+    """Chat state of one WebSocket connection.
+
+    The token is verified once at the handshake and a session's ownership
+    once when it is bound; the user's profile is kept and attached to each
+    message. Turns run one at a time in arrival order. Each still loads
+    the session history under the session lock, as other clients may
+    write to the same session in between.
+    """
+
+    def __init__(self, socket: FrameSocket, payload: Dict, identity: str):
+        self.socket = socket
+        self.identity = identity
+        self.expires_at = payload.get("exp")
+        self.user_id: Optional[str] = payload.get("sub")
+        self.session_id: Optional[str] = None
+        self.user: Optional[UserInfo] = None
+        self._inbox: asyncio.Queue = asyncio.Queue(settings.WS_MAX_PENDING_MESSAGES)
+
+    async def on_frame(self, frame: Dict):
+        if frame.get("type") not in ("bind", "message"):
+            await self._error(status.HTTP_400_BAD_REQUEST, "Unknown frame type")
+            return
+        try:
+            self._inbox.put_nowait(frame)
+        except asyncio.QueueFull:
+            await self._error(status.HTTP_429_TOO_MANY_REQUESTS, "Too many messages waiting for a reply")
+
+    async def run(self):
+        while True:
+            frame = await self._inbox.get()
+            try:
+                if self.expires_at is not None and time.time() >= self.expires_at:
+                    raise CloseConnection(status.WS_1008_POLICY_VIOLATION, "Token expired", "token_expired")
+                if frame["type"] == "bind":
+                    await self._bind(frame)
+                else:
+                    await self._turn(frame)
+            except CloseConnection:
+                raise
+            except HTTPException as e:
+                await self._http_error(e)
+            except ValidationError:
+                await self._error(status.HTTP_422_UNPROCESSABLE_ENTITY, "Invalid user profile")
+            except AdmissionRejected as e:
+                await self._http_error(_overloaded(e))
+            except (SessionBusyError, FencingError):
+                await self._http_error(_session_busy())
+            except Exception as e:
+                print(f"Error in chat socket: {e}")
+                await self._error(
+                    status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    "An error occurred while processing your message"
+                )
+
+    async def _bind(self, frame: Dict):
+        """Validate and remember the session (and profile) later messages go to"""
+        user_id = frame.get("user_id") or self.user_id
+        user = UserInfo.model_validate(frame["user"]) if frame.get("user") is not None else self.user
+        session_id = frame.get("session_id")
+        if session_id:
+            _check_session(await session_service.get_session(session_id), user_id)
+        self.session_id, self.user_id, self.user = session_id, user_id, user
+        await self.socket.send({"type": "bound", "session_id": session_id})
+
+    async def _turn(self, frame: Dict):
+        message = frame.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="message must be a non-empty string"
+            )
+        if frame.get("user") is not None:
+            self.user = UserInfo.model_validate(frame["user"])
+        if not self.session_id and not self.user_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="user_id is required when creating a new session"
+            )
+        # Same bucket as POST /chat/message
+        decision = await rate_limiter.check("message", self.identity)
+        if decision is not None and not decision.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers=decision.headers()
+            )
+        gemini_service.admission.check(LANE_INTERACTIVE)
+
+        lease = await session_locks.acquire(self.session_id) if self.session_id else None
+        try:
+            if self.session_id:
+                turn = await session_service.load_turn(self.session_id, fence=lease.token if lease else None)
+                # Ownership was checked at bind time; the session may have ended since
+                _check_session(turn.session if turn else None, None)
+            else:
+                turn = session_service.new_turn(user_id=self.user_id, user_info=self.user)
+            history = list(await turn.load_history())
+        except BaseException:
+            if lease:
+                await lease.release()
+            raise
+        turn.add_message(role=MessageRole.USER, content=message, user_info=self.user)
 
-@router.post("/end", response_model=EndSessionResponse)
+        parts = []
+        interrupted = failed = False
+        try:
+            await self.socket.send({"type": "session", "session_id": turn.session_id})
+            async for chunk in gemini_service.stream_response(
+                message=message,
+                conversation_history=history,
+                user_info=self.user
+            ):
+                parts.append(chunk)
+                await self.socket.send({"type": "delta", "delta": chunk})
+        except AdmissionRejected:
+            turn.discard()
+            raise
+        except StreamInterrupted:
+            failed = True
+        except (asyncio.CancelledError, CloseConnection):
+            # The client went away or stopped reading
+            interrupted = True
+            raise
+        finally:
+            error = await _finish_streamed_turn(
+                turn, parts, interrupted or failed, lease, _SOCKET_CANCELLED if interrupted else None
+            )
+        if error is not None:
+            raise error
+
+        # A new session stays bound once its first turn is stored
+        self.session_id = turn.session_id
+        if failed:
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=_REPLY_CUT_SHORT)
+        await self.socket.send({"type": "done", "reply": "".join(parts), "session_id": turn.session_id})
+
+    async def _error(self, status_code: int, detail: str, retry_after: Optional[str] = None):
+        frame = {"type": "error", "status": status_code, "detail": detail}
+        if retry_after is not None:
+            frame["retry_after"] = int(retry_after)
+        await self.socket.send(frame)
+
+    async def _http_error(self, e: HTTPException):
+        await self._error(e.status_code, e.detail, (e.headers or {}).get("Retry-After"))
+
+@router.websocket("/ws")
+async def chat_socket(websocket: WebSocket, token: Optional[str] = None):
+    """Chat over one long-lived connection, authenticated once at the handshake.
+
+    The token comes from the ``token`` query parameter (browsers can't set
+    headers on a WebSocket) or an ``Authorization: Bearer`` header.
+    """
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    payload = verify_token_cached(token) if token else None
+    if not payload:
+        _SOCKET_REJECTED.inc()
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid or expired token")
+        return
+
+    await websocket.accept()
+    socket = FrameSocket(websocket)
+    chat = _SocketChat(socket, payload, rate_limit_identity(payload, token))
+    await socket.serve(chat.on_frame, chat.run())
+
+@router.post("/end", response_model=EndSessionResponse, dependencies=[Depends(rate_limit("end"))])
 async def end_session(
     request: EndSessionRequest,
     current_user: dict = Depends(get_current_user)
 ):
     """End an ongoing session and trigger storage/cleanup"""
     try:
-        # Check if session exists
-        session = await session_service.get_session(request.session_id)
-        if not session:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Session not found"
-            )
-        
-        if session.get("status") == "ended":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Session has already ended"
+        # Wait for a turn in flight to commit, whatever the lock policy, so
+        # its messages are archived with the session
+        async with session_locks.hold(request.session_id, POLICY_QUEUE) as lease:
+            # Check if session exists
+            session = await session_service.get_session(request.session_id)
+            if not session:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Session not found"
+                )
+            
+            if session.get("status") == "ended":
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Session has already ended"
+                )
+            
+            # End the session
+            success = await session_service.end_session(
+                request.session_id,
+                fence=lease.token if lease else None
             )
         
-        # End the session
-        success = await session_service.end_session(request.session_id)
-        
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -125,6 +560,8 @@ async def end_session(
         
         return EndSessionResponse(status="ended")
         
+    except (SessionBusyError, FencingError):
+        raise _session_busy()
     except HTTPException:
         raise
     except Exception as e:
@@ -134,16 +571,32 @@ async def end_session(
             detail="An error occurred while ending the session"
         )
 
-@router.get("/sessions/{user_id}")
+@router.get("/sessions/{user_id}", dependencies=[Depends(rate_limit("sessions"))])
 async def get_user_sessions(
     user_id: str,
-    status: Optional[str] = None,
+    session_status: Optional[str] = Query(None, alias="status"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated session fields to return"),
+    include_messages: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get all sessions for a specific user"""
+    """Get a page of sessions for a specific user, newest first"""
     try:
-        sessions = await session_service.get_user_sessions(user_id, status)
-        return {"sessions": sessions, "count": len(sessions)}
+        sessions, next_cursor = await session_service.get_user_sessions(
+            user_id,
+            session_status,
+            limit=limit,
+            cursor=cursor,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+            include_messages=include_messages
+        )
+        return {"sessions": sessions, "count": len(sessions), "next_cursor": next_cursor}
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
     except Exception as e:
         print(f"Error getting user sessions: {e}")
         raise HTTPException(
@@ -1,39 +1,68 @@
-from fastapi import APIRouter
-from app.db.mongodb import mongodb
+from fastapi import APIRouter, Response, status
+from app.core.config import settings
 from app.db.redis import redis_client
+from app.services.circuit_breaker import OPEN
+from app.services.health_prober import UP, health_prober
+from app.services.gemini_service import gemini_service
+from app.services.response_cache import response_cache
+from app.services.session_lock import session_locks
+from app.services.rate_limiter import rate_limiter
+from app.core import security
+from app.core.tracing import trace_exporter
+from app.core.http_pool import http_pool
 
 router = APIRouter()
 
 @router.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health summary; dependency status comes from the background prober's last run"""
+    probes = health_prober.snapshot()
     health_status = {
         "status": "healthy",
         "services": {
             "api": "up",
-            "mongodb": "down",
-            "redis": "down"
-        }
+            **{name: probe["status"] for name, probe in probes.items()}
+        },
+        "probes": probes,
+        "llm": gemini_service.stats.snapshot(),
+        "llm_provider": gemini_service.provider.stats(),
+        "llm_circuit": gemini_service.breaker.stats(),
+        "admission": gemini_service.admission.snapshot(),
+        "token_cache": security.token_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "session_locks": session_locks.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "tracing": trace_exporter.stats(),
+        "outbound_http": http_pool.stats()
     }
     
-    # Check MongoDB
-    try:
-        if mongodb.client:
-            await mongodb.client.admin.command('ping')
-            health_status["services"]["mongodb"] = "up"
-    except:
-        pass
-    
-    # Check Redis
-    try:
-        if redis_client.redis:
-            await redis_client.redis.ping()
-            health_status["services"]["redis"] = "up"
-    except:
-        pass
+    if redis_client.cache:
+        health_status["session_cache"] = redis_client.cache.stats()
     
     # Set overall status
-    if any(status == "down" for status in health_status["services"].values()):
+    if any(state != UP for state in health_status["services"].values()):
         health_status["status"] = "degraded"
     
-    return health_status
\ No newline at end of file
+    return health_status
+
+@router.get("/health/live")
+async def liveness():
+    """Liveness: the worker is serving requests; dependencies are not consulted"""
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def readiness(response: Response):
+    """Readiness: every probed dependency is up and, unless disabled, the LLM circuit isn't open
+
+    A circuit past its cool-down reads half open, so an instance pulled from
+    the load balancer becomes ready again without waiting for a call.
+    """
+    checks = {name: health_prober.status(name) for name in health_prober.probes}
+    ready = all(state == UP for state in checks.values())
+    if settings.HEALTH_READY_REQUIRES_LLM:
+        circuit = gemini_service.breaker.state
+        checks["llm_circuit"] = circuit
+        ready = ready and circuit != OPEN
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "ready" if ready else "not_ready", "checks": checks}
\ No newline at end of file
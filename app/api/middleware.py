@@ -0,0 +1,79 @@
+import time
+from app.core import tracing
+from app.core.metrics import HTTP_REQUEST_SECONDS
+
+class MetricsMiddleware:
+    """Records end-to-end latency per route template, method and status.
+
+    Plain ASGI rather than ``BaseHTTPMiddleware`` so streamed responses are
+    timed to their last byte and no extra task is spawned per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Route templates keep label cardinality bounded
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(path, scope["method"], str(status_code)).observe(
+                time.perf_counter() - started
+            )
+
+class TracingMiddleware:
+    """Starts a trace per request and reports its spans in ``Server-Timing``.
+
+    The header lists the spans finished when the response starts; for a
+    streamed reply that covers setup only, the full breakdown is in the
+    exported trace.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        trace = tracing.start_trace(traceparent)
+
+        with tracing.span(f"HTTP {scope['method']}") as root:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    root.attributes["http.status_code"] = message["status"]
+                    timing = trace.server_timing()
+                    if timing:
+                        message["headers"] = list(message.get("headers", [])) + [
+                            (b"server-timing", timing.encode("latin-1"))
+                        ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    root.name = f"HTTP {scope['method']} {route.path}"
+        tracing.trace_exporter.submit(trace)
@@ -0,0 +1,139 @@
+"""Transport side of long-lived WebSocket connections.
+
+``FrameSocket`` exchanges JSON frames with one client. Outgoing frames go
+through a bounded queue drained by a single task: when the client reads
+slowly, producers wait for room instead of buffering without limit, and a
+client that stays stalled for ``send_timeout`` is disconnected. The server
+sends ``{"type": "ping"}`` every ``heartbeat_interval`` and closes
+connections it hasn't heard from for ``idle_timeout``; any frame, usually
+``{"type": "pong"}``, counts as a sign of life.
+"""
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import json
+import time
+from fastapi import WebSocket, WebSocketDisconnect, status
+from app.core.config import settings
+from app.core.metrics import WS_CLOSED
+
+_CLOSED_BY_CLIENT = WS_CLOSED.labels("client")
+_CLOSED_ERROR = WS_CLOSED.labels("error")
+
+class CloseConnection(Exception):
+    """Raised from connection handlers to close the socket with ``code``"""
+
+    def __init__(self, code: int, reason: str, metric_reason: str):
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+        self.metric_reason = metric_reason
+
+class SlowConsumerError(CloseConnection):
+    def __init__(self):
+        super().__init__(status.WS_1008_POLICY_VIOLATION, "Client is not reading frames", "slow_consumer")
+
+class HeartbeatTimeout(CloseConnection):
+    def __init__(self):
+        super().__init__(status.WS_1001_GOING_AWAY, "Heartbeat timeout", "heartbeat")
+
+class FrameSocket:
+    open_connections = 0
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int = settings.WS_SEND_QUEUE_SIZE,
+        send_timeout: float = settings.WS_SEND_TIMEOUT,
+        heartbeat_interval: float = settings.WS_HEARTBEAT_INTERVAL,
+        idle_timeout: float = settings.WS_IDLE_TIMEOUT
+    ):
+        self.websocket = websocket
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self._outbox: asyncio.Queue = asyncio.Queue(max_queue)
+        self.last_seen = time.monotonic()
+
+    async def send(self, frame: Dict):
+        """Queue a frame, waiting while the queue is full"""
+        try:
+            await asyncio.wait_for(self._outbox.put(frame), self.send_timeout)
+        except asyncio.TimeoutError:
+            raise SlowConsumerError() from None
+
+    def send_nowait(self, frame: Dict) -> bool:
+        """Queue a frame only if there is room; for frames that may be dropped"""
+        try:
+            self._outbox.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _send_loop(self):
+        while True:
+            frame = await self._outbox.get()
+            await self.websocket.send_text(json.dumps(frame))
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if time.monotonic() - self.last_seen > self.idle_timeout:
+                raise HeartbeatTimeout()
+            # A full queue means frames are flowing; skipping a ping is fine
+            self.send_nowait({"type": "ping"})
+
+    async def _receive_loop(self, on_frame: Callable[[Dict], Awaitable]):
+        while True:
+            text = await self.websocket.receive_text()
+            self.last_seen = time.monotonic()
+            try:
+                frame = json.loads(text)
+            except ValueError:
+                frame = None
+            if not isinstance(frame, dict):
+                await self.send({"type": "error", "status": 400, "detail": "Frames must be JSON objects"})
+                continue
+            if frame.get("type") == "ping":
+                await self.send({"type": "pong"})
+            elif frame.get("type") != "pong":
+                await on_frame(frame)
+
+    async def serve(self, on_frame: Callable[[Dict], Awaitable], worker: Optional[Awaitable] = None):
+        """Run the accepted connection until either side ends it.
+
+        ``on_frame`` gets every frame except pings and pongs and should
+        return quickly; long work belongs in ``worker``, which runs
+        alongside and is cancelled when the connection ends.
+        """
+        FrameSocket.open_connections += 1
+        tasks = [
+            asyncio.ensure_future(self._receive_loop(on_frame)),
+            asyncio.ensure_future(self._send_loop()),
+            asyncio.ensure_future(self._heartbeat()),
+        ]
+        if worker is not None:
+            tasks.append(asyncio.ensure_future(worker))
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            FrameSocket.open_connections -= 1
+
+        error = next(iter(done)).exception()
+        if isinstance(error, WebSocketDisconnect):
+            _CLOSED_BY_CLIENT.inc()
+            return
+        if isinstance(error, CloseConnection):
+            WS_CLOSED.labels(error.metric_reason).inc()
+            code, reason = error.code, error.reason
+        else:
+            _CLOSED_ERROR.inc()
+            print(f"Error in websocket connection: {error!r}")
+            code, reason = status.WS_1011_INTERNAL_ERROR, "Internal error"
+        try:
+            # A client that stopped reading may not take the close frame either
+            await asyncio.wait_for(self.websocket.close(code=code, reason=reason), self.send_timeout)
+        except Exception:
+            pass
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict
 
 class Settings(BaseSettings):
     # Server
@@ -12,15 +12,129 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
-    REDIS_TTL: int = 3600  # 1 hour in seconds
+    REDIS_TTL: int = 3600  # 1 hour in seconds; keep above SESSION_IDLE_TIMEOUT + SWEEP_INTERVAL
+    SESSION_CODEC: str = "json"  # json | orjson | msgpack
+    SESSION_COMPRESSION: str = "none"  # none | zlib | zstd
+    SESSION_COMPRESSION_THRESHOLD: int = 1024  # bytes; smaller payloads stay uncompressed
+    SESSION_CACHE_ENABLED: bool = False  # per-worker hot-session cache
+    SESSION_CACHE_MAX_ENTRIES: int = 10000
+    SESSION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    
+    # Chat
+    CHAT_HISTORY_WINDOW: int = 20  # messages fetched per history page
+    PROMPT_TOKEN_BUDGET: int = 3000  # estimated tokens per Gemini prompt
+    PROMPT_MAX_HISTORY_MESSAGES: int = 200  # hard cap on history read per turn
+    
+    # Per-session turn lock: queue | reject | coalesce | off
+    SESSION_LOCK_POLICY: str = "queue"
+    SESSION_LOCK_LEASE_SECONDS: float = 30.0  # renewed every third of this while held
+    SESSION_LOCK_WAIT_TIMEOUT: float = 30.0  # queued requests get 409 after this
+    SESSION_LOCK_MAX_HOLD: float = 300.0  # renewal stops after this, bounding a leaked lock
+    
+    # Archival of ended sessions to MongoDB
+    ARCHIVE_BATCH_SIZE: int = 100
+    ARCHIVE_FLUSH_INTERVAL: float = 2.0  # seconds between flushes
+    ARCHIVE_LEASE_SECONDS: float = 30.0  # claimed batch is retried after this
+    ARCHIVE_RETENTION_TTL: int = 86400  # ended sessions kept in Redis until archived
+    ARCHIVE_DRAIN_TIMEOUT: float = 10.0  # max shutdown time spent flushing
+    
+    # Idle sessions are ended and archived before their Redis TTL expires
+    SESSION_IDLE_TIMEOUT: float = 1800.0  # seconds without a message
+    SWEEP_INTERVAL: float = 60.0
+    SWEEP_BATCH_SIZE: int = 200
     
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    TOKEN_CACHE_SIZE: int = 10000  # verified tokens kept per worker; 0 disables
+    TOKEN_CACHE_MAX_TTL: float = 300.0  # seconds, also capped by the token's exp
+    
+    # Per-user token buckets, "<count>/<second|minute|hour|day>" per route
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMITS: Dict[str, str] = {
+        "message": "20/minute",
+        "stream": "20/minute",
+        "end": "30/minute",
+        "sessions": "60/minute",
+    }
+    RATE_LIMIT_LOCAL_FRACTION: float = 0.2  # share of a mostly-full bucket a worker may admit alone
+    RATE_LIMIT_LOCAL_SYNC_INTERVAL: float = 1.0  # seconds before local admissions are reconciled
     
     # Gemini API
     GEMINI_API_KEY: str
+    GEMINI_MAX_CONCURRENCY: int = 8  # concurrent generations per worker
+    GEMINI_EXECUTOR_WORKERS: int = 8  # threads running blocking SDK calls
+    GEMINI_MODEL: str = "gemini-2.0-flash"
+    
+    # LLM providers: gemini | openrouter | stub. With LLM_HEDGE_PROVIDER set, a
+    # request the primary hasn't started answering within its rolling p95
+    # time to first token is also sent there, and the first to answer wins.
+    LLM_PROVIDER: str = "gemini"
+    LLM_HEDGE_PROVIDER: Optional[str] = None
+    LLM_HEDGE_WINDOW: int = 200  # recent primary first-token times kept
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # below this, LLM_HEDGE_INITIAL_DELAY is used
+    LLM_HEDGE_INITIAL_DELAY: float = 2.0  # seconds
+    OPENROUTER_API_KEY: Optional[str] = None
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+    OPENROUTER_MODEL: str = "deepseek/deepseek-chat"
+    
+    # Per-call LLM time limit; a client's X-Request-Timeout can only lower it
+    LLM_TIMEOUT: float = 30.0
+    
+    # Circuit breaker around LLM calls: opens when, among the calls of the
+    # last LLM_BREAKER_WINDOW seconds, too many failed or were slow
+    LLM_BREAKER_WINDOW: float = 30.0
+    LLM_BREAKER_MIN_CALLS: int = 10
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 10.0  # to the first chunk when streaming
+    LLM_BREAKER_SLOW_CALL_RATE: float = 0.8
+    LLM_BREAKER_OPEN_SECONDS: float = 15.0  # fail fast this long before probing
+    LLM_BREAKER_HALF_OPEN_PROBES: int = 2
+    
+    # Admission control in front of generations; the concurrency limit adapts
+    # between ADMISSION_MIN_CONCURRENCY and GEMINI_MAX_CONCURRENCY
+    ADMISSION_MIN_CONCURRENCY: int = 1
+    ADMISSION_LATENCY_TARGET: float = 8.0  # seconds; slower generations shrink the limit
+    ADMISSION_MAX_QUEUE: int = 100  # waiting requests per worker before shedding
+    ADMISSION_MAX_QUEUE_TIME: float = 10.0  # seconds; also capped by the client's X-Request-Timeout
+    
+    # Response cache for near-identical opening turns (opt-in)
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_TTL: int = 3600  # seconds in Redis for small replies
+    RESPONSE_CACHE_MAX_HISTORY: int = 2  # prior messages allowed for a turn to be cached
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = 16 * 1024
+    RESPONSE_CACHE_LOCAL_MAX_BYTES: int = 4 * 1024 * 1024
+    RESPONSE_CACHE_LOCAL_TTL: float = 60.0
+    
+    # WebSocket chat (/chat/ws)
+    WS_HEARTBEAT_INTERVAL: float = 20.0  # seconds between server pings
+    WS_IDLE_TIMEOUT: float = 60.0  # closed when nothing was received for this long
+    WS_SEND_QUEUE_SIZE: int = 64  # frames buffered for a client that reads slowly
+    WS_SEND_TIMEOUT: float = 10.0  # a queue full for this long disconnects the client
+    WS_MAX_PENDING_MESSAGES: int = 4  # messages queued behind the one being answered
+    
+    # Dependencies are probed in the background; health endpoints read the results
+    HEALTH_PROBE_INTERVAL: float = 5.0  # seconds between probe rounds
+    HEALTH_PROBE_TIMEOUT: float = 1.0  # a probe not answered by then is down
+    HEALTH_STALE_AFTER: float = 15.0  # older results count as unknown
+    HEALTH_READY_REQUIRES_LLM: bool = True  # an open LLM circuit fails readiness
+    
+    # Shared pool for outbound HTTP (LLM providers, trace export)
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 20
+    HTTP_MAX_KEEPALIVE_PER_HOST: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0  # seconds an idle connection is kept
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_TIMEOUT: float = 60.0  # reads, writes and pool waits; calls may pass their own
+    HTTP2_ENABLED: bool = True  # only takes effect when the h2 package is installed
+    
+    # Tracing: Server-Timing on every response, sampled traces exported
+    TRACING_ENABLED: bool = True
+    TRACE_SAMPLE_RATE: float = 0.05  # an incoming sampled traceparent is always kept
+    TRACE_EXPORTER: str = "none"  # none | otlp | file
+    TRACE_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACE_FILE: str = "traces.jsonl"
+    TRACE_SERVICE_NAME: str = "chat-microservice"
     
     # App
     DEBUG: bool = True
@@ -0,0 +1,144 @@
+"""Shared pool of outbound HTTP connections.
+
+Every outbound HTTP call the service makes (LLM providers, trace export)
+goes through one ``httpx.AsyncClient``, so keep-alive connections, TLS
+sessions and resolved addresses are reused across integrations instead
+of each one holding its own pool. Each host gets its own connection pool,
+which bounds the connections per host, and HTTP/2 is negotiated when the
+optional ``h2`` package is installed. Requests are counted per host by
+whether they opened a new connection or reused a pooled one.
+"""
+from typing import Dict, Optional, Tuple
+import asyncio
+import time
+import httpx
+from app.core.config import settings
+from app.core.metrics import OUTBOUND_CONNECTIONS, OUTBOUND_SECONDS
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+NEW = "new"
+REUSED = "reused"
+
+class _HostCounts:
+    __slots__ = ("requests", "new_connections", "errors")
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.errors = 0
+
+class _PerHostTransport(httpx.AsyncBaseTransport):
+    """Routes each request to a connection pool of its own host"""
+
+    def __init__(self, limits: httpx.Limits, http2: bool):
+        self.limits = limits
+        self.http2 = http2
+        self._pools: Dict[Tuple[bytes, bytes, Optional[int]], httpx.AsyncHTTPTransport] = {}
+        self.hosts: Dict[str, _HostCounts] = {}
+
+    def _pool(self, url: httpx.URL) -> httpx.AsyncHTTPTransport:
+        key = (url.raw_scheme, url.raw_host, url.port)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+        return pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        counts = self.hosts.get(host)
+        if counts is None:
+            counts = self.hosts[host] = _HostCounts()
+        opened = False
+        outer_trace = request.extensions.get("trace")
+
+        async def trace(event: str, info: Dict):
+            nonlocal opened
+            if event == "connection.connect_tcp.complete":
+                opened = True
+            if outer_trace is not None:
+                await outer_trace(event, info)
+
+        request.extensions["trace"] = trace
+        started = time.perf_counter()
+        counts.requests += 1
+        try:
+            response = await self._pool(request.url).handle_async_request(request)
+        except Exception:
+            counts.errors += 1
+            raise
+        finally:
+            counts.new_connections += opened
+            OUTBOUND_CONNECTIONS.labels(host, NEW if opened else REUSED).inc()
+        OUTBOUND_SECONDS.labels(host).observe(time.perf_counter() - started)
+        return response
+
+    async def aclose(self):
+        pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            await pool.aclose()
+
+class HTTPPool:
+    """The process-wide outbound client.
+
+    ``max_connections_per_host`` bounds concurrent connections to any one
+    host; up to ``max_keepalive_per_host`` idle ones are kept open for
+    ``keepalive_expiry`` seconds. ``timeout`` applies to reads, writes and
+    waiting for a pooled connection; calls may pass their own.
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: int = settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_per_host: int = settings.HTTP_MAX_KEEPALIVE_PER_HOST,
+        keepalive_expiry: float = settings.HTTP_KEEPALIVE_EXPIRY,
+        connect_timeout: float = settings.HTTP_CONNECT_TIMEOUT,
+        timeout: float = settings.HTTP_TIMEOUT,
+        http2: bool = settings.HTTP2_ENABLED
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections_per_host,
+            max_keepalive_connections=max_keepalive_per_host,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2 and h2 is not None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._transport: Optional[_PerHostTransport] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared client, created on first use so it binds to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Connections can't outlive their loop; a new loop gets a fresh pool
+            self._transport = _PerHostTransport(self.limits, self.http2)
+            self._client = httpx.AsyncClient(transport=self._transport, timeout=self.timeout)
+            self._loop = loop
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = self._transport = self._loop = None
+
+    def stats(self) -> Dict:
+        hosts = self._transport.hosts if self._transport else {}
+        return {
+            "http2": self.http2,
+            "hosts": {
+                host: {
+                    "requests": counts.requests,
+                    "new_connections": counts.new_connections,
+                    "reuse_ratio": 1 - counts.new_connections / counts.requests if counts.requests else 0.0,
+                    "errors": counts.errors,
+                }
+                for host, counts in hosts.items()
+            },
+        }
+
+http_pool = HTTPPool()
@@ -0,0 +1,216 @@
+"""Minimal Prometheus metrics for the service.
+
+Observations happen on the event loop only, so children are plain
+counters with no locking; ``labels()`` results are cached and call sites
+bind them once at import time. ``render()`` produces the text exposition
+format served on ``/metrics``.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Sequence, Tuple
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans sub-millisecond Redis calls up to slow LLM generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        # Unlabelled metrics have a single child, bound up front
+        self._default = self.labels() if not self.labelnames and self.kind != "gauge" else None
+        _registry.append(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}_total{_label_str(self.labelnames, values)} {_format(child.value)}"
+            for values, child in self._children.items()
+        ]
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format(bound)
+                labels = _label_str(self.labelnames, values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_str(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+class GaugeFunc(_Metric):
+    """Gauge read at scrape time; ``fn`` returns {label values: value}"""
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        fn: Callable[[], Dict[Tuple[str, ...], float]],
+        labelnames: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+
+    def _samples(self) -> List[str]:
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Error reading gauge {self.name}: {e}")
+            return []
+        return [
+            f"{self.name}{_label_str(self.labelnames, labels)} {_format(value)}"
+            for labels, value in values.items()
+        ]
+
+def timed(child: _HistogramChild):
+    """Decorate a coroutine function to observe its duration in ``child``"""
+    def decorate(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Storage
+REDIS_OP_SECONDS = Histogram("redis_op_seconds", "Duration of RedisClient operations", ["method"])
+MONGO_OP_SECONDS = Histogram("mongo_op_seconds", "Duration of MongoDB operations", ["operation"])
+HEALTH_PROBE_SECONDS = Histogram("health_probe_seconds", "Duration of background dependency probes", ["dependency"])
+
+# LLM
+LLM_SECONDS = Histogram("llm_generation_seconds", "Duration of LLM generations", ["mode"])
+LLM_TTFT_SECONDS = Histogram("llm_time_to_first_token_seconds", "Time until the first streamed chunk")
+FALLBACK_REPLIES = Counter("llm_fallback_replies", "Turns answered with the fallback apology")
+LLM_HEDGES = Counter("llm_hedges", "Requests also sent to the secondary provider, by winner", ["winner"])
+CIRCUIT_TRANSITIONS = Counter("circuit_breaker_transitions", "Circuit breaker state changes", ["circuit", "state"])
+CIRCUIT_REJECTED = Counter("circuit_breaker_rejected", "Calls failed fast by an open circuit", ["circuit"])
+
+# HTTP
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "End-to-end request latency", ["route", "method", "status"]
+)
+CLIENT_CANCELLED = Counter(
+    "client_cancelled", "Requests abandoned because the client disconnected before the reply", ["route"]
+)
+WS_CLOSED = Counter("websocket_closed", "WebSocket connections ended, by reason", ["reason"])
+OUTBOUND_CONNECTIONS = Counter(
+    "outbound_http_requests", "Outbound HTTP requests by host, on a new or a reused connection", ["host", "connection"]
+)
+OUTBOUND_SECONDS = Histogram("outbound_http_seconds", "Time to response headers of outbound HTTP requests", ["host"])
+
+ERRORS = Counter("errors", "Errors by component", ["component"])
+SESSION_EVENTS = Counter("session_events", "Session lifecycle events", ["event"])
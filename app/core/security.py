@@ -1,6 +1,9 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict
 from jose import JWTError, jwt
+import hashlib
+import time
 from passlib.context import CryptContext
 from app.core.config import settings
 
@@ -21,4 +24,73 @@ def verify_token(token: str) -> dict:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+class TokenCache:
+    """Bounded LRU of verified token payloads, keyed by a digest of the token.
+
+    An entry never outlives the token's ``exp`` claim (nor ``max_ttl``
+    seconds), so an expired token always goes back through ``jwt.decode``
+    and is rejected there.
+    """
+
+    def __init__(self, max_size: int, max_ttl: float):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str, now: Optional[float] = None) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is not None:
+            payload, expires_at = entry
+            if (now or time.time()) < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(payload)
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, token: str, payload: dict, now: Optional[float] = None):
+        now = now or time.time()
+        expires_at = now + self.max_ttl
+        if "exp" in payload:
+            expires_at = min(expires_at, float(payload["exp"]))
+        if expires_at <= now:
+            return
+
+        key = self._key(token)
+        self._entries[key] = (dict(payload), expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_MAX_TTL)
+
+def verify_token_cached(token: str) -> Optional[dict]:
+    """verify_token, answered from ``token_cache`` when the token was seen before"""
+    if token_cache.max_size <= 0:
+        return verify_token(token)
+
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = verify_token(token)
+        if payload:
+            token_cache.put(token, payload)
+    return payload
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""Lightweight request tracing.
+
+Each HTTP request gets a trace (continued from an incoming W3C
+``traceparent`` header when there is one). Code marks stages with
+``span(name)`` or ``@traced(name)``; finished spans feed the response's
+``Server-Timing`` header, and sampled traces are exported in the
+background as OTLP/HTTP JSON or appended to a JSON-lines file.
+Outbound calls carry the trace on with ``inject(headers)``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional, Dict, List, Tuple
+import asyncio
+import json
+import os
+import random
+import time
+from app.core.config import settings
+from app.core.http_pool import http_pool
+
+TRACEPARENT_HEADER = "traceparent"
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Optional[Dict] = None):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.error = False
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+class Trace:
+    def __init__(self, trace_id: str, parent_id: Optional[str], sampled: bool):
+        self.trace_id = trace_id
+        # Span id of the caller's span when continued from a traceparent
+        self.remote_parent_id = parent_id
+        self.sampled = sampled
+        # First top-level span, normally the middleware's request span
+        self.root: Optional[Span] = None
+        self.spans: List[Span] = []
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` value for the spans finished so far, summed by name"""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            if span is not self.root:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        return ", ".join(f"{name.replace('.', '-')};dur={ms:.1f}" for name, ms in totals.items())
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace id, parent span id, sampled) from a W3C traceparent, or None if invalid"""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+def start_trace(traceparent: Optional[str] = None) -> Trace:
+    """Begin a trace for the current context, continuing ``traceparent`` if valid"""
+    parsed = parse_traceparent(traceparent)
+    if parsed:
+        trace_id, parent_id, sampled = parsed
+        # An upstream sampling decision wins so the whole path is kept together
+        sampled = sampled or random.random() < settings.TRACE_SAMPLE_RATE
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+        sampled = random.random() < settings.TRACE_SAMPLE_RATE
+    trace = Trace(trace_id, parent_id, sampled)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a stage of the current request; a no-op outside a trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(name, parent.span_id if parent else trace.remote_parent_id, attributes)
+    if parent is None and trace.root is None:
+        trace.root = current
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException:
+        current.error = True
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.spans.append(current)
+
+def traced(name: str):
+    """Decorate a coroutine function to run inside ``span(name)``"""
+    def decorate(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def inject(headers: Dict[str, str]) -> Dict[str, str]:
+    """Add the current trace's ``traceparent`` to outbound request headers"""
+    trace = _current_trace.get()
+    if trace is not None:
+        parent = _current_span.get()
+        span_id = parent.span_id if parent else (trace.remote_parent_id or os.urandom(8).hex())
+        headers[TRACEPARENT_HEADER] = f"00-{trace.trace_id}-{span_id}-{'01' if trace.sampled else '00'}"
+    return headers
+
+def _otlp_attributes(attributes: Dict) -> List[Dict]:
+    converted = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            converted.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            converted.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            converted.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            converted.append({"key": key, "value": {"stringValue": str(value)}})
+    return converted
+
+def to_otlp(traces: List[Trace]) -> Dict:
+    """OTLP/HTTP JSON body for a batch of traces"""
+    spans = []
+    for trace in traces:
+        for item in trace.spans:
+            entry = {
+                "traceId": trace.trace_id,
+                "spanId": item.span_id,
+                "name": item.name,
+                # SERVER for the request's root span, INTERNAL otherwise
+                "kind": 2 if item is trace.root else 1,
+                "startTimeUnixNano": str(item.start_ns),
+                "endTimeUnixNano": str(item.end_ns),
+                "attributes": _otlp_attributes(item.attributes),
+                "status": {"code": 2 if item.error else 1},
+            }
+            if item.parent_id:
+                entry["parentSpanId"] = item.parent_id
+            spans.append(entry)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": settings.TRACE_SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+        }]
+    }
+
+class TraceExporter:
+    """Ships sampled traces in batches off the request path.
+
+    ``exporter`` is "otlp" (POST to ``endpoint``), "file" (JSON lines at
+    ``path``) or "none". The queue is bounded: when the collector can't
+    keep up, traces are dropped rather than held in memory. A batch that
+    fails to export is not retried; it is counted in ``dropped``.
+    """
+
+    def __init__(
+        self,
+        exporter: str = settings.TRACE_EXPORTER,
+        endpoint: str = settings.TRACE_OTLP_ENDPOINT,
+        path: str = settings.TRACE_FILE,
+        max_queue: int = 1000,
+        batch_size: int = 100,
+        interval: float = 2.0
+    ):
+        if exporter not in ("none", "otlp", "file"):
+            raise ValueError(f"Unknown trace exporter '{exporter}'")
+        self.exporter = exporter
+        self.endpoint = endpoint
+        self.path = path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self._pending: List[Trace] = []
+        self._task: Optional[asyncio.Task] = None
+        self.exported = 0
+        self.dropped = 0
+
+    def start(self):
+        if self.exporter != "none":
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # Shutdown goes on without the collector
+            print(f"Error exporting traces: {e}")
+
+    def submit(self, trace: Trace):
+        if self.exporter == "none" or not trace.sampled:
+            return
+        if len(self._pending) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._pending.append(trace)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error exporting traces: {e}")
+
+    async def flush(self):
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            try:
+                if self.exporter == "otlp":
+                    await self._post(to_otlp(batch))
+                elif self.exporter == "file":
+                    await asyncio.to_thread(self._append, batch)
+            except Exception:
+                self.dropped += len(batch)
+                raise
+            self.exported += len(batch)
+
+    async def _post(self, body: Dict):
+        response = await http_pool.client.post(self.endpoint, json=body, timeout=5.0)
+        response.raise_for_status()
+
+    def _append(self, batch: List[Trace]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for trace in batch:
+                f.write(json.dumps(to_otlp([trace])) + "\n")
+
+    def stats(self) -> Dict:
+        return {
+            "exporter": self.exporter,
+            "pending": len(self._pending),
+            "exported": self.exported,
+            "dropped": self.dropped,
+        }
+
+trace_exporter = TraceExporter()
@@ -0,0 +1,106 @@
+"""Serialization of values stored in Redis.
+
+Every encoded payload starts with one header byte:
+
+    0b1ccc_ffff   c = compression (0 none, 1 zlib, 2 zstd), f = format
+
+The high bit is never set on the first byte of JSON text, so payloads
+written before codecs existed (plain JSON, or bare integers such as the
+version counter) are still recognised and decoded as JSON.
+"""
+from typing import Any
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+HEADER_FLAG = 0x80
+
+FORMATS = {"json": 1, "orjson": 2, "msgpack": 3}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+
+class CodecError(ValueError):
+    pass
+
+def _dumps(fmt: int, value: Any) -> bytes:
+    if fmt == 1:
+        return json.dumps(value, separators=(",", ":")).encode()
+    if fmt == 2:
+        return orjson.dumps(value)
+    return msgpack.packb(value, use_bin_type=True)
+
+def _loads(fmt: int, data: bytes) -> Any:
+    if fmt == 1:
+        return json.loads(data)
+    if fmt == 2:
+        return orjson.loads(data)
+    if fmt == 3:
+        return msgpack.unpackb(data, raw=False)
+    raise CodecError(f"Unknown payload format {fmt}")
+
+def _decompress(compression: int, data: bytes) -> bytes:
+    if compression == 0:
+        return data
+    if compression == 1:
+        return zlib.decompress(data)
+    if compression == 2:
+        if zstandard is None:
+            raise CodecError("zstd payload found but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise CodecError(f"Unknown payload compression {compression}")
+
+class Codec:
+    """Encodes values with one format, compressing those above a size threshold.
+
+    Decoding does not depend on the configuration: any format/compression
+    combination written by another codec (or older code) is readable.
+    """
+
+    def __init__(self, fmt: str = "json", compression: str = "none", compress_threshold: int = 1024):
+        if fmt not in FORMATS:
+            raise CodecError(f"Unknown codec format '{fmt}'")
+        if compression not in COMPRESSIONS:
+            raise CodecError(f"Unknown codec compression '{compression}'")
+        if fmt == "orjson" and orjson is None:
+            raise CodecError("SESSION_CODEC=orjson requires the orjson package")
+        if fmt == "msgpack" and msgpack is None:
+            raise CodecError("SESSION_CODEC=msgpack requires the msgpack package")
+        if compression == "zstd" and zstandard is None:
+            raise CodecError("SESSION_COMPRESSION=zstd requires the zstandard package")
+
+        self.name = fmt if compression == "none" else f"{fmt}+{compression}"
+        self._format = FORMATS[fmt]
+        self._compression = COMPRESSIONS[compression]
+        self._threshold = compress_threshold
+        self._zstd = zstandard.ZstdCompressor() if compression == "zstd" else None
+
+    def encode(self, value: Any) -> bytes:
+        body = _dumps(self._format, value)
+        compression = 0
+        if self._compression and len(body) >= self._threshold:
+            compression = self._compression
+            body = zlib.compress(body) if compression == 1 else self._zstd.compress(body)
+        return bytes((HEADER_FLAG | compression << 4 | self._format,)) + body
+
+    def decode(self, data: bytes) -> Any:
+        if isinstance(data, str):
+            data = data.encode()
+        if not data or not data[0] & HEADER_FLAG:
+            # Pre-codec payload: plain JSON text
+            return json.loads(data)
+        header = data[0]
+        body = _decompress((header >> 4) & 0x07, data[1:])
+        return _loads(header & 0x0F, body)
@@ -1,7 +1,10 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
 from app.core.config import settings
 from typing import Optional
 
+CHAT_SESSIONS_COLLECTION = "chat_sessions"
+
 class MongoDB:
     client: Optional[AsyncIOMotorClient] = None
     database = None
@@ -12,6 +15,21 @@ async def connect_to_mongo():
     mongodb.client = AsyncIOMotorClient(settings.MONGODB_URL)
     mongodb.database = mongodb.client[settings.MONGODB_DB_NAME]
     print("✅ Connected to MongoDB")
+    await ensure_indexes()
+
+async def ensure_indexes():
+    """Create the indexes for archival and keyset-paginated session listing"""
+    sessions = mongodb.database[CHAT_SESSIONS_COLLECTION]
+    # Makes archival retries idempotent
+    await sessions.create_index("session_id", unique=True, name="session_id_unique")
+    await sessions.create_index(
+        [("user_id", ASCENDING), ("status", ASCENDING), ("started_at", DESCENDING), ("_id", DESCENDING)],
+        name="user_status_started_at"
+    )
+    await sessions.create_index(
+        [("user_id", ASCENDING), ("started_at", DESCENDING), ("_id", DESCENDING)],
+        name="user_started_at"
+    )
 
 async def close_mongo_connection():
     if mongodb.client:
@@ -1,36 +1,641 @@
 import redis.asyncio as redis
+from redis.exceptions import WatchError
 from app.core.config import settings
+from app.db.session_cache import SessionCache, INVALIDATION_CHANNEL
+from app.db.codec import Codec
+from app.core.metrics import REDIS_OP_SECONDS, timed
+import asyncio
 import json
-from typing import Optional
+import time
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple
+
+# Fenced writes retried when the lock key changes under their WATCH
+FENCED_WRITE_ATTEMPTS = 3
+
+# Meta hash field incremented on every write; orders cache updates.
+# Also hard-coded in SWEEP_IDLE_SCRIPT.
+VERSION_FIELD = "_v"
+
+# Ended sessions waiting for archival, scored by when they may next be claimed
+ARCHIVE_QUEUE_KEY = "archive:pending"
+
+# Live sessions scored by last activity, read by the idle-session sweeper
+ACTIVITY_KEY = "sessions:activity"
+
+# Atomically take up to ARGV[2] sessions idle since ARGV[1], mark them ended
+# and move them to the archive queue. Being a single script, concurrent
+# sweepers on different nodes can never claim the same session. A session
+# whose lock is held has a turn in flight: it stays live, its activity
+# bumped to now, so the turn's messages are never archived away under it.
+SWEEP_IDLE_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+local swept = {}
+for _, id in ipairs(ids) do
+    local score = tonumber(redis.call('ZSCORE', KEYS[1], id))
+    local meta = 'session:' .. id .. ':meta'
+    if redis.call('EXISTS', 'session:' .. id .. ':lock') == 1 then
+        redis.call('ZADD', KEYS[1], ARGV[5], id)
+    elseif score and score <= tonumber(ARGV[1]) then
+        redis.call('ZREM', KEYS[1], id)
+        if redis.call('EXISTS', meta) == 1 then
+            redis.call('HSET', meta, 'status', '"ended"', 'ended_at', ARGV[3], 'end_reason', '"idle"')
+            redis.call('HINCRBY', meta, '_v', 1)
+            redis.call('EXPIRE', meta, ARGV[4])
+            redis.call('EXPIRE', 'session:' .. id .. ':messages', ARGV[4])
+            redis.call('ZADD', KEYS[2], ARGV[5], id)
+            redis.call('PUBLISH', ARGV[6], 'sweeper ' .. id)
+            table.insert(swept, id)
+        end
+    end
+end
+return swept
+"""
+
+# Claim up to ARGV[2] due ids and hide them for a lease (visibility timeout)
+CLAIM_ARCHIVE_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, id in ipairs(ids) do
+    redis.call('ZADD', KEYS[1], ARGV[3], id)
+end
+return ids
+"""
+
+# Take the per-session turn lock if it is free. The lock value is a fencing
+# token from a per-session counter, so a holder whose lease expired can be
+# told apart from the current one.
+ACQUIRE_LOCK_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return false
+end
+local token = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+redis.call('SET', KEYS[1], token, 'PX', ARGV[1])
+return token
+"""
+
+# Extend (ARGV[2] = lease in ms) or drop (no ARGV[2]) the lock if ARGV[1] still holds it
+RENEW_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if ARGV[2] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return redis.call('DEL', KEYS[1])
+"""
+
+# Token bucket in a hash {tokens, ts}: refill at ARGV[2]/s up to ARGV[1],
+# charge ARGV[4] tokens already spent locally, then take ARGV[3] if enough
+# are left. Uses the server clock so every worker sees the same time.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - tonumber(ARGV[4])
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+class FencingError(RuntimeError):
+    """A write was attempted with a turn lock that is no longer held"""
 
 class RedisClient:
+    """Session storage in Redis.
+
+    Layout per session:
+      session:{id}:meta      hash of encoded metadata fields
+      session:{id}:messages  append-only list of encoded messages
+
+    Values go through ``Codec`` (SESSION_CODEC / SESSION_COMPRESSION), so
+    the connection works in bytes rather than decoded strings.
+
+    The pre-hash layout stored the whole session as one JSON string under
+    ``session:{id}``; such keys are migrated lazily on first access.
+
+    With SESSION_CACHE_ENABLED, reads are served from a per-worker
+    ``SessionCache`` and every write publishes an invalidation so other
+    workers drop their copy.
+    """
+
     def __init__(self):
         self.redis = None
-    
+        self.cache: Optional[SessionCache] = None
+        self._invalidation_task: Optional[asyncio.Task] = None
+        self._scripts = {}
+        self.codec = Codec(
+            settings.SESSION_CODEC,
+            settings.SESSION_COMPRESSION,
+            settings.SESSION_COMPRESSION_THRESHOLD
+        )
+
     async def connect(self):
-        self.redis = await redis.from_url(settings.REDIS_URL, decode_responses=True)
+        self.redis = await redis.from_url(settings.REDIS_URL, decode_responses=False)
+        self._scripts = {}
         print("✅ Connected to Redis")
-    
+        if settings.SESSION_CACHE_ENABLED:
+            self.enable_cache()
+
     async def disconnect(self):
+        if self._invalidation_task:
+            self._invalidation_task.cancel()
+            self._invalidation_task = None
         if self.redis:
             await self.redis.close()
             print("❌ Disconnected from Redis")
-    
-    async def set_session(self, session_id: str, data: dict, ttl: int = settings.REDIS_TTL):
-        await self.redis.setex(
-            f"session:{session_id}",
-            ttl,
-            json.dumps(data)
+
+    def enable_cache(self, cache: Optional[SessionCache] = None):
+        """Put an in-process cache in front of session reads"""
+        self.cache = cache or SessionCache(
+            max_entries=settings.SESSION_CACHE_MAX_ENTRIES,
+            max_bytes=settings.SESSION_CACHE_MAX_BYTES,
+            max_messages=settings.CHAT_HISTORY_WINDOW
         )
-    
+        self._invalidation_task = asyncio.create_task(self._listen_for_invalidations())
+
+    async def _listen_for_invalidations(self):
+        """Drop cached sessions written by other workers"""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    origin, _, session_id = message["data"].decode().partition(" ")
+                    if origin != self.cache.instance_id:
+                        self.cache.invalidate(session_id)
+            except asyncio.CancelledError:
+                await pubsub.aclose()
+                raise
+            except Exception as e:
+                print(f"Session cache invalidation feed lost: {e}")
+                await pubsub.aclose()
+            # Anything may have changed while we weren't listening
+            self.cache.clear()
+            await asyncio.sleep(1)
+
+    def _script(self, source: str):
+        """Registered Lua script for the current connection"""
+        script = self._scripts.get(source)
+        if script is None or script.registered_client is not self.redis:
+            script = self._scripts[source] = self.redis.register_script(source)
+        return script
+
+    def _notify(self, pipe, session_id: str):
+        """Queue a cache invalidation for other workers on ``pipe``"""
+        if self.cache:
+            self.cache.invalidate(session_id)
+            pipe.publish(INVALIDATION_CHANNEL, f"{self.cache.instance_id} {session_id}")
+
+    @staticmethod
+    def _meta_key(session_id: str) -> str:
+        return f"session:{session_id}:meta"
+
+    @staticmethod
+    def _messages_key(session_id: str) -> str:
+        return f"session:{session_id}:messages"
+
+    @staticmethod
+    def _lock_key(session_id: str) -> str:
+        return f"session:{session_id}:lock"
+
+    @staticmethod
+    def _fence_key(session_id: str) -> str:
+        return f"session:{session_id}:fence"
+
+    @staticmethod
+    def _legacy_key(session_id: str) -> str:
+        return f"session:{session_id}"
+
+    def _encode_meta(self, meta: Dict) -> Dict[str, bytes]:
+        return {field: self.codec.encode(value) for field, value in meta.items()}
+
+    def _decode_meta(self, raw: Dict[bytes, bytes]) -> Tuple[Dict, int]:
+        """Decode a meta hash into (metadata, version)"""
+        meta = {field.decode(): self.codec.decode(value) for field, value in raw.items()}
+        return meta, meta.pop(VERSION_FIELD, 0)
+
+    @timed(REDIS_OP_SECONDS.labels("create_session"))
+    async def create_session(
+        self,
+        session_id: str,
+        meta: Dict,
+        messages: Optional[List[Dict]] = None,
+        ttl: int = settings.REDIS_TTL
+    ):
+        """Store metadata and any initial messages for a new session"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._meta_key(session_id), mapping=self._encode_meta(meta))
+            pipe.hincrby(self._meta_key(session_id), VERSION_FIELD, 1)
+            pipe.expire(self._meta_key(session_id), ttl)
+            if messages:
+                pipe.rpush(self._messages_key(session_id), *[self.codec.encode(m) for m in messages])
+                pipe.expire(self._messages_key(session_id), ttl)
+            pipe.zadd(ACTIVITY_KEY, {session_id: time.time()})
+            self._notify(pipe, session_id)
+            await pipe.execute()
+
+    @timed(REDIS_OP_SECONDS.labels("set_session"))
+    async def set_session(self, session_id: str, data: dict, ttl: int = settings.REDIS_TTL):
+        """Replace a whole session document (metadata and messages)"""
+        meta = {k: v for k, v in data.items() if k != "messages"}
+        messages = data.get("messages") or []
+        meta_key = self._meta_key(session_id)
+        messages_key = self._messages_key(session_id)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(meta_key, messages_key, self._legacy_key(session_id))
+            pipe.hset(meta_key, mapping=self._encode_meta(meta))
+            pipe.hincrby(meta_key, VERSION_FIELD, 1)
+            pipe.expire(meta_key, ttl)
+            if messages:
+                pipe.rpush(messages_key, *[self.codec.encode(m) for m in messages])
+                pipe.expire(messages_key, ttl)
+            if meta.get("status") != "ended":
+                pipe.zadd(ACTIVITY_KEY, {session_id: time.time()})
+            self._notify(pipe, session_id)
+            await pipe.execute()
+
+    async def _migrate_legacy(self, session_id: str) -> bool:
+        """Convert a single-blob ``session:{id}`` into the hash/list layout"""
+        legacy_key = self._legacy_key(session_id)
+        data = await self.redis.get(legacy_key)
+        if not data:
+            return False
+
+        ttl = await self.redis.ttl(legacy_key)
+        await self.set_session(session_id, json.loads(data), ttl if ttl > 0 else settings.REDIS_TTL)
+        return True
+
+    @timed(REDIS_OP_SECONDS.labels("get_session_meta"))
+    async def get_session_meta(self, session_id: str) -> Optional[dict]:
+        """Get session metadata without its messages"""
+        if self.cache:
+            cached = self.cache.get_meta(session_id)
+            if cached is not None:
+                return cached
+
+        raw = await self.redis.hgetall(self._meta_key(session_id))
+        if not raw:
+            if not await self._migrate_legacy(session_id):
+                return None
+            raw = await self.redis.hgetall(self._meta_key(session_id))
+        return self._decode_meta(raw)[0] if raw else None
+
+    @timed(REDIS_OP_SECONDS.labels("get_messages"))
+    async def get_messages(self, session_id: str, start: int = 0, end: int = -1) -> List[dict]:
+        """Get a slice of the session's messages (LRANGE semantics)"""
+        items = await self.redis.lrange(self._messages_key(session_id), start, end)
+        return [self.codec.decode(item) for item in items]
+
+    @timed(REDIS_OP_SECONDS.labels("load_session"))
+    async def load_session(
+        self,
+        session_id: str,
+        history_limit: int,
+        fence: Optional[int] = None
+    ) -> Optional[Tuple[dict, List[dict], int]]:
+        """Get metadata, the last ``history_limit`` messages and the total
+        message count in one round trip.
+
+        Callers holding the session lock pass its ``fence`` token: an
+        invalidation from another worker may still be on its way, so a
+        cached entry is only used once Redis confirms, in one round trip,
+        that the lock is still held by ``fence`` and the session's version
+        is the cached one. ``FencingError`` is raised if the lock was lost.
+        """
+        if self.cache:
+            if fence is None:
+                cached = self.cache.get(session_id, history_limit)
+            else:
+                cached = await self._get_cached_fenced(session_id, history_limit, fence)
+            if cached is not None:
+                return cached
+
+        for _ in range(2):
+            read_epoch = self.cache.epoch if self.cache else None
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hgetall(self._meta_key(session_id))
+                pipe.llen(self._messages_key(session_id))
+                if history_limit > 0:
+                    pipe.lrange(self._messages_key(session_id), -history_limit, -1)
+                results = await pipe.execute()
+
+            if results[0]:
+                items = results[2] if history_limit > 0 else []
+                meta, version = self._decode_meta(results[0])
+                messages = [self.codec.decode(item) for item in items]
+                if self.cache:
+                    self.cache.put(
+                        session_id,
+                        meta,
+                        sum(len(k) + len(v) for k, v in results[0].items()),
+                        messages,
+                        [len(item) for item in items],
+                        results[1],
+                        version,
+                        read_epoch
+                    )
+                return meta, messages, results[1]
+
+            if not await self._migrate_legacy(session_id):
+                return None
+
+        return None
+
+    async def _get_cached_fenced(
+        self,
+        session_id: str,
+        history_limit: int,
+        fence: int
+    ) -> Optional[Tuple[dict, List[dict], int]]:
+        """Cached ``load_session`` result, checked against the lock and version in Redis"""
+        if session_id not in self.cache:
+            # Counted as a miss; no need to ask Redis about it
+            return self.cache.get(session_id, history_limit)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(self._lock_key(session_id))
+            pipe.hget(self._meta_key(session_id), VERSION_FIELD)
+            lock, version = await pipe.execute()
+        if lock != str(fence).encode():
+            raise FencingError(f"Lock on session {session_id} is no longer held by token {fence}")
+        return self.cache.get(session_id, history_limit, version=int(version) if version else -1)
+
+    @timed(REDIS_OP_SECONDS.labels("get_session"))
     async def get_session(self, session_id: str) -> Optional[dict]:
-        data = await self.redis.get(f"session:{session_id}")
-        return json.loads(data) if data else None
-    
+        """Assemble the full session document (metadata plus all messages)"""
+        meta = await self.get_session_meta(session_id)
+        if meta is None:
+            return None
+        meta["messages"] = await self.get_messages(session_id)
+        return meta
+
+    async def append_message(
+        self,
+        session_id: str,
+        message: Dict,
+        meta_updates: Optional[Dict] = None,
+        ttl: int = settings.REDIS_TTL
+    ) -> bool:
+        """Append a single message, see ``append_messages``"""
+        return await self.append_messages(session_id, [message], meta_updates, ttl)
+
+    @timed(REDIS_OP_SECONDS.labels("append_messages"))
+    async def append_messages(
+        self,
+        session_id: str,
+        messages: List[Dict],
+        meta_updates: Optional[Dict] = None,
+        ttl: int = settings.REDIS_TTL,
+        fence: Optional[int] = None
+    ) -> bool:
+        """Append messages and refresh TTLs in one round trip.
+
+        With ``fence`` (a token from ``acquire_lock``) the write only goes
+        through while that token still holds the session lock; otherwise
+        ``FencingError`` is raised. Returns False if the session does not
+        exist.
+        """
+        meta_key = self._meta_key(session_id)
+        messages_key = self._messages_key(session_id)
+
+        encoded = [self.codec.encode(m) for m in messages]
+
+        def queue(pipe):
+            pipe.expire(meta_key, ttl)
+            pipe.rpush(messages_key, *encoded)
+            pipe.expire(messages_key, ttl)
+            if meta_updates:
+                pipe.hset(meta_key, mapping=self._encode_meta(meta_updates))
+            pipe.hincrby(meta_key, VERSION_FIELD, 1)
+            pipe.zadd(ACTIVITY_KEY, {session_id: time.time()})
+            if self.cache:
+                pipe.publish(INVALIDATION_CHANNEL, f"{self.cache.instance_id} {session_id}")
+
+        for _ in range(2):
+            results = await self._execute_fenced(session_id, fence, queue)
+            if results[0]:
+                if self.cache:
+                    version = results[4] if meta_updates else results[3]
+                    self.cache.append(
+                        session_id, messages, [len(e) for e in encoded], meta_updates, version
+                    )
+                return True
+
+            # No metadata: undo the orphan push, then retry once if this
+            # turns out to be a legacy session that can be migrated.
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.delete(messages_key, meta_key)
+                pipe.zrem(ACTIVITY_KEY, session_id)
+                await pipe.execute()
+            if not await self._migrate_legacy(session_id):
+                return False
+
+        return False
+
+    async def _execute_fenced(self, session_id: str, fence: Optional[int], queue) -> list:
+        """Run the commands ``queue(pipe)`` adds in one MULTI, fenced by ``fence``.
+
+        The lock key being touched between the check and the write (e.g. by
+        a lease renewal) aborts the MULTI; it is retried up to
+        FENCED_WRITE_ATTEMPTS times, then ``FencingError`` is raised.
+        """
+        for _ in range(FENCED_WRITE_ATTEMPTS):
+            async with self.redis.pipeline(transaction=True) as pipe:
+                if fence is not None:
+                    await self._watch_fence(pipe, session_id, fence)
+                queue(pipe)
+                try:
+                    return await pipe.execute()
+                except WatchError:
+                    continue
+        raise FencingError(f"Lock on session {session_id} kept changing under token {fence}")
+
+    async def _watch_fence(self, pipe, session_id: str, fence: int):
+        """WATCH the session lock on ``pipe`` and check ``fence`` still holds it"""
+        lock_key = self._lock_key(session_id)
+        await pipe.watch(lock_key)
+        if await pipe.get(lock_key) != str(fence).encode():
+            await pipe.reset()
+            raise FencingError(f"Lock on session {session_id} is no longer held by token {fence}")
+        pipe.multi()
+
+    @timed(REDIS_OP_SECONDS.labels("acquire_lock"))
+    async def acquire_lock(self, session_id: str, lease_ms: int) -> Optional[int]:
+        """Take the session's turn lock; returns the fencing token, or None if held"""
+        token = await self._script(ACQUIRE_LOCK_SCRIPT)(
+            keys=[self._lock_key(session_id), self._fence_key(session_id)],
+            args=[lease_ms, settings.REDIS_TTL]
+        )
+        return int(token) if token is not None else None
+
+    @timed(REDIS_OP_SECONDS.labels("renew_lock"))
+    async def renew_lock(self, session_id: str, token: int, lease_ms: int) -> bool:
+        """Extend the lease; False if ``token`` no longer holds the lock"""
+        renewed = await self._script(RENEW_LOCK_SCRIPT)(
+            keys=[self._lock_key(session_id)], args=[token, lease_ms]
+        )
+        return bool(renewed)
+
+    @timed(REDIS_OP_SECONDS.labels("release_lock"))
+    async def release_lock(self, session_id: str, token: int) -> bool:
+        released = await self._script(RENEW_LOCK_SCRIPT)(
+            keys=[self._lock_key(session_id)], args=[token]
+        )
+        return bool(released)
+
+    @timed(REDIS_OP_SECONDS.labels("take_tokens"))
+    async def take_tokens(
+        self,
+        key: str,
+        capacity: int,
+        refill_per_second: float,
+        cost: int = 1,
+        debt: int = 0
+    ) -> Tuple[bool, float]:
+        """Take ``cost`` tokens from the bucket at ``key``; returns (allowed, tokens left)"""
+        allowed, tokens = await self._script(TOKEN_BUCKET_SCRIPT)(
+            keys=[key], args=[capacity, refill_per_second, cost, debt]
+        )
+        return bool(allowed), float(tokens)
+
+    @timed(REDIS_OP_SECONDS.labels("get_sessions"))
+    async def get_sessions(self, session_ids: List[str]) -> List[Optional[dict]]:
+        """Assemble full documents for several sessions in one round trip"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for session_id in session_ids:
+                pipe.hgetall(self._meta_key(session_id))
+                pipe.lrange(self._messages_key(session_id), 0, -1)
+            results = await pipe.execute()
+
+        sessions = []
+        for raw, items in zip(results[::2], results[1::2]):
+            if not raw:
+                sessions.append(None)
+                continue
+            session, _ = self._decode_meta(raw)
+            session["messages"] = [self.codec.decode(item) for item in items]
+            sessions.append(session)
+        return sessions
+
+    @timed(REDIS_OP_SECONDS.labels("mark_ended"))
+    async def mark_ended(
+        self,
+        session_id: str,
+        ended_at: str,
+        retention_ttl: int = settings.ARCHIVE_RETENTION_TTL,
+        fence: Optional[int] = None
+    ) -> bool:
+        """Mark a session ended and queue it for archival, atomically.
+
+        The session keys are kept for ``retention_ttl`` so the archiver has
+        time to copy them to MongoDB. With ``fence`` the write only goes
+        through while that token holds the session lock, as for
+        ``append_messages``. Returns False if the session does not exist.
+        """
+        meta_key = self._meta_key(session_id)
+        if not await self.redis.exists(meta_key) and not await self._migrate_legacy(session_id):
+            return False
+
+        def queue(pipe):
+            pipe.expire(meta_key, retention_ttl)
+            pipe.hset(meta_key, mapping=self._encode_meta({"status": "ended", "ended_at": ended_at}))
+            pipe.hincrby(meta_key, VERSION_FIELD, 1)
+            pipe.expire(self._messages_key(session_id), retention_ttl)
+            pipe.zadd(ARCHIVE_QUEUE_KEY, {session_id: time.time()})
+            pipe.zrem(ACTIVITY_KEY, session_id)
+            self._notify(pipe, session_id)
+
+        results = await self._execute_fenced(session_id, fence, queue)
+        if not results[0]:
+            # Expired between the check and the write; drop what we created
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.delete(meta_key)
+                pipe.zrem(ARCHIVE_QUEUE_KEY, session_id)
+                await pipe.execute()
+            return False
+        return True
+
+    @timed(REDIS_OP_SECONDS.labels("claim_archive_batch"))
+    async def claim_archive_batch(self, batch_size: int, lease_seconds: float) -> List[str]:
+        """Claim due sessions from the archive queue for ``lease_seconds``"""
+        now = time.time()
+        claimed = await self._script(CLAIM_ARCHIVE_SCRIPT)(
+            keys=[ARCHIVE_QUEUE_KEY],
+            args=[now, batch_size, now + lease_seconds]
+        )
+        return [session_id.decode() for session_id in claimed]
+
+    @timed(REDIS_OP_SECONDS.labels("sweep_idle"))
+    async def sweep_idle(
+        self,
+        idle_before: float,
+        batch_size: int,
+        retention_ttl: int = settings.ARCHIVE_RETENTION_TTL
+    ) -> List[str]:
+        """End up to ``batch_size`` sessions idle since ``idle_before`` and queue them for archival"""
+        now = time.time()
+        swept = await self._script(SWEEP_IDLE_SCRIPT)(
+            keys=[ACTIVITY_KEY, ARCHIVE_QUEUE_KEY],
+            args=[
+                idle_before,
+                batch_size,
+                json.dumps(datetime.utcnow().isoformat()),
+                retention_ttl,
+                now,
+                INVALIDATION_CHANNEL
+            ]
+        )
+        swept = [session_id.decode() for session_id in swept]
+        if self.cache:
+            for session_id in swept:
+                self.cache.invalidate(session_id)
+        return swept
+
+    @timed(REDIS_OP_SECONDS.labels("complete_archive"))
+    async def complete_archive(self, session_ids: List[str]):
+        """Drop archived sessions from the queue and from Redis"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(ARCHIVE_QUEUE_KEY, *session_ids)
+            pipe.zrem(ACTIVITY_KEY, *session_ids)
+            for session_id in session_ids:
+                pipe.delete(
+                    self._meta_key(session_id),
+                    self._messages_key(session_id),
+                    self._legacy_key(session_id)
+                )
+                self._notify(pipe, session_id)
+            await pipe.execute()
+
+    @timed(REDIS_OP_SECONDS.labels("delete_session"))
     async def delete_session(self, session_id: str):
-        await self.redis.delete(f"session:{session_id}")
-    
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(ACTIVITY_KEY, session_id)
+            pipe.delete(
+                self._meta_key(session_id),
+                self._messages_key(session_id),
+                self._legacy_key(session_id)
+            )
+            self._notify(pipe, session_id)
+            await pipe.execute()
+
+    @timed(REDIS_OP_SECONDS.labels("exists"))
     async def exists(self, session_id: str) -> bool:
-        return await self.redis.exists(f"session:{session_id}") > 0
+        return await self.redis.exists(
+            self._meta_key(session_id),
+            self._legacy_key(session_id)
+        ) > 0
 
 redis_client = RedisClient()
\ No newline at end of file
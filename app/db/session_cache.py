@@ -0,0 +1,195 @@
+from collections import OrderedDict
+from typing import Optional, Dict, List, Tuple
+import uuid
+
+# Redis pub/sub channel carrying "<instance_id> <session_id>" on every write
+INVALIDATION_CHANNEL = "session:invalidate"
+
+class CacheEntry:
+    __slots__ = ("meta", "meta_size", "messages", "message_sizes", "total", "version", "size")
+
+    def __init__(
+        self,
+        meta: Dict,
+        meta_size: int,
+        messages: List[Dict],
+        message_sizes: List[int],
+        total: int,
+        version: int
+    ):
+        self.meta = meta
+        self.meta_size = meta_size
+        self.messages = messages
+        self.message_sizes = message_sizes
+        self.total = total
+        self.version = version
+        self.size = meta_size + sum(message_sizes)
+
+class SessionCache:
+    """Per-worker LRU of hot sessions: metadata plus the most recent messages.
+
+    Bounded by entry count and approximate bytes (length of the raw Redis
+    payloads). Every entry carries the session's version counter so a slow
+    read can never overwrite a newer write-through. Other workers' writes
+    arrive as invalidations on ``INVALIDATION_CHANNEL``; each leaves a
+    tombstone, so a read that was already in flight when it arrived isn't
+    cached afterwards. Tombstones are bounded like entries; once one is
+    dropped, reads older than it are not cached at all.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, max_messages: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.instance_id = uuid.uuid4().hex
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        # Bumped on every invalidation; readers note it before going to Redis
+        self.epoch = 0
+        self._tombstones: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(
+        self,
+        session_id: str,
+        history_limit: int,
+        version: Optional[int] = None
+    ) -> Optional[Tuple[Dict, List[Dict], int]]:
+        """Return (meta, last ``history_limit`` messages, total) if cached.
+
+        With ``version`` (the session's current one, read from Redis) a
+        cached entry of any other version counts as a miss.
+        """
+        entry = self._entries.get(session_id)
+        if (
+            entry is None
+            or (version is not None and entry.version != version)
+            or len(entry.messages) < min(history_limit, entry.total)
+        ):
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        messages = entry.messages[-history_limit:] if history_limit > 0 else []
+        return dict(entry.meta), [dict(m) for m in messages], entry.total
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def get_meta(self, session_id: str) -> Optional[Dict]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        self._entries.move_to_end(session_id)
+        return dict(entry.meta)
+
+    def put(
+        self,
+        session_id: str,
+        meta: Dict,
+        meta_size: int,
+        messages: List[Dict],
+        message_sizes: List[int],
+        total: int,
+        version: int,
+        read_epoch: Optional[int] = None
+    ):
+        """Cache a read result unless a newer version is already cached.
+
+        ``read_epoch`` is ``epoch`` as it was when the read started; the
+        result is dropped if the session was invalidated since.
+        """
+        if read_epoch is not None and self._tombstones.get(session_id, self._forgotten) > read_epoch:
+            return
+        current = self._entries.get(session_id)
+        if current is not None and current.version > version:
+            return
+        keep = self.max_messages
+        self._store(
+            session_id,
+            CacheEntry(dict(meta), meta_size, messages[-keep:], message_sizes[-keep:], total, version)
+        )
+
+    def append(
+        self,
+        session_id: str,
+        messages: List[Dict],
+        message_sizes: List[int],
+        meta_updates: Optional[Dict],
+        version: int
+    ):
+        """Write-through after a local append; ``version`` is the post-write value"""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return
+        if entry.version != version - 1:
+            # Missed a write from elsewhere; don't patch a stale entry.
+            self.invalidate(session_id)
+            return
+
+        meta = dict(entry.meta)
+        if meta_updates:
+            meta.update(meta_updates)
+        keep = self.max_messages
+        self._store(
+            session_id,
+            CacheEntry(
+                meta,
+                entry.meta_size,
+                (entry.messages + messages)[-keep:],
+                (entry.message_sizes + message_sizes)[-keep:],
+                entry.total + len(messages),
+                version
+            )
+        )
+
+    def invalidate(self, session_id: str):
+        self.epoch += 1
+        self._tombstones[session_id] = self.epoch
+        self._tombstones.move_to_end(session_id)
+        if len(self._tombstones) > self.max_entries:
+            _, self._forgotten = self._tombstones.popitem(last=False)
+
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop everything, including reads still in flight"""
+        self._entries.clear()
+        self._bytes = 0
+        self.epoch += 1
+        self._tombstones.clear()
+        self._forgotten = self.epoch
+
+    def _store(self, session_id: str, entry: CacheEntry):
+        old = self._entries.pop(session_id, None)
+        if old is not None:
+            self._bytes -= old.size
+        if entry.size > self.max_bytes:
+            return
+
+        self._entries[session_id] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
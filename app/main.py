@@ -125,7 +125,7 @@
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 import logging
 import sys
@@ -141,7 +141,17 @@ logger = logging.getLogger(__name__)
 from app.core.config import settings
 from app.db.mongodb import connect_to_mongo, close_mongo_connection
 from app.db.redis import redis_client
+from app.services.gemini_service import gemini_service
+from app.services.archiver import session_archiver
+from app.services.sweeper import idle_session_sweeper
+from app.services.health_prober import UP, health_prober
 from app.api.endpoints import chat, health
+from app.api.middleware import MetricsMiddleware, TracingMiddleware
+from app.api.websocket import FrameSocket
+from app.core.tracing import trace_exporter
+from app.core.http_pool import http_pool
+from app.core import metrics
+from app.services.circuit_breaker import STATES
 
 # Create auth router only if auth.py exists
 try:
@@ -168,10 +178,20 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Failed to connect to Redis: {e}")
     
+    session_archiver.start()
+    idle_session_sweeper.start()
+    trace_exporter.start()
+    health_prober.start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down...")
+    await health_prober.stop()
+    await idle_session_sweeper.stop()
+    await session_archiver.stop()
+    await trace_exporter.stop()
+    await http_pool.aclose()
     try:
         await close_mongo_connection()
     except:
@@ -180,6 +200,7 @@ async def lifespan(app: FastAPI):
         await redis_client.disconnect()
     except:
         pass
+    gemini_service.shutdown()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -187,10 +208,42 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+_UNHANDLED_ERRORS = metrics.ERRORS.labels("unhandled")
+
+# Scrape-time view of admission control
+metrics.GaugeFunc(
+    "llm_concurrency_limit", "Current adaptive LLM concurrency limit",
+    lambda: {(): gemini_service.admission.limit}
+)
+metrics.GaugeFunc(
+    "llm_in_flight", "LLM generations running in this worker",
+    lambda: {(): gemini_service.admission.in_flight}
+)
+metrics.GaugeFunc(
+    "llm_queued", "Requests waiting for an LLM slot, by lane",
+    lambda: {(lane,): count for lane, count in gemini_service.admission.snapshot()["queued"].items()},
+    ["lane"]
+)
+metrics.GaugeFunc(
+    "websocket_connections", "Open chat WebSocket connections in this worker",
+    lambda: {(): FrameSocket.open_connections}
+)
+metrics.GaugeFunc(
+    "dependency_up", "Whether the last background probe found the dependency up",
+    lambda: {(name,): int(health_prober.status(name) == UP) for name in health_prober.probes},
+    ["dependency"]
+)
+metrics.GaugeFunc(
+    "llm_circuit_state", "LLM circuit breaker state (1 for the current one)",
+    lambda: {(state,): int(state == gemini_service.breaker.state) for state in STATES},
+    ["state"]
+)
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global exception: {exc}")
+    _UNHANDLED_ERRORS.inc()
     return JSONResponse(
         status_code=500,
         content={"detail": str(exc) if settings.DEBUG else "Internal server error"}
@@ -204,6 +257,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
 
 # Include routers
 app.include_router(
@@ -236,6 +292,10 @@ async def root():
         "auth_endpoints": auth_available
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/ping")
 async def ping():
     return {"ping": "pong"}
\ No newline at end of file
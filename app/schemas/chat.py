@@ -43,6 +43,7 @@ class Message(BaseModel):
     content: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     user: Optional[UserInfo] = None
+    partial: bool = False  # reply cut short by a client disconnect
 
 class ChatSession(BaseModel):
     session_id: str
@@ -0,0 +1,190 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Deque
+import asyncio
+import time
+from app.core.config import settings
+
+# Priority lanes, highest first
+LANE_INTERACTIVE = "interactive"
+LANE_BATCH = "batch"
+LANES = (LANE_INTERACTIVE, LANE_BATCH)
+
+# Request headers: the client's remaining patience in seconds, and its lane
+DEADLINE_HEADER = "X-Request-Timeout"
+PRIORITY_HEADER = "X-Request-Priority"
+
+class AdmissionRejected(Exception):
+    """Shed before doing any LLM work; the client should retry after ``retry_after`` seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+def parse_deadline(value: Optional[str]) -> Optional[float]:
+    """Seconds from a DEADLINE_HEADER value; None if absent or malformed"""
+    try:
+        seconds = float(value) if value else None
+    except ValueError:
+        return None
+    return seconds if seconds and seconds > 0 else None
+
+def parse_lane(value: Optional[str]) -> str:
+    return value if value in LANES else LANE_INTERACTIVE
+
+class AdmissionController:
+    """Adaptive concurrency limit with a bounded, prioritized wait queue.
+
+    The limit moves like TCP congestion control (AIMD): every generation
+    that finishes within ``latency_target`` grows it by 1/limit, so about
+    one slot per limit's worth of completions; a slow or failed one
+    multiplies it by ``backoff``, at most once per observed latency so a
+    burst of slow calls only counts once.
+
+    Requests that can't start at once wait in their lane; interactive
+    waiters are always admitted before batch ones. A request is rejected up
+    front when the queue is full or when the estimated wait (the work
+    ahead of it divided by the limit, times the average latency) exceeds
+    its deadline or ``max_queue_time``, and is dropped from the queue if it
+    waits longer than that anyway.
+    """
+
+    def __init__(
+        self,
+        max_limit: int = settings.GEMINI_MAX_CONCURRENCY,
+        min_limit: int = settings.ADMISSION_MIN_CONCURRENCY,
+        latency_target: float = settings.ADMISSION_LATENCY_TARGET,
+        max_queue: int = settings.ADMISSION_MAX_QUEUE,
+        max_queue_time: float = settings.ADMISSION_MAX_QUEUE_TIME,
+        backoff: float = 0.7
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.limit = float(max_limit)
+        self.latency_target = latency_target
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+        self.backoff = backoff
+        self.in_flight = 0
+        self.avg_latency = latency_target / 2
+        self._last_decrease = 0.0
+        self._lanes: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._lanes.values())
+
+    def _ahead_of(self, lane: str) -> int:
+        """Waiters that would be admitted before a new arrival in ``lane``"""
+        ahead = 0
+        for name in LANES:
+            ahead += len(self._lanes[name])
+            if name == lane:
+                break
+        return ahead
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def estimate_wait(self, lane: str = LANE_INTERACTIVE) -> float:
+        """Expected seconds before a new request in ``lane`` would start"""
+        ahead = self._ahead_of(lane)
+        if ahead == 0 and self._has_capacity():
+            return 0.0
+        return (ahead + 1) / int(self.limit) * self.avg_latency
+
+    def check(self, lane: str = LANE_INTERACTIVE, deadline: Optional[float] = None):
+        """Raise ``AdmissionRejected`` if a request in ``lane`` should be shed now"""
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("Wait queue is full", self.estimate_wait(lane))
+        wait = self.estimate_wait(lane)
+        budget = min(deadline, self.max_queue_time) if deadline else self.max_queue_time
+        if wait > budget:
+            self.rejected += 1
+            raise AdmissionRejected(f"Estimated wait of {wait:.1f}s exceeds {budget:.1f}s", wait)
+
+    @asynccontextmanager
+    async def slot(self, lane: str = LANE_INTERACTIVE, deadline: Optional[float] = None):
+        """Hold one unit of the concurrency limit for the block"""
+        self.check(lane, deadline)
+        if self._ahead_of(lane) or not self._has_capacity():
+            await self._wait(lane, min(deadline, self.max_queue_time) if deadline else self.max_queue_time)
+        else:
+            self.in_flight += 1
+
+        started = time.monotonic()
+        # None if cancelled: says nothing about the provider, so not observed
+        ok = None
+        try:
+            yield
+            ok = True
+        except Exception:
+            ok = False
+            raise
+        finally:
+            self._release(time.monotonic() - started, ok)
+
+    async def _wait(self, lane: str, timeout: float):
+        waiter = asyncio.get_running_loop().create_future()
+        self._lanes[lane].append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Granted just as the timeout fired; keep the slot
+                return
+            self._lanes[lane].remove(waiter)
+            waiter.cancel()
+            self.timed_out += 1
+            raise AdmissionRejected(f"Waited {timeout:.1f}s without a free slot", self.estimate_wait(lane))
+        except asyncio.CancelledError:
+            if waiter.done():
+                # The slot was handed to us; give it to the next waiter
+                self.in_flight -= 1
+                self._grant()
+            else:
+                self._lanes[lane].remove(waiter)
+                waiter.cancel()
+            raise
+
+    def _release(self, latency: float, ok: Optional[bool]):
+        self.in_flight -= 1
+        if ok is not None:
+            self._observe(latency, ok)
+        self._grant()
+
+    def _grant(self):
+        """Hand free slots to waiters, highest lane first"""
+        for lane in LANES:
+            waiters = self._lanes[lane]
+            while waiters and self._has_capacity():
+                waiter = waiters.popleft()
+                if waiter.done():
+                    continue
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _observe(self, latency: float, ok: bool):
+        if ok:
+            self.avg_latency += 0.2 * (latency - self.avg_latency)
+        now = time.monotonic()
+        if not ok or latency > self.latency_target:
+            if now - self._last_decrease >= self.avg_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def snapshot(self) -> Dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": {lane: len(waiters) for lane, waiters in self._lanes.items()},
+            "avg_latency": self.avg_latency,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
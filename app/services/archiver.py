@@ -0,0 +1,153 @@
+from typing import List, Dict, Optional
+import asyncio
+import time
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+from app.db.redis import redis_client
+from app.db.mongodb import get_database, CHAT_SESSIONS_COLLECTION
+from app.core.config import settings
+from app.core.metrics import ERRORS, MONGO_OP_SECONDS, SESSION_EVENTS
+
+DUPLICATE_KEY_ERROR = 11000
+
+_SESSIONS_ARCHIVED = SESSION_EVENTS.labels("archived")
+_ARCHIVE_ERRORS = ERRORS.labels("archiver")
+_MONGO_INSERT_MANY = MONGO_OP_SECONDS.labels("insert_many")
+_MONGO_BULK_UPSERT = MONGO_OP_SECONDS.labels("bulk_upsert")
+
+class SessionArchiver:
+    """Write-behind copy of ended sessions from Redis to MongoDB.
+
+    ``SessionService.end_session`` only marks the session ended and queues
+    its id in Redis. This background task claims queued ids in batches,
+    writes them with one ``insert_many`` and then removes them from Redis.
+    A claim is a lease: if a worker dies or the write fails, the ids become
+    claimable again once the lease runs out, and the write is retried as
+    upserts on ``session_id`` so it stays idempotent.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.ARCHIVE_BATCH_SIZE,
+        flush_interval: float = settings.ARCHIVE_FLUSH_INTERVAL,
+        lease_seconds: float = settings.ARCHIVE_LEASE_SECONDS
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lease_seconds = lease_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._queued_since_flush = 0
+        self.archived = 0
+        self.failed_batches = 0
+
+    def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout: float = settings.ARCHIVE_DRAIN_TIMEOUT):
+        """Stop the loop, then flush whatever is queued within ``drain_timeout``"""
+        self._stopping = True
+        self._wake.set()
+        if self._task:
+            await self._task
+            self._task = None
+        try:
+            await asyncio.wait_for(self.flush(), drain_timeout)
+        except asyncio.TimeoutError:
+            print("Archive drain timed out; remaining sessions stay queued in Redis")
+        except Exception as e:
+            print(f"Error draining archive queue: {e}")
+
+    def notify(self):
+        """Called when a session is queued; flush early once a batch is full"""
+        self._queued_since_flush += 1
+        if self._queued_since_flush >= self.batch_size:
+            self._wake.set()
+
+    def wake(self):
+        """Flush now rather than at the next interval"""
+        self._wake.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing archive queue: {e}")
+
+    async def flush(self) -> int:
+        """Archive queued sessions until no full batch is left; returns the count"""
+        self._queued_since_flush = 0
+        total = 0
+        while True:
+            session_ids = await redis_client.claim_archive_batch(self.batch_size, self.lease_seconds)
+            if not session_ids:
+                break
+            total += await self._archive_batch(session_ids)
+            if len(session_ids) < self.batch_size:
+                break
+        return total
+
+    async def _archive_batch(self, session_ids: List[str]) -> int:
+        sessions = await redis_client.get_sessions(session_ids)
+        documents = [session for session in sessions if session]
+        missing = len(session_ids) - len(documents)
+        if missing:
+            print(f"Archiver: {missing} queued session(s) already gone from Redis")
+
+        if documents:
+            started = time.perf_counter()
+            try:
+                await self._write(documents)
+            except Exception as e:
+                # Leave the ids claimed; they are retried when the lease ends
+                self.failed_batches += 1
+                _ARCHIVE_ERRORS.inc()
+                print(f"Error archiving {len(documents)} session(s): {e}")
+                return 0
+            print(f"Archived {len(documents)} session(s) in {time.perf_counter() - started:.3f}s")
+
+        await redis_client.complete_archive(session_ids)
+        self.archived += len(documents)
+        _SESSIONS_ARCHIVED.inc(len(documents))
+        return len(documents)
+
+    async def _write(self, documents: List[Dict]):
+        collection = get_database()[CHAT_SESSIONS_COLLECTION]
+        try:
+            with _MONGO_INSERT_MANY.time():
+                await collection.insert_many(documents, ordered=False)
+            return
+        except BulkWriteError as e:
+            # Duplicates were archived by an earlier attempt; retry the rest
+            retry = [
+                documents[error["index"]]
+                for error in e.details.get("writeErrors", [])
+                if error.get("code") != DUPLICATE_KEY_ERROR
+            ]
+        except Exception as e:
+            print(f"insert_many failed, retrying as upserts: {e}")
+            retry = documents
+
+        if retry:
+            requests = [
+                ReplaceOne(
+                    {"session_id": doc["session_id"]},
+                    {k: v for k, v in doc.items() if k != "_id"},
+                    upsert=True
+                )
+                for doc in retry
+            ]
+            with _MONGO_BULK_UPSERT.time():
+                await collection.bulk_write(requests, ordered=False)
+
+session_archiver = SessionArchiver()
@@ -0,0 +1,185 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional, Tuple
+import time
+from app.core.config import settings
+from app.core.metrics import CIRCUIT_REJECTED, CIRCUIT_TRANSITIONS
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATES = (CLOSED, HALF_OPEN, OPEN)
+
+class CircuitOpenError(Exception):
+    """The call was not attempted because the circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open")
+        self.retry_after = retry_after
+
+class BreakerCall:
+    """Timing of one guarded call; streams mark when the first chunk arrived"""
+    __slots__ = ("started", "responded_at")
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.responded_at: Optional[float] = None
+
+    def responded(self):
+        if self.responded_at is None:
+            self.responded_at = time.monotonic()
+
+class CircuitBreaker:
+    """Fails calls fast while a dependency is unhealthy.
+
+    Closed, it keeps the outcomes of the calls that finished in the last
+    ``window`` seconds and opens once there are at least ``min_calls`` of
+    them and either the share that failed reaches ``error_rate`` or the
+    share slower than ``slow_call_seconds`` reaches ``slow_call_rate``.
+    Open, every call is refused for ``open_seconds``. Then it goes half
+    open and lets ``half_open_probes`` calls through: if they all succeed
+    in time it closes with a clean window, otherwise it opens again.
+
+    A call's latency is until it first responded (see ``BreakerCall``), or
+    until it finished. Cancelled calls say nothing about the dependency
+    and aren't counted.
+
+    The move from open to half open happens on the next ``check()``, but
+    ``state`` already reports half open once the cool-down is over, so
+    readiness and metrics don't stay "open" on an instance taking no calls.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = settings.LLM_BREAKER_WINDOW,
+        min_calls: int = settings.LLM_BREAKER_MIN_CALLS,
+        error_rate: float = settings.LLM_BREAKER_ERROR_RATE,
+        slow_call_seconds: float = settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate: float = settings.LLM_BREAKER_SLOW_CALL_RATE,
+        open_seconds: float = settings.LLM_BREAKER_OPEN_SECONDS,
+        half_open_probes: int = settings.LLM_BREAKER_HALF_OPEN_PROBES
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._state = CLOSED
+        # (finished at, failed, slow), oldest first, with running totals
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.retry_after() == 0.0:
+            return HALF_OPEN
+        return self._state
+
+    def _transition(self, state: str):
+        self._state = state
+        CIRCUIT_TRANSITIONS.labels(self.name, state).inc()
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        else:
+            self._calls.clear()
+            self._failures = self._slow = 0
+
+    def _reject(self):
+        self.rejected += 1
+        CIRCUIT_REJECTED.labels(self.name).inc()
+        raise CircuitOpenError(self.name, self.retry_after())
+
+    def retry_after(self) -> float:
+        if self._state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def check(self):
+        """Raise ``CircuitOpenError`` if calls are being refused right now"""
+        if self._state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self._reject()
+            self._transition(HALF_OPEN)
+
+    @asynccontextmanager
+    async def call(self):
+        """Guard one call to the dependency, recording its outcome"""
+        self.check()
+        probe = self._state == HALF_OPEN
+        if probe:
+            if self._probes_in_flight >= self.half_open_probes:
+                self._reject()
+            self._probes_in_flight += 1
+
+        call = BreakerCall()
+        try:
+            yield call
+        except Exception:
+            self._record(call, failed=True, probe=probe)
+            raise
+        except BaseException:
+            # Cancelled, or a stream closed by its consumer: no verdict
+            if probe:
+                self._probes_in_flight -= 1
+            raise
+        else:
+            self._record(call, failed=False, probe=probe)
+
+    def _record(self, call: BreakerCall, failed: bool, probe: bool):
+        now = time.monotonic()
+        slow = (call.responded_at or now) - call.started >= self.slow_call_seconds
+
+        if probe:
+            self._probes_in_flight -= 1
+            if self._state != HALF_OPEN:
+                return
+            if failed or slow:
+                self._transition(OPEN)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+            return
+        if self._state != CLOSED:
+            # Started before the circuit opened; the verdict is already in
+            return
+
+        self._calls.append((now, failed, slow))
+        self._failures += failed
+        self._slow += slow
+        while self._calls and self._calls[0][0] < now - self.window:
+            _, old_failed, old_slow = self._calls.popleft()
+            self._failures -= old_failed
+            self._slow -= old_slow
+
+        total = len(self._calls)
+        if total >= self.min_calls and (
+            self._failures / total >= self.error_rate or self._slow / total >= self.slow_call_rate
+        ):
+            self._transition(OPEN)
+
+    def stats(self) -> Dict:
+        total = len(self._calls)
+        return {
+            "state": self.state,
+            "window_calls": total,
+            "error_rate": self._failures / total if total else 0.0,
+            "slow_call_rate": self._slow / total if total else 0.0,
+            "retry_after": self.retry_after(),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
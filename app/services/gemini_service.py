@@ -1,12 +1,128 @@
-import google.generativeai as genai
 from app.core.config import settings
 from app.schemas.chat import UserInfo
-from typing import List, Dict
+from app.services.prompt_builder import PromptBuilder, prompt_builder
+from app.services.response_cache import ResponseCache, response_cache
+from app.services.admission import AdmissionController, AdmissionRejected, LANE_INTERACTIVE
+from app.services.llm_provider import LLMProvider, build_provider
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.metrics import ERRORS, FALLBACK_REPLIES, LLM_SECONDS, LLM_TTFT_SECONDS
+from app.core.tracing import span
+from contextlib import aclosing, asynccontextmanager
+from typing import List, Dict, AsyncIterator, Tuple, Optional
+import asyncio
+import time
+
+FALLBACK_REPLY = "I apologize, but I'm having trouble generating a response right now. Please try again."
+
+_GENERATE_SECONDS = LLM_SECONDS.labels("generate")
+_STREAM_SECONDS = LLM_SECONDS.labels("stream")
+_LLM_ERRORS = ERRORS.labels("llm")
+
+class StreamInterrupted(Exception):
+    """The provider failed, or ran out of time, after part of the reply was streamed"""
+
+class GenerationStats:
+    """Queue and concurrency counters for LLM generations in this worker"""
 
-class GeminiService:
     def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.total_queue_time = 0.0
+        self.max_queue_time = 0.0
+
+    def record_queue_time(self, seconds: float):
+        self.admitted += 1
+        self.total_queue_time += seconds
+        if seconds > self.max_queue_time:
+            self.max_queue_time = seconds
+
+    def snapshot(self) -> Dict:
+        return {
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "avg_queue_time": self.total_queue_time / self.admitted if self.admitted else 0.0,
+            "max_queue_time": self.max_queue_time,
+        }
+
+class GeminiService:
+    def __init__(
+        self,
+        max_concurrency: int = settings.GEMINI_MAX_CONCURRENCY,
+        builder: PromptBuilder = prompt_builder,
+        cache: ResponseCache = response_cache,
+        provider: Optional[LLMProvider] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        timeout: float = settings.LLM_TIMEOUT
+    ):
+        # Which backend answers is the provider's business (see llm_provider);
+        # admission control caps how many generations a worker runs at once,
+        # adapting the cap (up to max_concurrency) to observed latency, and
+        # the breaker stops sending work while the provider is failing.
+        self.provider = provider or build_provider()
+        self.breaker = breaker or CircuitBreaker("llm")
+        self.timeout = timeout
+        self.admission = AdmissionController(max_limit=max_concurrency)
+        self.stats = GenerationStats()
+        self.prompt_builder = builder
+        self.response_cache = cache
+    
+    def shutdown(self):
+        """Release the provider's resources"""
+        self.provider.shutdown()
+    
+    @asynccontextmanager
+    async def _generation_slot(self, lane: str = LANE_INTERACTIVE, deadline: Optional[float] = None):
+        """Wait for admission, recording how long that took.
+        
+        Raises ``AdmissionRejected`` if the request is shed instead.
+        """
+        enqueued_at = time.perf_counter()
+        self.stats.waiting += 1
+        admitted = False
+        try:
+            async with self.admission.slot(lane, deadline):
+                self.stats.waiting -= 1
+                admitted = True
+                self.stats.record_queue_time(time.perf_counter() - enqueued_at)
+                self.stats.in_flight += 1
+                try:
+                    yield
+                finally:
+                    self.stats.in_flight -= 1
+        finally:
+            if not admitted:
+                self.stats.waiting -= 1
+    
+    async def _generate_content(
+        self,
+        prompt: str,
+        lane: str = LANE_INTERACTIVE,
+        deadline: Optional[float] = None
+    ) -> str:
+        """Generate a full reply from the provider, within the concurrency cap"""
+        with span("llm.generate", provider=self.provider.name):
+            return await self._generate_in_slot(prompt, lane, deadline)
+    
+    async def _generate_in_slot(self, prompt: str, lane: str, deadline: Optional[float]) -> str:
+        expires = time.monotonic() + self._time_budget(deadline)
+        async with self._generation_slot(lane, deadline):
+            async with self.breaker.call():
+                with _GENERATE_SECONDS.time():
+                    remaining = self._remaining(expires)
+                    return await asyncio.wait_for(self.provider.generate(prompt, remaining), remaining)
+    
+    def _time_budget(self, deadline: Optional[float]) -> float:
+        """Seconds a request may spend on the LLM, queueing included"""
+        return min(deadline, self.timeout) if deadline else self.timeout
+    
+    @staticmethod
+    def _remaining(expires: float) -> float:
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("LLM deadline expired")
+        return remaining
     
     def _build_context(self, user_info: UserInfo = None) -> str:
         """Build context from user information"""
@@ -48,38 +164,131 @@ class GeminiService:
         
         return ""
     
+    def _build_prompt(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        user_info: UserInfo = None
+    ) -> str:
+        """Build the full prompt, packing as much recent history as fits the token budget"""
+        with span("llm.prompt"):
+            context = self._build_context(user_info)
+            return self.prompt_builder.build(context, conversation_history, message)
+    
     async def generate_response(
         self, 
         message: str, 
         conversation_history: List[Dict[str, str]] = None,
         user_info: UserInfo = None
     ) -> str:
-        """Generate response using Gemini API"""
+        """Generate a response from the configured LLM provider"""
+        reply, _ = await self.generate_reply(message, conversation_history, user_info)
+        return reply
+    
+    async def generate_reply(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        user_info: UserInfo = None,
+        lane: str = LANE_INTERACTIVE,
+        deadline: Optional[float] = None
+    ) -> Tuple[str, str]:
+        """Generate a response, serving eligible turns from the response cache.
+        
+        Returns (reply, cache status). Raises ``AdmissionRejected`` when the
+        request is shed rather than generated. The call is given up after
+        ``deadline`` seconds (capped by LLM_TIMEOUT), and while the circuit
+        breaker is open the fallback reply is returned without queueing.
+        """
+        cache_key = self.response_cache.key_for(
+            message, self._build_context(user_info), conversation_history
+        )
+        cached, cache_status = await self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached, cache_status
+        
         try:
-            # Build the prompt with context
-            context = self._build_context(user_info)
-            
-            # Build conversation history
-            chat_history = []
-            if conversation_history:
-                for msg in conversation_history:
-                    if msg['role'] == 'user':
-                        chat_history.append(f"User: {msg['content']}")
-                    else:
-                        chat_history.append(f"Assistant: {msg['content']}")
-            
-            # Construct the full prompt
-            full_prompt = context
-            if chat_history:
-                full_prompt += "Previous conversation:\n" + "\n".join(chat_history[-10:]) + "\n\n"
-            full_prompt += f"User: {message}\nAssistant:"
+            self.breaker.check()
+            full_prompt = self._build_prompt(message, conversation_history, user_info)
             
             # Generate response
-            response = self.model.generate_content(full_prompt)
-            return response.text
+            reply = await self._generate_content(full_prompt, lane, deadline)
             
+        except AdmissionRejected:
+            raise
+        except CircuitOpenError:
+            FALLBACK_REPLIES.inc()
+            return FALLBACK_REPLY, cache_status
         except Exception as e:
             print(f"Error generating response: {e}")
-            return "I apologize, but I'm having trouble generating a response right now. Please try again."
+            _LLM_ERRORS.inc()
+            FALLBACK_REPLIES.inc()
+            return FALLBACK_REPLY, cache_status
+        
+        await self.response_cache.put(cache_key, reply)
+        return reply, cache_status
+    
+    async def stream_response(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        user_info: UserInfo = None,
+        lane: str = LANE_INTERACTIVE,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Yield response text chunks as the provider produces them.
+
+        A failure before the first chunk yields the fallback reply instead;
+        after it, ``StreamInterrupted`` is raised so callers can keep what
+        was sent as a partial reply.
+        """
+        full_prompt = self._build_prompt(message, conversation_history, user_info)
+        produced = False
+        try:
+            self.breaker.check()
+            async for chunk in self._stream_content(full_prompt, lane, deadline):
+                produced = True
+                yield chunk
+        except AdmissionRejected:
+            raise
+        except CircuitOpenError:
+            FALLBACK_REPLIES.inc()
+            yield FALLBACK_REPLY
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+            _LLM_ERRORS.inc()
+            if produced:
+                raise StreamInterrupted(str(e) or type(e).__name__) from e
+            FALLBACK_REPLIES.inc()
+            yield FALLBACK_REPLY
+    
+    async def _stream_content(
+        self,
+        prompt: str,
+        lane: str = LANE_INTERACTIVE,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Stream from the provider within the concurrency cap, timing the first chunk.
+        
+        Every chunk has to arrive before the request's deadline.
+        """
+        expires = time.monotonic() + self._time_budget(deadline)
+        async with self._generation_slot(lane, deadline):
+            async with self.breaker.call() as call:
+                started = time.perf_counter()
+                try:
+                    stream = self.provider.stream(prompt, self._remaining(expires))
+                    async with aclosing(stream) as chunks:
+                        while True:
+                            try:
+                                item = await asyncio.wait_for(anext(chunks), self._remaining(expires))
+                            except StopAsyncIteration:
+                                break
+                            if call.responded_at is None:
+                                call.responded()
+                                LLM_TTFT_SECONDS.observe(time.perf_counter() - started)
+                            yield item
+                finally:
+                    _STREAM_SECONDS.observe(time.perf_counter() - started)
 
 gemini_service = GeminiService()
\ No newline at end of file
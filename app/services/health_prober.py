@@ -0,0 +1,120 @@
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import time
+from app.db.mongodb import mongodb
+from app.db.redis import redis_client
+from app.core.config import settings
+from app.core.metrics import HEALTH_PROBE_SECONDS
+
+UP = "up"
+DOWN = "down"
+UNKNOWN = "unknown"
+
+async def _ping_mongodb():
+    if not mongodb.client:
+        raise ConnectionError("not connected")
+    await mongodb.client.admin.command("ping")
+
+async def _ping_redis():
+    if not redis_client.redis:
+        raise ConnectionError("not connected")
+    await redis_client.redis.ping()
+
+DEFAULT_PROBES: Dict[str, Callable[[], Awaitable]] = {
+    "mongodb": _ping_mongodb,
+    "redis": _ping_redis,
+}
+
+class ProbeResult:
+    __slots__ = ("status", "latency", "checked_at", "error")
+
+    def __init__(self, status: str, latency: float, checked_at: float, error: Optional[str] = None):
+        self.status = status
+        self.latency = latency
+        self.checked_at = checked_at
+        self.error = error
+
+class HealthProber:
+    """Checks dependencies in the background so health endpoints never wait on them.
+
+    Every ``interval`` seconds all probes run concurrently, each cut off
+    after ``timeout``; a hung dependency is reported down instead of
+    hanging the caller. Results older than ``stale_after`` (the prober
+    stopped or fell behind) count as unknown, never as up.
+    """
+
+    def __init__(
+        self,
+        probes: Optional[Dict[str, Callable[[], Awaitable]]] = None,
+        interval: float = settings.HEALTH_PROBE_INTERVAL,
+        timeout: float = settings.HEALTH_PROBE_TIMEOUT,
+        stale_after: float = settings.HEALTH_STALE_AFTER
+    ):
+        self.probes = probes if probes is not None else DEFAULT_PROBES
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.results: Dict[str, ProbeResult] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    async def probe(self):
+        """Run every probe once and cache the outcomes"""
+        await asyncio.gather(*(self._probe_one(name, check) for name, check in self.probes.items()))
+
+    async def _probe_one(self, name: str, check: Callable[[], Awaitable]):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(check(), self.timeout)
+            status, error = UP, None
+        except asyncio.TimeoutError:
+            status, error = DOWN, f"no answer within {self.timeout}s"
+        except Exception as e:
+            status, error = DOWN, str(e) or type(e).__name__
+        latency = time.perf_counter() - started
+        HEALTH_PROBE_SECONDS.labels(name).observe(latency)
+        self.results[name] = ProbeResult(status, latency, time.time(), error)
+
+    def status(self, name: str) -> str:
+        result = self.results.get(name)
+        if result is None or time.time() - result.checked_at > self.stale_after:
+            return UNKNOWN
+        return result.status
+
+    def all_up(self) -> bool:
+        return all(self.status(name) == UP for name in self.probes)
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        snapshot = {}
+        for name in self.probes:
+            result = self.results.get(name)
+            if result is None:
+                snapshot[name] = {"status": UNKNOWN}
+                continue
+            snapshot[name] = {
+                "status": self.status(name),
+                "latency_ms": round(result.latency * 1000, 2),
+                "age_seconds": round(now - result.checked_at, 2),
+            }
+            if result.error:
+                snapshot[name]["error"] = result.error
+        return snapshot
+
+health_prober = HealthProber()
@@ -0,0 +1,326 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from functools import partial
+from typing import AsyncIterator, Deque, Dict, Optional
+import asyncio
+import json
+import threading
+import time
+from app.core.config import settings
+from app.core.http_pool import http_pool
+from app.core.metrics import LLM_HEDGES
+from app.core.tracing import inject
+
+PRIMARY = "primary"
+SECONDARY = "secondary"
+
+class LLMProvider:
+    """One text-generation backend.
+
+    ``stream`` yields the reply in chunks and is what every provider
+    implements; ``generate`` returns the whole reply and defaults to
+    joining the stream. Closing the stream early abandons the request.
+    ``timeout`` is handed to the backend so it gives up on its side too.
+    """
+    name = "provider"
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        parts = []
+        async with aclosing(self.stream(prompt, timeout)) as chunks:
+            async for chunk in chunks:
+                parts.append(chunk)
+        return "".join(parts)
+
+    def stats(self) -> Dict:
+        return {"provider": self.name}
+
+    def shutdown(self):
+        pass
+
+class GeminiProvider(LLMProvider):
+    """Gemini through the blocking ``google.generativeai`` SDK, run on a thread pool"""
+    name = "gemini"
+
+    def __init__(self, model=None, executor_workers: int = settings.GEMINI_EXECUTOR_WORKERS):
+        if model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            model = genai.GenerativeModel(settings.GEMINI_MODEL)
+        self.model = model
+        self._executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="gemini")
+
+    def shutdown(self):
+        """Release the generation thread pool"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _options(timeout: Optional[float]) -> Dict:
+        return {"request_options": {"timeout": timeout}} if timeout else {}
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        loop = asyncio.get_running_loop()
+        call = partial(self.model.generate_content, prompt, **self._options(timeout))
+        response = await loop.run_in_executor(self._executor, call)
+        return response.text
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Drain the blocking SDK stream on the executor, handing chunks to the loop"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True, **self._options(timeout)):
+                    if stop.is_set():
+                        break
+                    if chunk.text:
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        producer = loop.run_in_executor(self._executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            await producer
+        finally:
+            stop.set()
+
+class OpenRouterProvider(LLMProvider):
+    """Any OpenAI-compatible chat completions API; OpenRouter by default.
+
+    Requests go through the shared ``http_pool`` so they reuse its
+    keep-alive connections, and carry the current trace's ``traceparent``.
+    """
+    name = "openrouter"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = settings.OPENROUTER_API_KEY,
+        base_url: str = settings.OPENROUTER_BASE_URL,
+        model: str = settings.OPENROUTER_MODEL,
+        timeout: float = 60.0
+    ):
+        if not api_key:
+            raise ValueError("OPENROUTER_API_KEY is required for the openrouter provider")
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self.timeout = timeout
+
+    def _body(self, prompt: str, stream: bool) -> Dict:
+        return {"model": self.model, "messages": [{"role": "user", "content": prompt}], "stream": stream}
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        response = await http_pool.client.post(
+            self.url, json=self._body(prompt, stream=False), headers=inject(dict(self.headers)), timeout=timeout or self.timeout
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"] or ""
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        body = self._body(prompt, stream=True)
+        request = http_pool.client.stream(
+            "POST", self.url, json=body, headers=inject(dict(self.headers)), timeout=timeout or self.timeout
+        )
+        async with request as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                # Server-sent events; lines starting with ":" are keep-alive comments
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
+class StubProvider(LLMProvider):
+    """Canned local replies with configurable timing, for development and tests.
+
+    ``fail`` raises before the first chunk; ``fail_after`` raises once that
+    many chunks have been sent, like a connection lost mid-reply.
+    """
+    name = "stub"
+
+    def __init__(
+        self,
+        reply: Optional[str] = None,
+        first_token_delay: float = 0.05,
+        chunk_delay: float = 0.01,
+        chunk_words: int = 4,
+        fail: bool = False,
+        fail_after: Optional[int] = None
+    ):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.chunk_words = chunk_words
+        self.fail = fail
+        self.fail_after = fail_after
+        self.calls = 0
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        self.calls += 1
+        await asyncio.sleep(self.first_token_delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} provider failed")
+        reply = self.reply or f"Stub reply to: {prompt.strip().splitlines()[-1][:80]}"
+        words = reply.split(" ")
+        for sent, i in enumerate(range(0, len(words), self.chunk_words)):
+            if i:
+                await asyncio.sleep(self.chunk_delay)
+            if sent == self.fail_after:
+                raise RuntimeError(f"{self.name} provider failed mid-reply")
+            yield " ".join(words[i:i + self.chunk_words]) + (" " if i + self.chunk_words < len(words) else "")
+
+class HedgedProvider(LLMProvider):
+    """Sends a request to ``secondary`` too when ``primary`` is slow to start.
+
+    If the primary hasn't produced its first chunk within the p95 of its
+    recent first-chunk times, the same prompt goes to the secondary and
+    whichever answers first is streamed; the other request is cancelled.
+    A primary that fails before then fails over at once. Until
+    ``min_samples`` times are known, ``initial_delay`` is the hedge point.
+    """
+
+    def __init__(
+        self,
+        primary: LLMProvider,
+        secondary: LLMProvider,
+        window: int = settings.LLM_HEDGE_WINDOW,
+        min_samples: int = settings.LLM_HEDGE_MIN_SAMPLES,
+        initial_delay: float = settings.LLM_HEDGE_INITIAL_DELAY,
+        quantile: float = 0.95
+    ):
+        self.primary = primary
+        self.secondary = secondary
+        self.name = f"{primary.name}+{secondary.name}"
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.quantile = quantile
+        self._first_chunk: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.hedged = 0
+        self.failovers = 0
+        self.secondary_wins = 0
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait on the primary before also asking the secondary"""
+        if len(self._first_chunk) < self.min_samples:
+            return self.initial_delay
+        ordered = sorted(self._first_chunk)
+        return ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))]
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        self.requests += 1
+        started = time.monotonic()
+        streams: Dict[str, AsyncIterator[str]] = {}
+        pending: Dict[asyncio.Future, str] = {}
+
+        def launch(role: str):
+            provider = self.primary if role == PRIMARY else self.secondary
+            streams[role] = provider.stream(prompt, timeout)
+            pending[asyncio.ensure_future(streams[role].__anext__())] = role
+
+        launch(PRIMARY)
+        deadline = started + self.hedge_delay()
+        winner, first, error = None, None, None
+        try:
+            while winner is None:
+                wait = None if SECONDARY in streams else max(0.0, deadline - time.monotonic())
+                done, _ = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedged += 1
+                    launch(SECONDARY)
+                    continue
+                for future in done:
+                    role = pending.pop(future)
+                    try:
+                        first = future.result()
+                    except StopAsyncIteration:
+                        first = None
+                    except Exception as e:
+                        error = e
+                        continue
+                    winner = role
+                    break
+                if winner is None and not pending:
+                    if SECONDARY in streams:
+                        raise error
+                    self.failovers += 1
+                    launch(SECONDARY)
+        finally:
+            await self._abandon(pending, streams, winner, started)
+
+        if winner == PRIMARY:
+            self._first_chunk.append(time.monotonic() - started)
+        if SECONDARY in streams:
+            LLM_HEDGES.labels(winner).inc()
+            if winner == SECONDARY:
+                self.secondary_wins += 1
+
+        async with aclosing(streams[winner]) as chunks:
+            if first is None:
+                return
+            yield first
+            async for chunk in chunks:
+                yield chunk
+
+    async def _abandon(self, pending: Dict[asyncio.Future, str], streams: Dict, winner: Optional[str], started: float):
+        """Cancel in-flight first-chunk waits and close every stream but the winner's"""
+        for future in pending:
+            future.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if PRIMARY in pending.values():
+            # Cancelled still waiting: a lower bound, but keeps slow spells in the window
+            self._first_chunk.append(time.monotonic() - started)
+        for role, stream in streams.items():
+            if role != winner:
+                await stream.aclose()
+
+    def stats(self) -> Dict:
+        return {
+            "provider": self.name,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "failovers": self.failovers,
+            "secondary_wins": self.secondary_wins,
+            "hedge_delay": self.hedge_delay(),
+        }
+
+    def shutdown(self):
+        self.primary.shutdown()
+        self.secondary.shutdown()
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    OpenRouterProvider.name: OpenRouterProvider,
+    StubProvider.name: StubProvider,
+}
+
+def build_provider(
+    name: str = settings.LLM_PROVIDER,
+    hedge_with: Optional[str] = settings.LLM_HEDGE_PROVIDER
+) -> LLMProvider:
+    """The configured provider, hedged with a second one if ``hedge_with`` is set"""
+    if name not in PROVIDERS or (hedge_with and hedge_with not in PROVIDERS):
+        raise ValueError(f"Unknown LLM provider, expected one of {sorted(PROVIDERS)}")
+    provider = PROVIDERS[name]()
+    if hedge_with:
+        return HedgedProvider(provider, PROVIDERS[hedge_with]())
+    return provider
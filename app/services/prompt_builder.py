@@ -0,0 +1,56 @@
+from typing import List, Dict, Optional
+from app.core.config import settings
+
+# Per-line overhead for the "User: " / "Assistant: " prefix and newline
+LINE_OVERHEAD_TOKENS = 3
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token for English text)"""
+    if not text:
+        return 0
+    return max(1, (len(text) + 3) // 4)
+
+def message_tokens(message: Dict) -> int:
+    """Token count of a stored message, using the cached value when present"""
+    tokens = message.get("tokens")
+    if tokens is None:
+        tokens = estimate_tokens(message.get("content", ""))
+    return tokens
+
+class PromptBuilder:
+    """Packs user context, recent turns and the new message into a token budget"""
+
+    def __init__(self, token_budget: int = settings.PROMPT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+
+    def select_history(self, history: List[Dict], available_tokens: int) -> List[Dict]:
+        """Keep the most recent turns whose combined size fits ``available_tokens``"""
+        selected = []
+        used = 0
+        for msg in reversed(history):
+            cost = message_tokens(msg) + LINE_OVERHEAD_TOKENS
+            if used + cost > available_tokens:
+                break
+            selected.append(msg)
+            used += cost
+        selected.reverse()
+        return selected
+
+    def build(self, context: str, history: Optional[List[Dict]], message: str) -> str:
+        """Build the full prompt; older turns are dropped first when over budget"""
+        tail = f"User: {message}\nAssistant:"
+        available = self.token_budget - estimate_tokens(context) - estimate_tokens(tail)
+
+        lines = []
+        for msg in self.select_history(history or [], available):
+            if msg["role"] == "user":
+                lines.append(f"User: {msg['content']}")
+            else:
+                lines.append(f"Assistant: {msg['content']}")
+
+        prompt = context
+        if lines:
+            prompt += "Previous conversation:\n" + "\n".join(lines) + "\n\n"
+        return prompt + tail
+
+prompt_builder = PromptBuilder()
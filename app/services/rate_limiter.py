@@ -0,0 +1,134 @@
+from collections import OrderedDict
+from typing import Optional, Dict
+import math
+import time
+from app.db.redis import redis_client
+from app.core.config import settings
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+class RateLimit:
+    """``"<count>/<period>"``: a bucket of ``count`` tokens refilled over ``period``"""
+
+    def __init__(self, spec: str):
+        try:
+            count, period = spec.split("/")
+            self.capacity = int(count)
+            self.period = PERIODS[period.strip().rstrip("s")]
+        except (ValueError, KeyError) as e:
+            raise ValueError(f"Invalid rate limit '{spec}', expected e.g. '20/minute'") from e
+        if self.capacity <= 0:
+            raise ValueError(f"Invalid rate limit '{spec}', count must be positive")
+        self.refill_per_second = self.capacity / self.period
+
+class RateLimitDecision:
+    def __init__(self, allowed: bool, limit: RateLimit, remaining: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds until one token is available"""
+        return max(1, math.ceil((1 - self.remaining) / self.limit.refill_per_second))
+
+    def headers(self) -> Dict[str, str]:
+        remaining = max(0.0, self.remaining)
+        headers = {
+            "X-RateLimit-Limit": str(self.limit.capacity),
+            "X-RateLimit-Remaining": str(int(remaining)),
+            "X-RateLimit-Reset": str(math.ceil((self.limit.capacity - remaining) / self.limit.refill_per_second)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+class _LocalBucket:
+    __slots__ = ("remaining", "synced_at", "budget", "debt")
+
+    def __init__(self, remaining: float, synced_at: float, budget: int):
+        self.remaining = remaining
+        self.synced_at = synced_at
+        self.budget = budget
+        self.debt = 0
+
+class RateLimiter:
+    """Token buckets in Redis, one per (route, user), shared by all workers.
+
+    To save a round trip per request, a worker that last saw a bucket at
+    least half full may admit up to ``local_fraction`` of the remaining
+    tokens on its own for ``sync_interval`` seconds. Those requests are
+    charged to the Redis bucket at the next sync, so every request is
+    counted; with N workers a client can overshoot by at most
+    N * ``local_fraction`` of a bucket before being throttled.
+
+    If Redis is unreachable requests are let through.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, str] = settings.RATE_LIMITS,
+        enabled: bool = settings.RATE_LIMIT_ENABLED,
+        local_fraction: float = settings.RATE_LIMIT_LOCAL_FRACTION,
+        sync_interval: float = settings.RATE_LIMIT_LOCAL_SYNC_INTERVAL,
+        max_local_entries: int = 10000
+    ):
+        self.enabled = enabled
+        self.limits = {route: RateLimit(spec) for route, spec in limits.items()}
+        self.local_fraction = local_fraction
+        self.sync_interval = sync_interval
+        self.max_local_entries = max_local_entries
+        self._local: "OrderedDict[str, _LocalBucket]" = OrderedDict()
+        self.local_hits = 0
+        self.redis_checks = 0
+        self.rejected = 0
+
+    async def check(self, route: str, identity: str) -> Optional[RateLimitDecision]:
+        """Take one token for ``identity`` on ``route``; None if the route is unlimited"""
+        limit = self.limits.get(route)
+        if not self.enabled or limit is None:
+            return None
+
+        key = f"ratelimit:{route}:{identity}"
+        now = time.monotonic()
+        bucket = self._local.get(key)
+        if bucket is not None and bucket.budget > 0 and now - bucket.synced_at < self.sync_interval:
+            bucket.budget -= 1
+            bucket.debt += 1
+            self.local_hits += 1
+            return RateLimitDecision(True, limit, bucket.remaining - bucket.debt)
+
+        debt = bucket.debt if bucket is not None else 0
+        try:
+            allowed, remaining = await redis_client.take_tokens(
+                key, limit.capacity, limit.refill_per_second, cost=1, debt=debt
+            )
+        except Exception as e:
+            print(f"Rate limiter unavailable, allowing request: {e}")
+            return None
+        self.redis_checks += 1
+
+        budget = 0
+        if remaining >= limit.capacity / 2:
+            budget = int(remaining * self.local_fraction)
+        self._remember(key, _LocalBucket(remaining, now, budget))
+
+        if not allowed:
+            self.rejected += 1
+        return RateLimitDecision(allowed, limit, remaining)
+
+    def _remember(self, key: str, bucket: _LocalBucket):
+        self._local.pop(key, None)
+        self._local[key] = bucket
+        while len(self._local) > self.max_local_entries:
+            self._local.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "local_hits": self.local_hits,
+            "redis_checks": self.redis_checks,
+            "rejected": self.rejected,
+        }
+
+rate_limiter = RateLimiter()
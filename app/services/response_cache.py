@@ -0,0 +1,132 @@
+from collections import OrderedDict
+from typing import Optional, List, Dict, Tuple
+import hashlib
+import json
+import re
+import time
+from app.db.redis import redis_client
+from app.core.config import settings
+
+# Values for the X-Response-Cache header
+CACHE_HIT_LOCAL = "hit-local"
+CACHE_HIT_REDIS = "hit-redis"
+CACHE_MISS = "miss"
+CACHE_BYPASS = "bypass"
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_message(message: str) -> str:
+    """Case- and whitespace-insensitive form of a message, without trailing punctuation"""
+    return _WHITESPACE.sub(" ", message).strip().lower().rstrip("?!. ")
+
+class ResponseCache:
+    """Caches replies to opening turns that many users send verbatim.
+
+    Only turns with at most ``max_history`` prior messages are eligible.
+    Keys hash the normalized message, the user-context block and the
+    history window, so different profiles never share a reply. Replies live
+    in Redis with a TTL that shrinks as they get larger (big entries are
+    evicted first, and anything above ``max_entry_bytes`` is not stored),
+    fronted by a small per-worker LRU bounded by bytes and a short TTL.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.RESPONSE_CACHE_ENABLED,
+        ttl: int = settings.RESPONSE_CACHE_TTL,
+        max_history: int = settings.RESPONSE_CACHE_MAX_HISTORY,
+        max_entry_bytes: int = settings.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+        local_max_bytes: int = settings.RESPONSE_CACHE_LOCAL_MAX_BYTES,
+        local_ttl: float = settings.RESPONSE_CACHE_LOCAL_TTL
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_history = max_history
+        self.max_entry_bytes = max_entry_bytes
+        self.local_max_bytes = local_max_bytes
+        self.local_ttl = local_ttl
+        self._local: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._local_bytes = 0
+        self.counts = {CACHE_HIT_LOCAL: 0, CACHE_HIT_REDIS: 0, CACHE_MISS: 0, CACHE_BYPASS: 0}
+
+    def key_for(self, message: str, context: str, history: Optional[List[Dict]]) -> Optional[str]:
+        """Cache key for a turn, or None if the turn is not eligible"""
+        history = history or []
+        if not self.enabled or len(history) > self.max_history:
+            return None
+        material = json.dumps([
+            normalize_message(message),
+            context,
+            [[msg["role"], msg["content"]] for msg in history],
+        ])
+        return "respcache:" + hashlib.sha256(material.encode()).hexdigest()
+
+    async def get(self, key: Optional[str]) -> Tuple[Optional[str], str]:
+        """Look a key up in the local LRU, then Redis; returns (reply, status)"""
+        if key is None:
+            self.counts[CACHE_BYPASS] += 1
+            return None, CACHE_BYPASS
+
+        entry = self._local.get(key)
+        if entry is not None:
+            reply, expires_at = entry
+            if time.monotonic() < expires_at:
+                self._local.move_to_end(key)
+                self.counts[CACHE_HIT_LOCAL] += 1
+                return reply, CACHE_HIT_LOCAL
+            self._forget(key)
+
+        try:
+            data = await redis_client.redis.get(key)
+        except Exception as e:
+            print(f"Response cache read failed: {e}")
+            data = None
+        if data is not None:
+            reply = redis_client.codec.decode(data)
+            self._remember(key, reply)
+            self.counts[CACHE_HIT_REDIS] += 1
+            return reply, CACHE_HIT_REDIS
+
+        self.counts[CACHE_MISS] += 1
+        return None, CACHE_MISS
+
+    async def put(self, key: Optional[str], reply: str):
+        if key is None:
+            return
+        data = redis_client.codec.encode(reply)
+        if len(data) > self.max_entry_bytes:
+            return
+
+        # Larger replies expire sooner, down to a quarter of the base TTL
+        ttl = max(1, int(self.ttl * (1 - 0.75 * len(data) / self.max_entry_bytes)))
+        try:
+            await redis_client.redis.set(key, data, ex=ttl)
+        except Exception as e:
+            print(f"Response cache write failed: {e}")
+        self._remember(key, reply)
+
+    def _remember(self, key: str, reply: str):
+        size = len(reply)
+        if size > self.local_max_bytes:
+            return
+        self._forget(key)
+        self._local[key] = (reply, time.monotonic() + self.local_ttl)
+        self._local_bytes += size
+        while self._local_bytes > self.local_max_bytes:
+            _, (evicted, _) = self._local.popitem(last=False)
+            self._local_bytes -= len(evicted)
+
+    def _forget(self, key: str):
+        entry = self._local.pop(key, None)
+        if entry is not None:
+            self._local_bytes -= len(entry[0])
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "local_entries": len(self._local),
+            "local_bytes": self._local_bytes,
+            **self.counts,
+        }
+
+response_cache = ResponseCache()
@@ -0,0 +1,173 @@
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Hashable, Callable, Awaitable, AsyncIterator, Any
+import asyncio
+import random
+import time
+from app.db.redis import redis_client
+from app.core.config import settings
+
+# SESSION_LOCK_POLICY values
+POLICY_OFF = "off"
+POLICY_QUEUE = "queue"
+POLICY_REJECT = "reject"
+POLICY_COALESCE = "coalesce"
+POLICIES = {POLICY_OFF, POLICY_QUEUE, POLICY_REJECT, POLICY_COALESCE}
+
+class SessionBusyError(Exception):
+    """The session's turn lock could not be taken under the current policy"""
+
+class SessionLease:
+    """A held turn lock, renewed in the background until released.
+
+    Renewal stops after ``max_hold`` seconds so a lease that is never
+    released (e.g. a stream whose body never ran) still expires.
+    """
+
+    def __init__(self, session_id: str, token: int, lease_seconds: float, max_hold: float):
+        self.session_id = session_id
+        # Fencing token: pass to writes so they fail once the lock is lost
+        self.token = token
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._released = False
+        self._renewer = asyncio.create_task(self._renew(time.monotonic() + max_hold))
+
+    async def _renew(self, stop_at: float):
+        lease_ms = int(self.lease_seconds * 1000)
+        while time.monotonic() < stop_at:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await redis_client.renew_lock(self.session_id, self.token, lease_ms):
+                    self.lost = True
+                    print(f"Lost turn lock on session {self.session_id}")
+                    return
+            except Exception as e:
+                print(f"Error renewing turn lock on session {self.session_id}: {e}")
+
+    async def release(self):
+        self._renewer.cancel()
+        if self._released or self.lost:
+            return
+        self._released = True
+        try:
+            await redis_client.release_lock(self.session_id, self.token)
+        except Exception as e:
+            # The lease runs out on its own
+            print(f"Error releasing turn lock on session {self.session_id}: {e}")
+
+class SessionLockManager:
+    """Serializes turns on the same session across workers.
+
+    A turn holds a Redis lock on its session from before the history is
+    loaded until its messages are committed, so concurrent requests never
+    generate from stale history or interleave their messages. What happens
+    when the lock is taken depends on ``policy``:
+
+      queue     wait up to ``wait_timeout`` for the lock
+      reject    fail immediately with ``SessionBusyError``
+      coalesce  identical requests already in flight on this worker share
+                that request's result; anything else queues
+      off       no locking
+    """
+
+    def __init__(
+        self,
+        policy: str = settings.SESSION_LOCK_POLICY,
+        lease_seconds: float = settings.SESSION_LOCK_LEASE_SECONDS,
+        wait_timeout: float = settings.SESSION_LOCK_WAIT_TIMEOUT,
+        max_hold: float = settings.SESSION_LOCK_MAX_HOLD,
+        retry_interval: float = 0.05
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown session lock policy '{policy}'")
+        self.policy = policy
+        self.lease_seconds = lease_seconds
+        self.wait_timeout = wait_timeout
+        self.max_hold = max_hold
+        self.retry_interval = retry_interval
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.acquired = 0
+        self.rejected = 0
+        self.coalesced = 0
+
+    async def acquire(self, session_id: str, policy: Optional[str] = None) -> Optional[SessionLease]:
+        """Take the session's lock per the policy (or ``policy``); None when locking is off"""
+        if self.policy == POLICY_OFF:
+            return None
+        policy = policy or self.policy
+
+        lease_ms = int(self.lease_seconds * 1000)
+        deadline = time.monotonic() + self.wait_timeout
+        delay = self.retry_interval
+        while True:
+            token = await redis_client.acquire_lock(session_id, lease_ms)
+            if token is not None:
+                self.acquired += 1
+                return SessionLease(session_id, token, self.lease_seconds, self.max_hold)
+            remaining = deadline - time.monotonic()
+            if policy == POLICY_REJECT or remaining <= 0:
+                self.rejected += 1
+                raise SessionBusyError(f"Session {session_id} is busy with another message")
+            # Jittered backoff so queued waiters don't poll in lockstep
+            await asyncio.sleep(min(remaining, delay * random.uniform(0.5, 1.5)))
+            delay = min(delay * 2, 0.5)
+
+    @asynccontextmanager
+    async def hold(
+        self,
+        session_id: Optional[str],
+        policy: Optional[str] = None
+    ) -> AsyncIterator[Optional[SessionLease]]:
+        """Hold the lock for the block; a None ``session_id`` (new session) needs none"""
+        lease = await self.acquire(session_id, policy) if session_id else None
+        try:
+            yield lease
+        finally:
+            if lease:
+                await lease.release()
+
+    async def coalesce(self, key: Hashable, run: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``run()`` once per ``key`` in flight when the policy is coalesce"""
+        if self.policy != POLICY_COALESCE:
+            return await run()
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Our own cancellation, or the shared run was abandoned by its
+                # client; in the latter case run it for ourselves
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            return await self.coalesce(key, run)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await run()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unshared failure isn't logged as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict:
+        return {
+            "policy": self.policy,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+session_locks = SessionLockManager()
@@ -1,50 +1,273 @@
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
+import base64
+import binascii
+import json
 import uuid
 from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
 from app.db.redis import redis_client
-from app.db.mongodb import get_database
+from app.db.mongodb import get_database, CHAT_SESSIONS_COLLECTION
+from app.services.archiver import session_archiver
 from app.schemas.chat import ChatSession, Message, MessageRole, UserInfo
 from app.core.config import settings
+from app.services.prompt_builder import estimate_tokens, message_tokens
+from app.core.metrics import MONGO_OP_SECONDS, SESSION_EVENTS
+from app.core.tracing import traced
+
+_SESSIONS_CREATED = SESSION_EVENTS.labels("created")
+_SESSIONS_ENDED = SESSION_EVENTS.labels("ended")
+_TURNS_REJECTED = SESSION_EVENTS.labels("turn_rejected")
+_MONGO_LIST_SESSIONS = MONGO_OP_SECONDS.labels("list_sessions")
+
+def _build_message(role: MessageRole, content: str, user_info: Optional[UserInfo] = None) -> Dict:
+    return {
+        "role": role,
+        "content": content,
+        "tokens": estimate_tokens(content),
+        "timestamp": datetime.utcnow().isoformat(),
+        # Only non-empty profile fields; the full profile lives on the session
+        "user": user_info.dict(exclude_none=True) if user_info and role == MessageRole.USER else None
+    }
+
+def _history_entry(message: Dict) -> Dict:
+    return {
+        "role": message["role"],
+        "content": message["content"],
+        "tokens": message_tokens(message)
+    }
+
+class SessionTurn:
+    """Unit of work for one chat turn.
+
+    Holds the session metadata and history window loaded up front, buffers
+    the messages produced during the turn and writes them in one pipeline
+    on ``commit``. With a ``fence`` token the commit only succeeds while the
+    turn still holds the session lock.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        session: Dict,
+        history: List[Dict],
+        history_start: int = 0,
+        is_new: bool = False,
+        fence: Optional[int] = None
+    ):
+        self.session_id = session_id
+        self.session = session
+        self.history = history
+        # Index in the stored message list of ``history[0]``
+        self.history_start = history_start
+        self.is_new = is_new
+        self.fence = fence
+        self._pending: List[Dict] = []
+        self._meta_updates: Dict = {}
+
+    @traced("session.history")
+    async def load_history(
+        self,
+        token_budget: int = settings.PROMPT_TOKEN_BUDGET,
+        max_messages: int = settings.PROMPT_MAX_HISTORY_MESSAGES,
+        page_size: int = settings.CHAT_HISTORY_WINDOW
+    ) -> List[Dict]:
+        """Page in older messages until the history covers ``token_budget``"""
+        total = sum(message_tokens(msg) for msg in self.history)
+        while (
+            total < token_budget
+            and self.history_start > 0
+            and len(self.history) < max_messages
+        ):
+            count = min(page_size, self.history_start, max_messages - len(self.history))
+            start = self.history_start - count
+            older = [
+                _history_entry(msg)
+                for msg in await redis_client.get_messages(self.session_id, start, self.history_start - 1)
+            ]
+            if not older:
+                break
+            self.history[:0] = older
+            self.history_start = start
+            total += sum(msg["tokens"] for msg in older)
+        return self.history
+    
+    def add_message(
+        self,
+        role: MessageRole,
+        content: str,
+        user_info: Optional[UserInfo] = None,
+        partial: bool = False
+    ) -> Dict:
+        """Stage a message to be written on commit; ``partial`` marks a reply cut short"""
+        message = _build_message(role, content, user_info)
+        if partial:
+            message["partial"] = True
+        self._pending.append(message)
+        if user_info and role == MessageRole.USER:
+            self._meta_updates["user"] = user_info.dict()
+        return message
+
+    def discard(self):
+        """Drop staged messages; a new session is then never created"""
+        self._pending = []
+        self._meta_updates = {}
+        self.is_new = False
+
+    @traced("session.commit")
+    async def commit(self) -> bool:
+        """Write staged messages (and the session itself if new).
+
+        Returns False, storing nothing, when the session was ended, archived
+        or expired since it was loaded.
+        """
+        if self.is_new:
+            self.session.update(self._meta_updates)
+            await redis_client.create_session(self.session_id, self.session, self._pending)
+            _SESSIONS_CREATED.inc()
+            committed = True
+        elif self._pending:
+            committed = await redis_client.append_messages(
+                self.session_id, self._pending, self._meta_updates or None, fence=self.fence
+            )
+            if not committed:
+                _TURNS_REJECTED.inc()
+        else:
+            committed = True
+
+        self.history.extend(_history_entry(msg) for msg in self._pending)
+        self._pending = []
+        self._meta_updates = {}
+        self.is_new = False
+        return committed
+
+# Session fields callers may request via ``fields``; the listing keys are always returned
+LISTABLE_FIELDS = {"session_id", "user_id", "user", "started_at", "ended_at", "status", "messages"}
+
+class InvalidCursorError(ValueError):
+    pass
+
+def encode_cursor(started_at: str, object_id: ObjectId) -> str:
+    raw = json.dumps([started_at, str(object_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        started_at, object_id = json.loads(raw)
+        return started_at, ObjectId(object_id)
+    except (binascii.Error, ValueError, TypeError, InvalidId) as e:
+        raise InvalidCursorError("Invalid cursor") from e
 
 class SessionService:
     def __init__(self):
-        self.collection_name = "chat_sessions"
+        self.collection_name = CHAT_SESSIONS_COLLECTION
     
     async def create_session(self, user_id: str, user_info: Optional[UserInfo] = None) -> str:
         """Create a new chat session with required user_id"""
         session_id = str(uuid.uuid4())
-        session_data = {
+        await redis_client.create_session(session_id, self._new_session_meta(session_id, user_id, user_info))
+        _SESSIONS_CREATED.inc()
+        return session_id
+    
+    def _new_session_meta(self, session_id: str, user_id: str, user_info: Optional[UserInfo]) -> Dict:
+        return {
             "session_id": session_id,
             "user_id": user_id,  # Now required
-            "messages": [],
             "user": user_info.dict() if user_info else None,
             "started_at": datetime.utcnow().isoformat(),
             "status": "active"
         }
+    
+    def new_turn(self, user_id: str, user_info: Optional[UserInfo] = None) -> SessionTurn:
+        """Start a turn on a brand-new session; nothing is written until commit"""
+        session_id = str(uuid.uuid4())
+        return SessionTurn(
+            session_id,
+            self._new_session_meta(session_id, user_id, user_info),
+            history=[],
+            is_new=True
+        )
+    
+    @traced("session.load")
+    async def load_turn(
+        self,
+        session_id: str,
+        history_limit: int = settings.CHAT_HISTORY_WINDOW,
+        fence: Optional[int] = None
+    ) -> Optional[SessionTurn]:
+        """Start a turn on an existing session, loading metadata and history in one round trip.
+
+        With a ``fence`` the turn holds the session lock; the local cache,
+        which may not have seen the previous holder's write yet, is only
+        used after checking its version against Redis.
+        """
+        loaded = await redis_client.load_session(session_id, history_limit, fence=fence)
+        if loaded is None:
+            return None
         
-        await redis_client.set_session(session_id, session_data)
-        return session_id
+        session, messages, total = loaded
+        history = [_history_entry(msg) for msg in messages]
+        return SessionTurn(
+            session_id, session, history, history_start=total - len(history), fence=fence
+        )
     
-    async def get_session(self, session_id: str) -> Optional[Dict]:
-        """Get session from Redis"""
-        return await redis_client.get_session(session_id)
+    async def get_session(self, session_id: str, include_messages: bool = False) -> Optional[Dict]:
+        """Get session metadata from Redis, optionally with all messages"""
+        if include_messages:
+            return await redis_client.get_session(session_id)
+        return await redis_client.get_session_meta(session_id)
     
-    async def get_user_sessions(self, user_id: str, status: Optional[str] = None) -> List[Dict]:
-        """Get all sessions for a user from MongoDB"""
+    async def get_user_sessions(
+        self,
+        user_id: str,
+        status: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        include_messages: bool = False
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of a user's sessions from MongoDB, newest first.
+        
+        Returns the page and an opaque cursor for the next one (None when
+        this is the last page). Paging is keyset on (started_at, _id).
+        """
         db = get_database()
         collection = db[self.collection_name]
         
         query = {"user_id": user_id}
         if status:
             query["status"] = status
+        if cursor:
+            started_at, object_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"started_at": {"$lt": started_at}},
+                {"started_at": started_at, "_id": {"$lt": object_id}},
+            ]
         
-        cursor = collection.find(query).sort("started_at", -1)
+        wanted = set(fields) & LISTABLE_FIELDS if fields else LISTABLE_FIELDS - {"messages"}
+        if include_messages:
+            wanted.add("messages")
+        projection = {field: 1 for field in wanted | {"session_id", "started_at"}}
+        
+        results = collection.find(query, projection).sort(
+            [("started_at", -1), ("_id", -1)]
+        ).limit(limit + 1)
         sessions = []
-        async for session in cursor:
+        with _MONGO_LIST_SESSIONS.time():
+            async for session in results:
+                sessions.append(session)
+        
+        next_cursor = None
+        if len(sessions) > limit:
+            sessions = sessions[:limit]
+            last = sessions[-1]
+            next_cursor = encode_cursor(last["started_at"], last["_id"])
+        
+        for session in sessions:
             session["_id"] = str(session["_id"])
-            sessions.append(session)
         
-        return sessions
+        return sessions, next_cursor
     
     async def add_message(
         self, 
@@ -53,56 +276,36 @@ class SessionService:
         content: str,
         user_info: Optional[UserInfo] = None
     ):
-        """Add a message to the session"""
-        session = await self.get_session(session_id)
-        if not session:
-            return None
-        
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.utcnow().isoformat(),
-            "user": user_info.dict() if user_info and role == MessageRole.USER else None
-        }
-        
-        session["messages"].append(message)
+        """Append a message to the session without rewriting it"""
+        message = _build_message(role, content, user_info)
         
         # Update user info if provided
+        meta_updates = None
         if user_info and role == MessageRole.USER:
-            session["user"] = user_info.dict()
+            meta_updates = {"user": user_info.dict()}
         
-        await redis_client.set_session(session_id, session)
-        return session
+        if not await redis_client.append_message(session_id, message, meta_updates):
+            return None
+        return message
     
-    async def end_session(self, session_id: str) -> bool:
-        """End a session and move it to MongoDB"""
-        session = await self.get_session(session_id)
-        if not session:
-            return False
-        
-        # Update session status
-        session["ended_at"] = datetime.utcnow().isoformat()
-        session["status"] = "ended"
-        
-        # Save to MongoDB
-        db = get_database()
-        collection = db[self.collection_name]
-        await collection.insert_one(session)
-        
-        # Remove from Redis
-        await redis_client.delete_session(session_id)
-        
-        return True
+    async def end_session(self, session_id: str, fence: Optional[int] = None) -> bool:
+        """End a session; the archiver moves it to MongoDB in the background.
+
+        Pass the ``fence`` of a held session lock so a turn in flight can't
+        commit after the session was archived.
+        """
+        ended = await redis_client.mark_ended(session_id, datetime.utcnow().isoformat(), fence=fence)
+        if ended:
+            _SESSIONS_ENDED.inc()
+            session_archiver.notify()
+        return ended
     
     async def get_conversation_history(self, session_id: str) -> List[Dict[str, str]]:
         """Get conversation history for a session"""
-        session = await self.get_session(session_id)
-        if not session:
-            return []
-        
+        messages = await redis_client.get_messages(session_id)
         return [
             {"role": msg["role"], "content": msg["content"]} 
-            for msg in session.get("messages", [])
+            for msg in messages
         ]
 
 session_service = SessionService()
\ No newline at end of file
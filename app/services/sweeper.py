@@ -0,0 +1,71 @@
+from typing import Optional
+import asyncio
+import time
+from app.db.redis import redis_client
+from app.services.archiver import session_archiver
+from app.core.config import settings
+from app.core.metrics import ERRORS, SESSION_EVENTS
+
+_SESSIONS_IDLE_ENDED = SESSION_EVENTS.labels("idle_ended")
+_SWEEP_ERRORS = ERRORS.labels("sweeper")
+
+class IdleSessionSweeper:
+    """Ends sessions nobody has touched for SESSION_IDLE_TIMEOUT seconds.
+
+    Last activity lives in a Redis sorted set; each sweep atomically moves
+    one batch of idle sessions into the archive queue, so sessions reach
+    MongoDB before their Redis TTL runs out. The move is a single Lua
+    script, which makes it safe for every worker on every node to sweep.
+    Sessions whose lock is held are mid-turn and are left live.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = settings.SESSION_IDLE_TIMEOUT,
+        interval: float = settings.SWEEP_INTERVAL,
+        batch_size: int = settings.SWEEP_BATCH_SIZE
+    ):
+        self.idle_timeout = idle_timeout
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.swept = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                _SWEEP_ERRORS.inc()
+                print(f"Error sweeping idle sessions: {e}")
+
+    async def sweep(self) -> int:
+        """Queue every currently idle session for archival; returns the count"""
+        idle_before = time.time() - self.idle_timeout
+        total = 0
+        while True:
+            swept = await redis_client.sweep_idle(idle_before, self.batch_size)
+            total += len(swept)
+            if len(swept) < self.batch_size:
+                break
+        if total:
+            self.swept += total
+            _SESSIONS_IDLE_ENDED.inc(total)
+            print(f"Swept {total} idle session(s) into the archive queue")
+            session_archiver.wake()
+        return total
+
+idle_session_sweeper = IdleSessionSweeper()
@@ -0,0 +1,52 @@
+import os
+
+# Settings require these at import time; tests never reach the real services.
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("GEMINI_API_KEY", "test-gemini-key")
+
+from functools import partial
+import fakeredis.aioredis
+import pytest
+from fastapi import FastAPI
+from mongomock_motor import AsyncMongoMockClient
+from app.api import websocket
+from app.api.endpoints import chat
+from app.db.mongodb import mongodb
+from app.db.redis import redis_client
+from app.services.gemini_service import GeminiService
+from app.services.rate_limiter import rate_limiter
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """An empty in-memory Redis behind the shared client, with the session cache off"""
+    server = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(redis_client, "redis", server)
+    monkeypatch.setattr(redis_client, "cache", None)
+    return server
+
+@pytest.fixture
+def fake_mongo(monkeypatch):
+    """An empty in-memory database behind ``get_database()``"""
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(mongodb, "client", client)
+    monkeypatch.setattr(mongodb, "database", client["test"])
+    return mongodb.database
+
+@pytest.fixture
+def chat_app(monkeypatch, fake_redis):
+    """The chat router on its own app, rate limiting off.
+
+    Returns ``(app, configure)``; ``configure(provider, **socket_options)``
+    puts a GeminiService over ``provider`` behind the endpoints, passes
+    ``socket_options`` to every FrameSocket and returns the service.
+    """
+    monkeypatch.setattr(rate_limiter, "enabled", False)
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+
+    def configure(provider, **socket_options):
+        service = GeminiService(max_concurrency=2, provider=provider)
+        monkeypatch.setattr(chat, "gemini_service", service)
+        monkeypatch.setattr(chat, "FrameSocket", partial(websocket.FrameSocket, **socket_options))
+        return service
+    return app, configure
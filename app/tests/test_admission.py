@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from app.services.admission import AdmissionController, AdmissionRejected, LANE_BATCH, LANE_INTERACTIVE
+
+async def _hold(controller, lane, order, release: asyncio.Event, name):
+    async with controller.slot(lane):
+        order.append(name)
+        await release.wait()
+
+@pytest.mark.asyncio
+async def test_interactive_lane_is_admitted_before_batch():
+    controller = AdmissionController(max_limit=1, min_limit=1, latency_target=10, max_queue=10, max_queue_time=5)
+    order = []
+    release = asyncio.Event()
+
+    first = asyncio.create_task(_hold(controller, LANE_INTERACTIVE, order, release, "first"))
+    await asyncio.sleep(0)
+    waiters = [
+        asyncio.create_task(_hold(controller, LANE_BATCH, order, release, "batch")),
+        asyncio.create_task(_hold(controller, LANE_INTERACTIVE, order, release, "interactive")),
+    ]
+    await asyncio.sleep(0)
+    assert controller.snapshot()["queued"] == {LANE_INTERACTIVE: 1, LANE_BATCH: 1}
+
+    release.set()
+    await asyncio.gather(first, *waiters)
+    assert order == ["first", "interactive", "batch"]
+    assert controller.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_sheds_when_estimated_wait_exceeds_deadline():
+    controller = AdmissionController(max_limit=1, min_limit=1, latency_target=10, max_queue=10, max_queue_time=30)
+    controller.avg_latency = 4.0
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, LANE_INTERACTIVE, [], release, "holder"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.check(LANE_INTERACTIVE, deadline=2.0)
+    assert rejected.value.retry_after == pytest.approx(4.0)
+    controller.check(LANE_INTERACTIVE, deadline=5.0)
+
+    release.set()
+    await holder
+
+@pytest.mark.asyncio
+async def test_queued_request_times_out_and_frees_its_place():
+    controller = AdmissionController(max_limit=1, min_limit=1, latency_target=10, max_queue=10, max_queue_time=0.05)
+    controller.avg_latency = 0.01
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, LANE_INTERACTIVE, [], release, "holder"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected):
+        async with controller.slot(LANE_INTERACTIVE):
+            pass
+    assert controller.queued == 0 and controller.timed_out == 1
+
+    release.set()
+    await holder
+
+def test_limit_backs_off_on_slow_calls_and_recovers_additively():
+    controller = AdmissionController(max_limit=8, min_limit=1, latency_target=1.0, max_queue=10, max_queue_time=5)
+    controller._observe(5.0, ok=True)
+    assert controller.limit == pytest.approx(8 * 0.7)
+
+    # A second slow call inside the same latency window doesn't compound
+    controller._observe(5.0, ok=True)
+    assert controller.limit == pytest.approx(8 * 0.7)
+
+    limit = controller.limit
+    controller._observe(0.1, ok=True)
+    assert controller.limit == pytest.approx(limit + 1 / limit)
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from pymongo.errors import AutoReconnect, BulkWriteError
+from app.db.mongodb import ensure_indexes, get_database, CHAT_SESSIONS_COLLECTION
+from app.db.redis import redis_client
+from app.schemas.chat import MessageRole
+from app.services.archiver import SessionArchiver
+from app.services.session_service import session_service
+
+@pytest_asyncio.fixture
+async def archived(fake_redis, fake_mongo):
+    await ensure_indexes()
+    return get_database()[CHAT_SESSIONS_COLLECTION]
+
+async def _ended_session(user_id: str = "alice") -> str:
+    session_id = await session_service.create_session(user_id)
+    await session_service.add_message(session_id, MessageRole.USER, "hi")
+    await session_service.end_session(session_id)
+    return session_id
+
+@pytest.mark.asyncio
+async def test_failed_batch_stays_claimed_until_its_lease_ends(archived):
+    archiver = SessionArchiver(batch_size=10, lease_seconds=0.1)
+    session_id = await _ended_session()
+
+    async def unavailable(documents):
+        raise AutoReconnect("primary stepped down")
+    archiver._write = unavailable
+    assert await archiver.flush() == 0
+    assert archiver.failed_batches == 1
+    # Hidden from other archivers while the lease lasts
+    assert await redis_client.claim_archive_batch(10, 0.1) == []
+
+    del archiver._write
+    await asyncio.sleep(0.15)
+    assert await archiver.flush() == 1
+    assert (await archived.find_one({"session_id": session_id}))["messages"][0]["content"] == "hi"
+    assert not await redis_client.exists(session_id)
+
+@pytest.mark.asyncio
+async def test_sessions_archived_by_an_earlier_attempt_are_not_duplicated(archived):
+    archiver = SessionArchiver(batch_size=10)
+    done, pending = await _ended_session(), await _ended_session()
+    # An earlier attempt wrote one of them, then lost its lease
+    await archived.insert_one({"session_id": done, "status": "ended", "messages": []})
+
+    assert await archiver.flush() == 2
+    assert await archived.count_documents({}) == 2
+    assert (await archived.find_one({"session_id": done}))["messages"] == []
+    assert len((await archived.find_one({"session_id": pending}))["messages"]) == 1
+
+@pytest.mark.asyncio
+async def test_other_write_errors_are_retried_as_upserts(archived, monkeypatch):
+    archiver = SessionArchiver(batch_size=10)
+    duplicate, failed = await _ended_session(), await _ended_session()
+    collection_type = type(archived)
+    upserted = []
+
+    async def partly_failing_insert(self, documents, ordered=True):
+        by_id = {doc["session_id"]: i for i, doc in enumerate(documents)}
+        raise BulkWriteError({"writeErrors": [
+            {"index": by_id[duplicate], "code": 11000},
+            {"index": by_id[failed], "code": 91},
+        ]})
+
+    # mongomock's bulk_write can't take this pymongo's ReplaceOne; apply them one by one
+    async def recording_bulk_write(self, requests, ordered=True):
+        for request in requests:
+            upserted.append(request._filter["session_id"])
+            await self.replace_one(request._filter, request._doc, upsert=True)
+    monkeypatch.setattr(collection_type, "insert_many", partly_failing_insert)
+    monkeypatch.setattr(collection_type, "bulk_write", recording_bulk_write)
+
+    assert await archiver.flush() == 2
+    assert upserted == [failed]
+    assert (await archived.find_one({"session_id": failed}))["status"] == "ended"
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import pytest
+from app.api.endpoints import chat
+from app.core.security import create_access_token
+from app.db.redis import redis_client, FencingError
+from app.services.llm_provider import StubProvider
+from app.services.session_service import SessionTurn, session_service
+
+REPLY = " ".join(f"word{i}" for i in range(40))
+
+class SocketClient:
+    """Drives the ASGI app over a websocket scope; ``stalled`` stops reading frames"""
+
+    def __init__(self, app, token: str, stalled: bool = False):
+        self.to_server: asyncio.Queue = asyncio.Queue()
+        self.to_client: asyncio.Queue = asyncio.Queue()
+        self.stalled = stalled
+        self.to_server.put_nowait({"type": "websocket.connect"})
+        scope = {
+            "type": "websocket", "path": "/chat/ws", "raw_path": b"/chat/ws", "root_path": "",
+            "scheme": "ws", "query_string": f"token={token}".encode(), "headers": [],
+            "server": ("test", 80), "client": ("test", 1234), "subprotocols": [], "asgi": {"version": "3.0"},
+        }
+        self.task = asyncio.ensure_future(app(scope, self.to_server.get, self._send))
+
+    async def _send(self, message):
+        if self.stalled and message["type"] == "websocket.send":
+            await asyncio.Event().wait()
+        await self.to_client.put(message)
+
+    def send(self, frame: dict):
+        self.to_server.put_nowait({"type": "websocket.receive", "text": json.dumps(frame)})
+
+    async def message(self) -> dict:
+        return await asyncio.wait_for(self.to_client.get(), 2.0)
+
+    async def frame(self) -> dict:
+        message = await self.message()
+        assert message["type"] == "websocket.send", message
+        return json.loads(message["text"])
+
+    async def disconnect(self):
+        self.to_server.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self.task, 2.0)
+
+@pytest.mark.asyncio
+async def test_rejects_invalid_token(chat_app):
+    app, configure = chat_app
+    configure(StubProvider())
+    client = SocketClient(app, "not-a-token")
+
+    closed = await client.message()
+    assert closed["type"] == "websocket.close" and closed["code"] == 1008
+    await asyncio.wait_for(client.task, 2.0)
+
+@pytest.mark.asyncio
+async def test_bound_connection_streams_turns_into_one_session(chat_app):
+    app, configure = chat_app
+    configure(StubProvider(reply="Hello there friend", chunk_words=1, first_token_delay=0))
+    session_id = await session_service.create_session("alice")
+    client = SocketClient(app, create_access_token({"sub": "alice"}))
+    assert (await client.message())["type"] == "websocket.accept"
+
+    client.send({"type": "bind", "session_id": session_id, "user": {"firstName": "Alice"}})
+    assert await client.frame() == {"type": "bound", "session_id": session_id}
+
+    for text in ("hi", "again"):
+        client.send({"type": "message", "message": text})
+        assert await client.frame() == {"type": "session", "session_id": session_id}
+        deltas = []
+        while (frame := await client.frame())["type"] == "delta":
+            deltas.append(frame["delta"])
+        assert frame == {"type": "done", "reply": "Hello there friend", "session_id": session_id}
+        assert "".join(deltas) == "Hello there friend"
+
+    client.send({"type": "ping"})
+    assert await client.frame() == {"type": "pong"}
+    await client.disconnect()
+
+    messages = await redis_client.get_messages(session_id)
+    assert [m["content"] for m in messages] == ["hi", "Hello there friend", "again", "Hello there friend"]
+    # The profile sent at bind time is attached to every user message
+    assert messages[2]["user"]["firstName"] == "Alice"
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_disconnected_and_partial_reply_kept(chat_app):
+    app, configure = chat_app
+    configure(StubProvider(reply=REPLY, chunk_words=1, first_token_delay=0, chunk_delay=0), max_queue=2, send_timeout=0.1)
+    session_id = await session_service.create_session("alice")
+    client = SocketClient(app, create_access_token({"sub": "alice"}), stalled=True)
+    before = chat.WS_CLOSED.labels("slow_consumer").value
+
+    client.send({"type": "bind", "session_id": session_id})
+    client.send({"type": "message", "message": "hi"})
+    await asyncio.wait_for(client.task, 2.0)
+
+    assert chat.WS_CLOSED.labels("slow_consumer").value == before + 1
+    user, assistant = await redis_client.get_messages(session_id)
+    assert user["content"] == "hi"
+    assert assistant["partial"] is True and len(assistant["content"]) < len(REPLY)
+
+@pytest.mark.asyncio
+async def test_reply_cut_short_by_the_provider_is_an_error_not_done(chat_app):
+    app, configure = chat_app
+    configure(StubProvider(reply="Hello there", chunk_words=1, first_token_delay=0, fail_after=1))
+    session_id = await session_service.create_session("alice")
+    client = SocketClient(app, create_access_token({"sub": "alice"}))
+    assert (await client.message())["type"] == "websocket.accept"
+
+    client.send({"type": "bind", "session_id": session_id})
+    client.send({"type": "message", "message": "hi"})
+    assert [(await client.frame())["type"] for _ in range(3)] == ["bound", "session", "delta"]
+    assert await client.frame() == {"type": "error", "status": 502, "detail": "The reply was cut short, please retry"}
+    await client.disconnect()
+
+    _, assistant = await redis_client.get_messages(session_id)
+    assert assistant["content"] == "Hello " and assistant["partial"] is True
+
+@pytest.mark.asyncio
+async def test_turn_that_lost_its_lock_is_reported_busy(chat_app, monkeypatch):
+    app, configure = chat_app
+    configure(StubProvider(reply="Hello", first_token_delay=0))
+    session_id = await session_service.create_session("alice")
+
+    async def commit(turn):
+        raise FencingError("lease lost")
+    monkeypatch.setattr(SessionTurn, "commit", commit)
+    client = SocketClient(app, create_access_token({"sub": "alice"}))
+    assert (await client.message())["type"] == "websocket.accept"
+
+    client.send({"type": "bind", "session_id": session_id})
+    client.send({"type": "message", "message": "hi"})
+    assert [(await client.frame())["type"] for _ in range(3)] == ["bound", "session", "delta"]
+    assert await client.frame() == {
+        "type": "error", "status": 409, "detail": "Another message is being processed for this session"
+    }
+    await client.disconnect()
@@ -0,0 +1,87 @@
+import asyncio
+import time
+import pytest
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+from app.services.gemini_service import FALLBACK_REPLY, GeminiService
+from app.services.llm_provider import StubProvider
+
+def _breaker(**overrides) -> CircuitBreaker:
+    options = dict(
+        window=60, min_calls=4, error_rate=0.5, slow_call_seconds=1.0,
+        slow_call_rate=0.8, open_seconds=0.05, half_open_probes=2
+    )
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+async def _fail(breaker: CircuitBreaker):
+    with pytest.raises(RuntimeError):
+        async with breaker.call():
+            raise RuntimeError("boom")
+
+async def _succeed(breaker: CircuitBreaker):
+    async with breaker.call():
+        pass
+
+@pytest.mark.asyncio
+async def test_opens_on_error_rate_and_fails_fast():
+    breaker = _breaker()
+    await _succeed(breaker)
+    await _fail(breaker)
+    await _succeed(breaker)
+    assert breaker.state == CLOSED
+    await _fail(breaker)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as rejected:
+        breaker.check()
+    assert 0 < rejected.value.retry_after <= 0.05
+    assert breaker.stats()["rejected"] == 1
+
+@pytest.mark.asyncio
+async def test_half_open_probes_close_or_reopen():
+    breaker = _breaker(min_calls=1)
+    await _fail(breaker)
+    await asyncio.sleep(0.06)
+
+    # Only half_open_probes calls are let through at once
+    async with breaker.call():
+        assert breaker.state == HALF_OPEN
+        async with breaker.call():
+            with pytest.raises(CircuitOpenError):
+                async with breaker.call():
+                    pass
+    assert breaker.state == CLOSED and breaker.stats()["window_calls"] == 0
+
+    await _fail(breaker)
+    await asyncio.sleep(0.06)
+    await _fail(breaker)
+    assert breaker.state == OPEN and breaker.times_opened == 3
+
+@pytest.mark.asyncio
+async def test_slow_calls_open_it_and_first_response_counts_for_streams():
+    breaker = _breaker(min_calls=3, slow_call_seconds=0.02, slow_call_rate=0.6)
+    async with breaker.call() as call:
+        call.responded()
+        await asyncio.sleep(0.03)
+    assert breaker.stats()["slow_call_rate"] == 0.0
+
+    for _ in range(2):
+        async with breaker.call():
+            await asyncio.sleep(0.03)
+    assert breaker.state == OPEN
+
+@pytest.mark.asyncio
+async def test_deadline_cancels_call_and_open_breaker_skips_provider():
+    provider = StubProvider(first_token_delay=5.0)
+    service = GeminiService(max_concurrency=2, provider=provider, breaker=_breaker(min_calls=1, open_seconds=60))
+
+    started = time.perf_counter()
+    reply, _ = await service.generate_reply("hello", deadline=0.1)
+    assert reply == FALLBACK_REPLY
+    assert time.perf_counter() - started < 1.0
+    assert service.breaker.state == OPEN and service.admission.in_flight == 0
+
+    reply, _ = await service.generate_reply("hello again")
+    chunks = [chunk async for chunk in service.stream_response("and again")]
+    assert reply == FALLBACK_REPLY and chunks == [FALLBACK_REPLY]
+    assert provider.calls == 1
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import pytest
+from app.api.endpoints import chat
+from app.core.security import create_access_token
+from app.db.redis import redis_client, FencingError
+from app.services.llm_provider import StubProvider
+from app.services.session_service import SessionTurn, session_service
+
+REPLY = " ".join(f"word{i}" for i in range(40))
+
+async def _call(app, path: str, body: dict, disconnect_after: float):
+    """Drive the ASGI app directly, hanging up ``disconnect_after`` seconds in"""
+    sent = []
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    token = create_access_token({"sub": "alice"})
+    scope = {
+        "type": "http", "method": "POST", "path": path, "raw_path": path.encode(), "root_path": "",
+        "scheme": "http", "query_string": b"", "server": ("test", 80), "client": ("test", 1234),
+        "http_version": "1.1", "asgi": {"version": "3.0"},
+        "headers": [(b"content-type", b"application/json"), (b"authorization", f"Bearer {token}".encode())],
+    }
+    await app(scope, receive, send)
+    return sent
+
+def _cancelled(route: str) -> float:
+    return chat.CLIENT_CANCELLED.labels(route).value
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_generation_and_skips_write(chat_app):
+    app, configure = chat_app
+    service = configure(StubProvider(first_token_delay=5.0))
+    session_id = await session_service.create_session("alice")
+    before = _cancelled("message")
+
+    sent = await asyncio.wait_for(
+        _call(app, "/chat/message", {"message": "hi", "user_id": "alice", "session_id": session_id}, 0.1), 2.0
+    )
+
+    assert sent[0]["status"] == chat.CLIENT_CLOSED_REQUEST
+    assert _cancelled("message") == before + 1
+    assert service.admission.in_flight == 0
+    assert await redis_client.get_messages(session_id) == []
+
+@pytest.mark.asyncio
+async def test_stream_disconnect_keeps_partial_reply(chat_app):
+    app, configure = chat_app
+    service = configure(StubProvider(reply=REPLY, first_token_delay=0.01, chunk_delay=0.05, chunk_words=1))
+    session_id = await session_service.create_session("alice")
+    before = _cancelled("stream")
+
+    await asyncio.wait_for(
+        _call(app, "/chat/message/stream", {"message": "hi", "user_id": "alice", "session_id": session_id}, 0.2), 2.0
+    )
+
+    user, assistant = await redis_client.get_messages(session_id)
+    assert user["content"] == "hi"
+    assert assistant["partial"] is True
+    assert 0 < len(assistant["content"]) < len(REPLY)
+    assert _cancelled("stream") == before + 1
+    assert service.admission.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_stream_cut_short_by_the_provider_is_stored_partial(chat_app):
+    app, configure = chat_app
+    configure(StubProvider(reply="Hello there", chunk_words=1, first_token_delay=0, fail_after=1))
+    session_id = await session_service.create_session("alice")
+    before = _cancelled("stream")
+
+    sent = await asyncio.wait_for(
+        _call(app, "/chat/message/stream", {"message": "hi", "user_id": "alice", "session_id": session_id}, 5.0), 2.0
+    )
+
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body").decode()
+    assert "event: done" not in body
+    assert 'event: error\ndata: {"detail": "The reply was cut short, please retry"}' in body
+    _, assistant = await redis_client.get_messages(session_id)
+    assert assistant["content"] == "Hello " and assistant["partial"] is True
+    assert _cancelled("stream") == before
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failure, detail", [
+    (FencingError("lease lost"), "Another message is being processed for this session"),
+    (ConnectionError("redis down"), "An error occurred while processing your message"),
+])
+async def test_stream_reports_why_the_reply_was_not_stored(chat_app, monkeypatch, failure, detail):
+    app, configure = chat_app
+    configure(StubProvider(reply="Hello", first_token_delay=0))
+    session_id = await session_service.create_session("alice")
+
+    async def commit(turn):
+        raise failure
+    monkeypatch.setattr(SessionTurn, "commit", commit)
+
+    sent = await asyncio.wait_for(
+        _call(app, "/chat/message/stream", {"message": "hi", "user_id": "alice", "session_id": session_id}, 5.0), 2.0
+    )
+
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body").decode()
+    assert "event: done" not in body
+    assert f'event: error\ndata: {{"detail": "{detail}"}}' in body
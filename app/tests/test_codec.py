@@ -0,0 +1,39 @@
+import json
+import pytest
+from app.db.codec import Codec, CodecError, orjson, msgpack, zstandard
+
+SESSION_MESSAGE = {"role": "user", "content": "How many sets? " * 200, "tokens": 750, "user": None}
+
+def _available():
+    codecs = [("json", "none"), ("json", "zlib")]
+    if orjson:
+        codecs.append(("orjson", "none"))
+    if msgpack:
+        codecs.append(("msgpack", "none"))
+    if zstandard:
+        codecs.append(("json", "zstd"))
+    return codecs
+
+@pytest.mark.parametrize("fmt,compression", _available())
+def test_round_trip(fmt, compression):
+    codec = Codec(fmt, compression, compress_threshold=64)
+    for value in (SESSION_MESSAGE, "ended", 3, None):
+        assert codec.decode(codec.encode(value)) == value
+
+def test_compression_only_above_threshold():
+    codec = Codec("json", "zlib", compress_threshold=1024)
+    small = codec.encode({"content": "hi"})
+    large = codec.encode(SESSION_MESSAGE)
+    assert small[0] >> 4 & 0x07 == 0
+    assert large[0] >> 4 & 0x07 == 1
+    assert len(large) < len(json.dumps(SESSION_MESSAGE))
+
+def test_reads_payloads_written_by_other_codecs_and_legacy_json():
+    reader = Codec("json")
+    assert reader.decode(Codec("json", "zlib", 0).encode(SESSION_MESSAGE)) == SESSION_MESSAGE
+    assert reader.decode(json.dumps(SESSION_MESSAGE).encode()) == SESSION_MESSAGE
+    assert reader.decode(b"7") == 7
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(CodecError):
+        Codec("yaml")
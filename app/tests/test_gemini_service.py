@@ -0,0 +1,90 @@
+import asyncio
+import time
+import pytest
+from app.services.gemini_service import FALLBACK_REPLY, GeminiService, StreamInterrupted
+from app.services.llm_provider import GeminiProvider, StubProvider
+
+class SlowFakeModel:
+    """Stands in for genai.GenerativeModel with a blocking, slow call"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def generate_content(self, prompt: str, stream: bool = False, request_options: dict = None):
+        if stream:
+            return self._stream()
+        time.sleep(self.delay)
+        return type("Response", (), {"text": f"reply to {prompt[-20:]}"})()
+
+    def _stream(self):
+        for word in ["one", " two", " three"]:
+            time.sleep(self.delay)
+            yield type("Chunk", (), {"text": word})()
+
+@pytest.mark.asyncio
+async def test_event_loop_stays_responsive_during_generation():
+    service = GeminiService(max_concurrency=4, provider=GeminiProvider(SlowFakeModel(delay=0.5), executor_workers=4))
+
+    gaps = []
+
+    async def ticker():
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    tick_task = asyncio.create_task(ticker())
+    try:
+        replies = await asyncio.gather(
+            *(service.generate_response(f"message {i}") for i in range(4))
+        )
+    finally:
+        tick_task.cancel()
+        service.shutdown()
+
+    assert all(reply.startswith("reply to") for reply in replies)
+    assert len(gaps) > 10
+    assert max(gaps) < 0.2
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_queues_excess_generations():
+    service = GeminiService(max_concurrency=1, provider=GeminiProvider(SlowFakeModel(delay=0.2), executor_workers=4))
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(service.generate_response(f"m{i}") for i in range(3)))
+    finally:
+        service.shutdown()
+    elapsed = time.perf_counter() - started
+
+    stats = service.stats.snapshot()
+    assert elapsed >= 0.6
+    assert stats["admitted"] == 3
+    assert stats["max_queue_time"] >= 0.35
+    assert stats["waiting"] == 0 and stats["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_stream_response_yields_chunks_in_order():
+    service = GeminiService(max_concurrency=1, provider=GeminiProvider(SlowFakeModel(delay=0.01), executor_workers=1))
+    try:
+        chunks = [chunk async for chunk in service.stream_response("hello")]
+    finally:
+        service.shutdown()
+
+    assert chunks == ["one", " two", " three"]
+    assert service.stats.snapshot()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_stream_failure_after_the_first_chunk_is_raised():
+    provider = StubProvider(reply="Hello there", chunk_words=1, first_token_delay=0, fail=True, fail_after=1)
+    service = GeminiService(max_concurrency=1, provider=provider)
+    assert [chunk async for chunk in service.stream_response("hello")] == [FALLBACK_REPLY]
+
+    provider.fail = False
+    chunks = []
+    with pytest.raises(StreamInterrupted):
+        async for chunk in service.stream_response("hello"):
+            chunks.append(chunk)
+    assert chunks == ["Hello "]
@@ -0,0 +1,68 @@
+import asyncio
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.endpoints import health
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.health_prober import DOWN, UNKNOWN, UP, HealthProber
+
+async def _ok():
+    pass
+
+async def _hangs():
+    await asyncio.sleep(10)
+
+async def _fails():
+    raise ConnectionError("refused")
+
+@pytest.mark.asyncio
+async def test_probes_are_bounded_and_go_stale():
+    prober = HealthProber({"db": _ok, "cache": _hangs, "queue": _fails}, timeout=0.05, stale_after=60)
+    assert prober.status("db") == UNKNOWN
+
+    started = time.perf_counter()
+    await prober.probe()
+    assert time.perf_counter() - started < 1
+
+    snapshot = prober.snapshot()
+    assert snapshot["db"]["status"] == UP and "error" not in snapshot["db"]
+    assert snapshot["cache"]["status"] == DOWN and "0.05s" in snapshot["cache"]["error"]
+    assert snapshot["queue"]["status"] == DOWN and snapshot["queue"]["error"] == "refused"
+    assert not prober.all_up()
+
+    # A result the prober hasn't refreshed in time no longer counts as up
+    prober.results["db"].checked_at -= 61
+    assert prober.status("db") == UNKNOWN
+
+@pytest.mark.asyncio
+async def test_readiness_needs_dependencies_and_a_closed_circuit(monkeypatch):
+    prober = HealthProber({"db": _ok}, timeout=0.05)
+    breaker = CircuitBreaker("test", min_calls=1, error_rate=0.5)
+    monkeypatch.setattr(health, "health_prober", prober)
+    monkeypatch.setattr(health.gemini_service, "breaker", breaker)
+    app = FastAPI()
+    app.include_router(health.router, prefix="/api")
+    client = TestClient(app)
+
+    assert client.get("/api/health/live").json() == {"status": "alive"}
+    not_probed = client.get("/api/health/ready")
+    assert not_probed.status_code == 503 and not_probed.json()["checks"]["db"] == UNKNOWN
+
+    await prober.probe()
+    ready = client.get("/api/health/ready")
+    assert ready.status_code == 200
+    assert ready.json() == {"status": "ready", "checks": {"db": UP, "llm_circuit": "closed"}}
+    assert client.get("/api/health").json()["services"] == {"api": UP, "db": UP}
+
+    with pytest.raises(RuntimeError):
+        async with breaker.call():
+            raise RuntimeError("provider down")
+    assert client.get("/api/health/ready").status_code == 503
+
+    # Nothing calls the provider while the instance is out of rotation;
+    # the cool-down ending is enough to come back
+    breaker._opened_at -= breaker.open_seconds
+    ready = client.get("/api/health/ready")
+    assert ready.status_code == 200 and ready.json()["checks"]["llm_circuit"] == "half_open"
+    assert client.get("/api/health").json()["llm_circuit"]["state"] == "half_open"
@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from app.core.http_pool import HTTPPool
+
+async def _keep_alive_server(delay: float = 0.0):
+    """Minimal HTTP/1.1 server answering "ok" on persistent connections; counts connections"""
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                await asyncio.sleep(delay)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, connections, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+
+@pytest.mark.asyncio
+async def test_requests_reuse_pooled_connections():
+    server, connections, url = await _keep_alive_server()
+    pool = HTTPPool(http2=False)
+    try:
+        for _ in range(3):
+            response = await pool.client.get(url)
+            assert response.text == "ok"
+        stats = pool.stats()["hosts"]["127.0.0.1"]
+    finally:
+        await pool.aclose()
+        server.close()
+
+    assert len(connections) == 1
+    assert stats["requests"] == 3 and stats["new_connections"] == 1
+
+@pytest.mark.asyncio
+async def test_connections_per_host_are_bounded():
+    server, connections, url = await _keep_alive_server(delay=0.05)
+    pool = HTTPPool(max_connections_per_host=2, http2=False)
+    try:
+        responses = await asyncio.gather(*(pool.client.get(url) for _ in range(6)))
+        stats = pool.stats()["hosts"]["127.0.0.1"]
+    finally:
+        await pool.aclose()
+        server.close()
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len(connections) == 2
+    assert stats["requests"] == 6 and stats["new_connections"] == 2
+    assert stats["reuse_ratio"] == pytest.approx(4 / 6)
@@ -0,0 +1,96 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app.core.http_pool import http_pool
+from app.core.tracing import start_trace
+from app.services.llm_provider import HedgedProvider, LLMProvider, OpenRouterProvider, StubProvider
+
+class TrackedStub(StubProvider):
+    """Stub that records the timeouts it was given and whether its stream was abandoned before finishing"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.closed_early = False
+        self.timeouts = []
+
+    async def stream(self, prompt: str, timeout=None):
+        self.timeouts.append(timeout)
+        finished = False
+        try:
+            async for chunk in super().stream(prompt, timeout):
+                yield chunk
+            finished = True
+        finally:
+            self.closed_early = not finished
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged():
+    primary, secondary = StubProvider(reply="from primary", first_token_delay=0.01), StubProvider(reply="from secondary")
+    provider = HedgedProvider(primary, secondary, min_samples=100, initial_delay=0.2)
+
+    assert await provider.generate("hi") == "from primary"
+    assert secondary.calls == 0 and provider.hedged == 0
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_loser_cancelled():
+    primary = TrackedStub(reply="from primary", first_token_delay=1.0)
+    secondary = TrackedStub(reply="from secondary", first_token_delay=0.01)
+    provider = HedgedProvider(primary, secondary, min_samples=100, initial_delay=0.05)
+
+    started = time.perf_counter()
+    reply = await provider.generate("hi", timeout=30)
+
+    assert reply == "from secondary"
+    assert primary.timeouts == secondary.timeouts == [30]
+    assert time.perf_counter() - started < 0.5
+    assert primary.closed_early
+    assert provider.stats()["secondary_wins"] == 1
+
+@pytest.mark.asyncio
+async def test_failing_primary_fails_over_before_hedge_point():
+    primary = StubProvider(first_token_delay=0.01, fail=True)
+    secondary = TrackedStub(reply="from secondary", first_token_delay=0.01)
+    provider = HedgedProvider(primary, secondary, min_samples=100, initial_delay=5.0)
+
+    assert await asyncio.wait_for(provider.generate("hi", timeout=30), 1.0) == "from secondary"
+    assert provider.failovers == 1
+    # The request's budget, not what was left of the hedge wait
+    assert secondary.timeouts == [30]
+
+    secondary.fail = True
+    with pytest.raises(RuntimeError):
+        await provider.generate("hi")
+
+def test_hedge_delay_tracks_primary_p95():
+    provider = HedgedProvider(LLMProvider(), LLMProvider(), window=100, min_samples=10, initial_delay=2.0)
+    assert provider.hedge_delay() == 2.0
+    provider._first_chunk.extend(i / 100 for i in range(1, 101))
+    assert provider.hedge_delay() == pytest.approx(0.96)
+
+@pytest.mark.asyncio
+async def test_openrouter_stream_parses_sse_deltas(monkeypatch):
+    body = (
+        ": keep-alive\n\n"
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}\n\n'
+        'data: {"choices": [{"delta": {"content": "Hello"}}]}\n\n'
+        'data: {"choices": [{"delta": {"content": " there"}}]}\n\n'
+        "data: [DONE]\n\n"
+    )
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    provider = OpenRouterProvider(api_key="key", base_url="https://llm.test/v1", model="some/model")
+    monkeypatch.setattr(http_pool, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(http_pool, "_loop", asyncio.get_running_loop())
+
+    trace = start_trace()
+    chunks = [chunk async for chunk in provider.stream("hi")]
+    assert chunks == ["Hello", " there"]
+    assert str(requests[0].url) == "https://llm.test/v1/chat/completions"
+    assert requests[0].headers["Authorization"] == "Bearer key"
+    assert requests[0].headers["traceparent"].startswith(f"00-{trace.trace_id}-")
+    assert "traceparent" not in provider.headers
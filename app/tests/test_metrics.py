@@ -0,0 +1,35 @@
+import pytest
+from app.core import metrics
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_latency_seconds", "Test", ["op"], buckets=(0.1, 1.0))
+    child = histogram.labels("read")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        child.observe(value)
+
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{op="read",le="0.1"} 2' in lines
+    assert 'test_latency_seconds_bucket{op="read",le="1"} 3' in lines
+    assert 'test_latency_seconds_bucket{op="read",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{op="read"} 4' in lines
+    assert histogram.labels("read") is child
+
+def test_counter_and_label_escaping():
+    counter = metrics.Counter("test_events", "Test", ["kind"])
+    counter.labels('say "hi"').inc(2)
+    assert 'test_events_total{kind="say \\"hi\\""} 2' in counter.render()
+    with pytest.raises(ValueError):
+        counter.labels("a", "b")
+
+@pytest.mark.asyncio
+async def test_timed_decorator_observes_failures_too():
+    histogram = metrics.Histogram("test_op_seconds", "Test", ["method"])
+    child = histogram.labels("boom")
+
+    @metrics.timed(child)
+    async def boom():
+        raise RuntimeError()
+
+    with pytest.raises(RuntimeError):
+        await boom()
+    assert child.count == 1
@@ -0,0 +1,44 @@
+from app.services.prompt_builder import PromptBuilder, estimate_tokens
+
+def _turns(count: int, content: str):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i}:{content}"}
+        for i in range(count)
+    ]
+
+def test_estimate_tokens_scales_with_length():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hi") == 1
+    assert estimate_tokens("x" * 400) == 100
+
+def test_build_keeps_most_recent_turns_within_budget():
+    builder = PromptBuilder(token_budget=200)
+    history = _turns(50, "y" * 40)
+
+    prompt = builder.build("", history, "latest question")
+
+    assert estimate_tokens(prompt) <= 200
+    assert "49:" in prompt
+    assert "User: 0:" not in prompt
+    assert prompt.endswith("User: latest question\nAssistant:")
+
+def test_build_uses_cached_token_counts():
+    builder = PromptBuilder(token_budget=100)
+    history = [
+        {"role": "user", "content": "short", "tokens": 1000},
+        {"role": "assistant", "content": "recent", "tokens": 2},
+    ]
+
+    prompt = builder.build("", history, "next")
+
+    assert "Assistant: recent" in prompt
+    assert "User: short" not in prompt
+
+def test_oversized_message_drops_older_history():
+    builder = PromptBuilder(token_budget=100)
+    history = _turns(4, "z" * 10) + [{"role": "assistant", "content": "w" * 2000}]
+
+    prompt = builder.build("User context:\nHeight: 180cm\n\n", history, "hi")
+
+    assert "Previous conversation" not in prompt
+    assert prompt.startswith("User context:")
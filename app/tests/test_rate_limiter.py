@@ -0,0 +1,59 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from app.api import dependencies
+from app.core.security import create_access_token
+from app.services.rate_limiter import RateLimiter, RateLimit
+
+pytestmark = pytest.mark.usefixtures("fake_redis")
+
+def test_rate_limit_spec_parsing():
+    limit = RateLimit("30/minute")
+    assert limit.capacity == 30 and limit.refill_per_second == 0.5
+    assert RateLimit("5/seconds").period == 1
+    with pytest.raises(ValueError):
+        RateLimit("often")
+
+@pytest.mark.asyncio
+async def test_bucket_rejects_once_empty():
+    limiter = RateLimiter({"message": "3/minute"}, enabled=True, local_fraction=0)
+    decisions = [await limiter.check("message", "alice") for _ in range(4)]
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert decisions[-1].headers()["Retry-After"] == "20"
+    # Buckets are per identity and per route
+    assert (await limiter.check("message", "bob")).allowed
+    assert await limiter.check("unlimited", "alice") is None
+
+@pytest.mark.asyncio
+async def test_local_admissions_are_charged_at_next_sync():
+    limiter = RateLimiter({"message": "10/minute"}, enabled=True, local_fraction=0.5, sync_interval=60)
+    decisions = [await limiter.check("message", "alice") for _ in range(11)]
+
+    assert limiter.local_hits > 0
+    assert limiter.redis_checks < 11
+    # Every admission was counted: exactly the bucket's capacity got through
+    assert sum(d.allowed for d in decisions) == 10
+    assert not decisions[-1].allowed
+
+def test_dependency_sets_headers_and_returns_429(monkeypatch):
+    monkeypatch.setattr(
+        dependencies, "rate_limiter",
+        RateLimiter({"ping": "2/minute"}, enabled=True, local_fraction=0)
+    )
+    app = FastAPI()
+
+    @app.get("/ping", dependencies=[Depends(dependencies.rate_limit("ping"))])
+    async def ping():
+        return {"ok": True}
+
+    token = create_access_token({"sub": "alice"})
+    with TestClient(app) as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        first = client.get("/ping", headers=headers)
+        assert first.status_code == 200
+        assert first.headers["X-RateLimit-Limit"] == "2"
+        assert first.headers["X-RateLimit-Remaining"] == "1"
+        client.get("/ping", headers=headers)
+        limited = client.get("/ping", headers=headers)
+        assert limited.status_code == 429
+        assert int(limited.headers["Retry-After"]) > 0
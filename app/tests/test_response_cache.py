@@ -0,0 +1,36 @@
+import pytest
+from app.services.response_cache import ResponseCache, CACHE_BYPASS, CACHE_HIT_LOCAL, CACHE_HIT_REDIS, CACHE_MISS
+
+pytestmark = pytest.mark.usefixtures("fake_redis")
+
+def _cache(**kwargs):
+    options = dict(enabled=True, ttl=60, max_history=2, max_entry_bytes=1024, local_max_bytes=1024, local_ttl=60)
+    options.update(kwargs)
+    return ResponseCache(**options)
+
+def test_normalized_messages_share_a_key_but_contexts_do_not():
+    cache = _cache()
+    assert cache.key_for("What is FastAPI?", "ctx", []) == cache.key_for("  what is   fastapi ", "ctx", None)
+    assert cache.key_for("What is FastAPI?", "ctx", []) != cache.key_for("What is FastAPI?", "other", [])
+    history = [{"role": "user", "content": str(i)} for i in range(3)]
+    assert cache.key_for("hi", "ctx", history) is None
+
+@pytest.mark.asyncio
+async def test_local_then_redis_hits():
+    cache = _cache()
+    key = cache.key_for("hello", "ctx", [])
+    assert await cache.get(key) == (None, CACHE_MISS)
+    await cache.put(key, "Hi there")
+    assert await cache.get(key) == ("Hi there", CACHE_HIT_LOCAL)
+
+    other_worker = ResponseCache(enabled=True, ttl=60, max_history=2, max_entry_bytes=1024,
+                                 local_max_bytes=1024, local_ttl=60)
+    assert await other_worker.get(key) == ("Hi there", CACHE_HIT_REDIS)
+    assert await cache.get(None) == (None, CACHE_BYPASS)
+
+@pytest.mark.asyncio
+async def test_oversized_replies_are_not_stored():
+    cache = _cache(max_entry_bytes=16)
+    key = cache.key_for("hello", "ctx", [])
+    await cache.put(key, "x" * 100)
+    assert await cache.get(key) == (None, CACHE_MISS)
@@ -0,0 +1,80 @@
+import pytest
+from app.db.redis import redis_client, FencingError
+from app.db.session_cache import SessionCache
+from app.services.session_service import session_service
+
+def _put(cache, session_id, version=1, size=10, messages=None):
+    messages = messages or []
+    cache.put(session_id, {"session_id": session_id}, size, messages, [size] * len(messages), len(messages), version)
+
+def test_lru_evicts_by_entry_count_and_bytes():
+    cache = SessionCache(max_entries=2, max_bytes=100, max_messages=10)
+    _put(cache, "a")
+    _put(cache, "b")
+    cache.get("a", 10)
+    _put(cache, "c")
+    assert cache.get_meta("b") is None
+    assert cache.get_meta("a") is not None
+
+    _put(cache, "d", size=90)
+    assert cache.stats()["bytes"] <= 100
+    assert cache.stats()["evictions"] == 2
+
+def test_older_read_does_not_overwrite_newer_entry():
+    cache = SessionCache(max_entries=10, max_bytes=10_000, max_messages=10)
+    _put(cache, "s", version=3, messages=[{"content": "new"}])
+    _put(cache, "s", version=2, messages=[])
+    meta, messages, total = cache.get("s", 10)
+    assert messages == [{"content": "new"}] and total == 1
+
+def test_append_invalidates_when_a_write_was_missed():
+    cache = SessionCache(max_entries=10, max_bytes=10_000, max_messages=2)
+    _put(cache, "s", version=1)
+    cache.append("s", [{"content": "a"}, {"content": "b"}, {"content": "c"}], [1, 1, 1], None, version=2)
+    _, messages, total = cache.get("s", 2)
+    assert [m["content"] for m in messages] == ["b", "c"] and total == 3
+
+    cache.append("s", [{"content": "d"}], [1], None, version=5)
+    assert cache.get("s", 2) is None
+    assert cache.stats()["invalidations"] == 1
+
+def test_read_started_before_an_invalidation_is_not_cached():
+    cache = SessionCache(max_entries=1, max_bytes=10_000, max_messages=10)
+    started = cache.epoch
+    cache.invalidate("s")
+    cache.put("s", {}, 10, [], [], 0, version=1, read_epoch=started)
+    assert cache.get_meta("s") is None
+    cache.put("s", {}, 10, [], [], 0, version=1, read_epoch=cache.epoch)
+    assert cache.get_meta("s") is not None
+
+    # Past the tombstone bound, reads older than the dropped tombstone are refused
+    started = cache.epoch
+    cache.invalidate("a")
+    cache.invalidate("b")
+    cache.put("a", {}, 10, [], [], 0, version=1, read_epoch=started)
+    assert cache.get_meta("a") is None
+
+@pytest.mark.asyncio
+async def test_turn_under_the_lock_checks_the_cached_version(fake_redis, monkeypatch):
+    cache = SessionCache(max_entries=10, max_bytes=10_000, max_messages=10)
+    session_id = await session_service.create_session("alice")
+    monkeypatch.setattr(redis_client, "cache", cache)
+    await redis_client.load_session(session_id, 10)
+    fence = await redis_client.acquire_lock(session_id, 30_000)
+
+    # Unchanged in Redis: served from the cache
+    assert (await session_service.load_turn(session_id, fence=fence)).history == []
+    assert cache.stats()["hits"] == 1
+
+    # Another worker writes; its invalidation hasn't arrived yet
+    monkeypatch.setattr(redis_client, "cache", None)
+    await redis_client.append_messages(session_id, [{"role": "user", "content": "elsewhere"}])
+    monkeypatch.setattr(redis_client, "cache", cache)
+
+    assert (await session_service.load_turn(session_id)).history == []
+    locked = await session_service.load_turn(session_id, fence=fence)
+    assert [m["content"] for m in locked.history] == ["elsewhere"]
+
+    await redis_client.release_lock(session_id, fence)
+    with pytest.raises(FencingError):
+        await session_service.load_turn(session_id, fence=fence)
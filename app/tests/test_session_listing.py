@@ -0,0 +1,65 @@
+import pytest
+from bson import ObjectId
+from app.db.mongodb import get_database, CHAT_SESSIONS_COLLECTION
+from app.services.session_service import InvalidCursorError, decode_cursor, encode_cursor, session_service
+
+pytestmark = pytest.mark.usefixtures("fake_mongo")
+
+async def _archive(*sessions):
+    await get_database()[CHAT_SESSIONS_COLLECTION].insert_many([
+        {
+            "session_id": session_id,
+            "user_id": user_id,
+            "user": None,
+            "started_at": started_at,
+            "ended_at": started_at,
+            "status": status,
+            "messages": [{"role": "user", "content": "hi"}],
+        }
+        for session_id, user_id, started_at, status in sessions
+    ])
+
+def test_cursor_round_trip_and_garbage():
+    object_id = ObjectId()
+    assert decode_cursor(encode_cursor("2024-01-01T00:00:00", object_id)) == ("2024-01-01T00:00:00", object_id)
+    for cursor in ("not-a-cursor", encode_cursor("2024", ObjectId())[:-3], "WyJhIl0"):
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(cursor)
+
+@pytest.mark.asyncio
+async def test_pages_cover_every_session_once_newest_first():
+    # s2 and s3 share a start time; _id breaks the tie
+    await _archive(
+        ("s1", "alice", "2024-01-01", "ended"),
+        ("s2", "alice", "2024-01-02", "ended"),
+        ("s3", "alice", "2024-01-02", "active"),
+        ("s4", "alice", "2024-01-03", "ended"),
+        ("s5", "alice", "2024-01-04", "ended"),
+        ("other", "bob", "2024-01-05", "ended"),
+    )
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = await session_service.get_user_sessions("alice", limit=2, cursor=cursor)
+        assert len(page) <= 2
+        seen += [session["session_id"] for session in page]
+        if cursor is None:
+            break
+    assert seen == ["s5", "s4", "s3", "s2", "s1"]
+
+    ended, cursor = await session_service.get_user_sessions("alice", status="ended", limit=10)
+    assert [session["session_id"] for session in ended] == ["s5", "s4", "s2", "s1"] and cursor is None
+
+@pytest.mark.asyncio
+async def test_fields_and_include_messages_narrow_the_projection():
+    await _archive(("s1", "alice", "2024-01-01", "ended"))
+
+    (default,), _ = await session_service.get_user_sessions("alice")
+    assert "messages" not in default and default["status"] == "ended"
+    assert isinstance(default["_id"], str)
+
+    (narrow,), _ = await session_service.get_user_sessions("alice", fields=["status", "password"])
+    assert set(narrow) == {"_id", "session_id", "started_at", "status"}
+
+    (full,), _ = await session_service.get_user_sessions("alice", fields=["status"], include_messages=True)
+    assert full["messages"] == [{"role": "user", "content": "hi"}]
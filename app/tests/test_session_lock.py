@@ -0,0 +1,155 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.api.endpoints import chat
+from app.core.metrics import SESSION_EVENTS
+from app.db.redis import redis_client, FencingError
+from app.schemas.chat import EndSessionRequest, MessageRequest
+from app.services.session_lock import SessionLockManager, SessionBusyError
+from app.services.session_service import session_service
+
+class RecordingGenerator:
+    """Stands in for GeminiService.generate_reply; records the history each turn saw"""
+
+    def __init__(self, delay: float = 0.005):
+        self.delay = delay
+        self.calls = 0
+        self.seen_history = []
+
+    async def generate_reply(self, message, conversation_history=None, user_info=None, **kwargs):
+        self.calls += 1
+        self.seen_history.append(len(conversation_history or []))
+        await asyncio.sleep(self.delay)
+        return f"reply to {message}", "bypass"
+
+@pytest.fixture
+def locked_chat(monkeypatch, fake_redis):
+    generator = RecordingGenerator()
+    monkeypatch.setattr(chat, "gemini_service", generator)
+
+    def use_policy(policy, **kwargs):
+        manager = SessionLockManager(policy=policy, lease_seconds=5, wait_timeout=10, max_hold=60, **kwargs)
+        monkeypatch.setattr(chat, "session_locks", manager)
+        return manager
+    return generator, use_policy
+
+@pytest.mark.asyncio
+async def test_parallel_turns_lose_no_messages(locked_chat):
+    generator, use_policy = locked_chat
+    use_policy("queue", retry_interval=0.001)
+    session_id = await session_service.create_session("user-1")
+
+    turns = 30
+    await asyncio.gather(*(
+        chat._run_turn(MessageRequest(message=f"m{i}", session_id=session_id, user_id="user-1"))
+        for i in range(turns)
+    ))
+
+    messages = await redis_client.get_messages(session_id)
+    assert len(messages) == 2 * turns
+    # Every turn's reply directly follows its own message, and each turn saw
+    # all turns committed before it.
+    for user, assistant in zip(messages[::2], messages[1::2]):
+        assert user["role"] == "user" and assistant["role"] == "assistant"
+        assert assistant["content"] == f"reply to {user['content']}"
+    assert sorted(generator.seen_history) == [2 * i for i in range(turns)]
+
+@pytest.mark.asyncio
+async def test_reject_policy_fails_fast_while_a_turn_runs(locked_chat):
+    generator, use_policy = locked_chat
+    manager = use_policy("reject")
+    session_id = await session_service.create_session("user-1")
+
+    async with manager.hold(session_id):
+        with pytest.raises(SessionBusyError):
+            await chat._run_turn(MessageRequest(message="hi", session_id=session_id, user_id="user-1"))
+    await chat._run_turn(MessageRequest(message="hi", session_id=session_id, user_id="user-1"))
+    assert generator.calls == 1
+
+@pytest.mark.asyncio
+async def test_coalesce_policy_shares_duplicate_in_flight_requests(locked_chat):
+    generator, use_policy = locked_chat
+    manager = use_policy("coalesce")
+    session_id = await session_service.create_session("user-1")
+    request = MessageRequest(message="hi", session_id=session_id, user_id="user-1")
+
+    key = (session_id, "user-1", "hi")
+    results = await asyncio.gather(*(
+        manager.coalesce(key, lambda: chat._run_turn(request)) for _ in range(5)
+    ))
+
+    assert generator.calls == 1
+    assert len({reply.reply for reply, _ in results}) == 1
+    assert len(await redis_client.get_messages(session_id)) == 2
+
+@pytest.mark.asyncio
+async def test_commit_with_a_stale_fence_is_refused(locked_chat):
+    _, use_policy = locked_chat
+    session_id = await session_service.create_session("user-1")
+
+    stale = await redis_client.acquire_lock(session_id, lease_ms=5000)
+    await redis_client.redis.delete(redis_client._lock_key(session_id))  # lease expired
+    current = await redis_client.acquire_lock(session_id, lease_ms=5000)
+    assert current > stale
+
+    with pytest.raises(FencingError):
+        await redis_client.append_messages(session_id, [{"role": "user", "content": "late"}], fence=stale)
+    assert await redis_client.append_messages(session_id, [{"role": "user", "content": "ok"}], fence=current)
+    assert [m["content"] for m in await redis_client.get_messages(session_id)] == ["ok"]
+
+@pytest.mark.asyncio
+async def test_fenced_write_gives_up_on_a_lock_that_keeps_changing(fake_redis, monkeypatch):
+    session_id = await session_service.create_session("user-1")
+    fence = await redis_client.acquire_lock(session_id, lease_ms=5000)
+    watch_fence = redis_client._watch_fence
+    attempts = 0
+
+    async def renewed_under_the_watch(pipe, session_id, fence):
+        nonlocal attempts
+        attempts += 1
+        await watch_fence(pipe, session_id, fence)
+        await redis_client.renew_lock(session_id, fence, 5000)
+
+    monkeypatch.setattr(redis_client, "_watch_fence", renewed_under_the_watch)
+    with pytest.raises(FencingError):
+        await redis_client.append_messages(session_id, [{"role": "user", "content": "x"}], fence=fence)
+    with pytest.raises(FencingError):
+        await redis_client.mark_ended(session_id, "2024-01-01T00:00:00", fence=fence)
+    assert attempts == 6
+    assert await redis_client.get_messages(session_id) == []
+    assert (await redis_client.get_session_meta(session_id))["status"] == "active"
+
+@pytest.mark.asyncio
+async def test_turn_on_a_session_archived_mid_generation_is_refused(locked_chat, monkeypatch):
+    generator, use_policy = locked_chat
+    use_policy("queue")
+    session_id = await session_service.create_session("user-1")
+
+    async def archived_meanwhile(message, **kwargs):
+        await redis_client.complete_archive([session_id])
+        return "too late", "bypass"
+    monkeypatch.setattr(generator, "generate_reply", archived_meanwhile)
+    rejected = SESSION_EVENTS.labels("turn_rejected").value
+
+    with pytest.raises(HTTPException) as error:
+        await chat._run_turn(MessageRequest(message="hi", session_id=session_id, user_id="user-1"))
+    assert error.value.status_code == 410
+    assert SESSION_EVENTS.labels("turn_rejected").value == rejected + 1
+    assert not await redis_client.exists(session_id)
+
+@pytest.mark.asyncio
+async def test_ending_a_session_waits_for_the_turn_in_flight(locked_chat):
+    generator, use_policy = locked_chat
+    # Ending queues for the lock even under the reject policy
+    use_policy("reject", retry_interval=0.001)
+    generator.delay = 0.1
+    session_id = await session_service.create_session("user-1")
+
+    turn = asyncio.create_task(chat._run_turn(MessageRequest(message="hi", session_id=session_id, user_id="user-1")))
+    await asyncio.sleep(0.02)
+    ended = await chat.end_session(EndSessionRequest(session_id=session_id), current_user={})
+
+    assert ended.status == "ended" and turn.done()
+    session = await redis_client.get_session(session_id)
+    assert session["status"] == "ended"
+    assert [m["content"] for m in session["messages"]] == ["hi", "reply to hi"]
@@ -0,0 +1,44 @@
+import json
+import pytest
+from app.db.redis import redis_client
+from app.schemas.chat import MessageRole
+from app.services.session_service import session_service
+
+pytestmark = pytest.mark.usefixtures("fake_redis")
+
+def _legacy(session_id: str, *contents: str) -> dict:
+    return {
+        "session_id": session_id,
+        "user_id": "alice",
+        "user": None,
+        "started_at": "2024-01-01T00:00:00",
+        "status": "active",
+        "messages": [{"role": "user", "content": content} for content in contents],
+    }
+
+@pytest.mark.asyncio
+async def test_legacy_session_is_migrated_on_first_read():
+    await redis_client.redis.set("session:old", json.dumps(_legacy("old", "a", "b")), ex=600)
+
+    meta = await redis_client.get_session_meta("old")
+
+    assert meta["user_id"] == "alice" and "messages" not in meta
+    assert [m["content"] for m in await redis_client.get_messages("old")] == ["a", "b"]
+    assert not await redis_client.redis.exists("session:old")
+    # The blob's remaining TTL carries over
+    assert 0 < await redis_client.redis.ttl(redis_client._meta_key("old")) <= 600
+
+@pytest.mark.asyncio
+async def test_appending_to_a_legacy_session_migrates_it_first():
+    await redis_client.redis.set("session:old", json.dumps(_legacy("old", "a")))
+
+    message = await session_service.add_message("old", MessageRole.USER, "b")
+
+    assert message["content"] == "b"
+    assert [m["content"] for m in await redis_client.get_messages("old")] == ["a", "b"]
+    assert (await redis_client.get_session_meta("old"))["status"] == "active"
+
+@pytest.mark.asyncio
+async def test_appending_to_a_missing_session_leaves_nothing_behind():
+    assert await session_service.add_message("missing", MessageRole.USER, "hi") is None
+    assert await redis_client.redis.keys("session:missing*") == []
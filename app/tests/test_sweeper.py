@@ -0,0 +1,79 @@
+import asyncio
+import time
+import pytest
+from app.api.endpoints import chat
+from app.db.mongodb import get_database, CHAT_SESSIONS_COLLECTION
+from app.db.redis import redis_client, ACTIVITY_KEY, ARCHIVE_QUEUE_KEY
+from app.schemas.chat import MessageRequest, MessageRole
+from app.services.archiver import session_archiver
+from app.services.session_lock import SessionLockManager
+from app.services.session_service import session_service
+from app.services.sweeper import IdleSessionSweeper
+
+class SlowGenerator:
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def generate_reply(self, message, conversation_history=None, user_info=None, **kwargs):
+        await asyncio.sleep(self.delay)
+        return f"reply to {message}", "bypass"
+
+@pytest.fixture
+def sweeper(fake_redis, fake_mongo):
+    # Every session counts as idle
+    return IdleSessionSweeper(idle_timeout=-5, batch_size=10)
+
+async def _idle_for(seconds: float, user_id: str = "alice") -> str:
+    session_id = await session_service.create_session(user_id)
+    await redis_client.redis.zadd(ACTIVITY_KEY, {session_id: time.time() - seconds})
+    return session_id
+
+@pytest.mark.asyncio
+async def test_sweeps_idle_sessions_in_batches(fake_redis):
+    sweeper = IdleSessionSweeper(idle_timeout=60, batch_size=2)
+    idle = {await _idle_for(120) for _ in range(5)}
+    recent = await _idle_for(10)
+
+    assert await sweeper.sweep() == 5
+    assert {member.decode() for member in await fake_redis.zrange(ARCHIVE_QUEUE_KEY, 0, -1)} == idle
+    assert [member.decode() for member in await fake_redis.zrange(ACTIVITY_KEY, 0, -1)] == [recent]
+    for session_id in idle:
+        meta = await redis_client.get_session_meta(session_id)
+        assert meta["status"] == "ended" and meta["end_reason"] == "idle"
+        assert 0 < await fake_redis.ttl(redis_client._meta_key(session_id))
+    assert (await redis_client.get_session_meta(recent))["status"] == "active"
+    assert await sweeper.sweep() == 0
+
+@pytest.mark.asyncio
+async def test_sessions_gone_from_redis_are_dropped_not_queued(fake_redis):
+    sweeper = IdleSessionSweeper(idle_timeout=60)
+    expired = await _idle_for(120)
+    await fake_redis.delete(redis_client._meta_key(expired))
+    assert await session_service.add_message("never-existed", MessageRole.USER, "hi") is None
+
+    assert await sweeper.sweep() == 0
+    assert await fake_redis.zcard(ACTIVITY_KEY) == 0
+    assert await fake_redis.zcard(ARCHIVE_QUEUE_KEY) == 0
+
+@pytest.mark.asyncio
+async def test_session_with_a_turn_in_flight_is_not_swept(sweeper, monkeypatch):
+    monkeypatch.setattr(chat, "gemini_service", SlowGenerator(delay=0.2))
+    monkeypatch.setattr(chat, "session_locks", SessionLockManager(policy="queue", lease_seconds=5))
+    session_id = await session_service.create_session("alice")
+
+    turn = asyncio.create_task(chat._run_turn(MessageRequest(message="hi", session_id=session_id, user_id="alice")))
+    await asyncio.sleep(0.05)
+    assert await sweeper.sweep() == 0
+    assert await session_archiver.flush() == 0
+    response, _ = await turn
+
+    assert response.reply == "reply to hi"
+    assert [m["content"] for m in await redis_client.get_messages(session_id)] == ["hi", "reply to hi"]
+
+    # Once the turn is done the session is swept and archived with both messages
+    assert await sweeper.sweep() == 1
+    assert await session_archiver.flush() == 1
+    archived = await get_database()[CHAT_SESSIONS_COLLECTION].find_one({"session_id": session_id})
+    assert archived["status"] == "ended" and archived["end_reason"] == "idle"
+    assert [m["content"] for m in archived["messages"]] == ["hi", "reply to hi"]
+    assert not await redis_client.exists(session_id)
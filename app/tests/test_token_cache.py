@@ -0,0 +1,43 @@
+from datetime import timedelta
+from app.core import security
+from app.core.security import TokenCache, create_access_token
+
+def test_hit_returns_copy_of_payload():
+    cache = TokenCache(max_size=10, max_ttl=300)
+    cache.put("token", {"sub": "u", "exp": 2_000}, now=1_000)
+
+    payload = cache.get("token", now=1_100)
+    payload["sub"] = "tampered"
+
+    assert cache.get("token", now=1_100) == {"sub": "u", "exp": 2_000}
+    assert cache.stats()["hits"] == 2
+
+def test_entry_is_not_served_at_or_after_exp():
+    cache = TokenCache(max_size=10, max_ttl=300)
+    cache.put("token", {"sub": "u", "exp": 1_050}, now=1_000)
+
+    assert cache.get("token", now=1_049) is not None
+    assert cache.get("token", now=1_050) is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+def test_max_ttl_caps_long_lived_tokens_and_lru_bounds_size():
+    cache = TokenCache(max_size=2, max_ttl=60)
+    cache.put("a", {"exp": 10_000}, now=1_000)
+    assert cache.get("a", now=1_061) is None
+
+    for token in ("a", "b", "c"):
+        cache.put(token, {"exp": 10_000}, now=1_000)
+    assert cache.get("a", now=1_001) is None
+    assert cache.get("c", now=1_001) is not None
+
+def test_verify_token_cached_skips_decode_on_repeat(monkeypatch):
+    monkeypatch.setattr(security, "token_cache", TokenCache(max_size=10, max_ttl=300))
+    token = create_access_token({"sub": "u"}, expires_delta=timedelta(minutes=5))
+    calls = []
+    real_verify = security.verify_token
+    monkeypatch.setattr(security, "verify_token", lambda t: calls.append(t) or real_verify(t))
+
+    assert security.verify_token_cached(token)["sub"] == "u"
+    assert security.verify_token_cached(token)["sub"] == "u"
+    assert security.verify_token_cached("not-a-token") is None
+    assert len(calls) == 2
@@ -0,0 +1,94 @@
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.middleware import TracingMiddleware
+from app.core import tracing
+from app.core.tracing import TraceExporter, inject, parse_traceparent, span, start_trace, to_otlp, traced
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+def test_parse_traceparent():
+    assert parse_traceparent(TRACEPARENT) == ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True)
+    assert parse_traceparent("00-" + "0" * 32 + "-b7ad6b7169203331-01") is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(None) is None
+
+@pytest.mark.asyncio
+async def test_spans_nest_and_continue_the_callers_trace():
+    trace = start_trace(TRACEPARENT)
+
+    @traced("session.load")
+    async def load():
+        with span("session.history"):
+            return inject({})
+
+    with span("HTTP POST") as root:
+        headers = await load()
+
+    assert trace.sampled and trace.root is root
+    history, loaded, _ = trace.spans
+    assert root.parent_id == "b7ad6b7169203331"
+    assert loaded.parent_id == root.span_id and history.parent_id == loaded.span_id
+    # Outbound calls continue from the innermost open span
+    assert headers["traceparent"] == f"00-{trace.trace_id}-{history.span_id}-01"
+
+    timing = trace.server_timing()
+    assert timing.startswith("session-history;dur=") and "session-load;dur=" in timing
+    assert "HTTP" not in timing
+
+    body = to_otlp([trace])
+    exported = body["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert {item["traceId"] for item in exported} == {trace.trace_id}
+    assert [item["kind"] for item in exported] == [1, 1, 2]
+
+@pytest.mark.asyncio
+async def test_file_exporter_writes_sampled_traces_only(tmp_path):
+    exporter = TraceExporter(exporter="file", path=str(tmp_path / "traces.jsonl"))
+    kept = start_trace(TRACEPARENT)
+    with span("HTTP GET"):
+        pass
+    dropped = start_trace("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00")
+    dropped.sampled = False
+
+    exporter.submit(kept)
+    exporter.submit(dropped)
+    await exporter.flush()
+
+    lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+    assert len(lines) == 1 and exporter.exported == 1
+    assert json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] == "HTTP GET"
+
+@pytest.mark.asyncio
+async def test_stop_survives_an_unreachable_collector(monkeypatch):
+    exporter = TraceExporter(exporter="otlp", endpoint="http://collector.invalid/v1/traces")
+
+    async def refused(body):
+        raise ConnectionError("connection refused")
+    monkeypatch.setattr(exporter, "_post", refused)
+    exporter.start()
+    exporter.submit(start_trace(TRACEPARENT))
+
+    await exporter.stop()
+    assert exporter.exported == 0 and exporter.dropped == 1
+
+def test_middleware_sets_server_timing(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(tracing.trace_exporter, "submit", submitted.append)
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        with span("auth.jwt"):
+            pass
+        return {"ok": True}
+
+    with TestClient(app) as client:
+        response = client.get("/ping", headers={"traceparent": TRACEPARENT})
+
+    assert response.headers["Server-Timing"].startswith("auth-jwt;dur=")
+    trace = submitted[0]
+    assert trace.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert trace.root.name == "HTTP GET /ping"
+    assert trace.root.attributes["http.status_code"] == 200
@@ -0,0 +1,58 @@
+"""Per-request cost of get_current_user with the verified-token cache on and off.
+
+A pool of distinct tokens is reused across requests, the way clients
+resend the same bearer token for every message.
+
+    python -m benchmarks.auth --requests 20000 --tokens 100
+"""
+from benchmarks import common
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import timedelta
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.api.dependencies import get_current_user
+from app.core import security
+
+async def run(requests: int, tokens: int, cache_size: int) -> dict:
+    security.token_cache = security.TokenCache(cache_size, max_ttl=300)
+    pool = [
+        HTTPAuthorizationCredentials(
+            scheme="Bearer",
+            credentials=security.create_access_token(
+                {"sub": f"user-{i}", "userId": str(i)}, expires_delta=timedelta(hours=1)
+            )
+        )
+        for i in range(tokens)
+    ]
+    rng = random.Random(1)
+    samples = []
+    for _ in range(requests):
+        credentials = rng.choice(pool)
+        started = time.perf_counter()
+        await get_current_user(credentials)
+        samples.append(time.perf_counter() - started)
+
+    return {
+        "cache_size": cache_size,
+        **common.summarize(samples),
+        **({"cache_stats": security.token_cache.stats()} if cache_size else {}),
+    }
+
+async def main(args):
+    results = [
+        await run(args.requests, args.tokens, cache_size=0),
+        await run(args.requests, args.tokens, cache_size=args.cache_size),
+    ]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    asyncio.run(main(parser.parse_args()))
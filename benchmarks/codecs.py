@@ -0,0 +1,102 @@
+"""Stored size and encode/decode cost of session payloads per codec.
+
+A session is stored as one encoded value per message plus one per
+metadata field, so that is what gets measured. Codecs whose optional
+package is missing are skipped.
+
+    python -m benchmarks.codecs --lengths 10 100 1000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+# Imported for its side effect: it fills in the settings app.* needs
+from benchmarks import common  # noqa: F401
+from app.db.codec import Codec, CodecError
+from app.services.prompt_builder import estimate_tokens
+
+CODECS = [
+    ("json", "none"),
+    ("orjson", "none"),
+    ("msgpack", "none"),
+    ("json", "zlib"),
+    ("orjson", "zstd"),
+    ("msgpack", "zstd"),
+]
+
+USER = {
+    "firstName": "Sara",
+    "lastName": "Ahmed",
+    "weight": 68.5,
+    "weightGoal": 62.0,
+    "height": 170.0,
+    "fitnessLevel": "intermediate",
+    "fitnessGoal": "lose fat",
+    "healthCondition": "asthma",
+}
+
+WORDS = "protein squat recovery sleep calories cardio mobility hydration plan week reps sets".split()
+
+def make_session(length: int, rng: random.Random):
+    meta = {
+        "session_id": "0b6c1f7e-8f4e-4b0e-9d7a-2f1f6c8a9b10",
+        "user_id": "user-123",
+        "user": USER,
+        "started_at": datetime.utcnow().isoformat(),
+        "status": "active",
+    }
+    messages = []
+    for i in range(length):
+        user_turn = i % 2 == 0
+        content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40) if user_turn else rng.randint(80, 400)))
+        messages.append({
+            "role": "user" if user_turn else "assistant",
+            "content": content,
+            "tokens": estimate_tokens(content),
+            "timestamp": datetime.utcnow().isoformat(),
+            "user": USER if user_turn else None,
+        })
+    return meta, messages
+
+def measure(codec: Codec, meta, messages, repeat: int):
+    values = list(meta.values()) + messages
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encoded = [codec.encode(value) for value in values]
+    encode_time = (time.perf_counter() - started) / repeat
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in encoded:
+            codec.decode(item)
+    decode_time = (time.perf_counter() - started) / repeat
+
+    return {
+        "codec": codec.name,
+        "bytes": sum(len(item) for item in encoded),
+        "encode_ms": encode_time * 1000,
+        "decode_ms": decode_time * 1000,
+    }
+
+def main(args):
+    rng = random.Random(7)
+    results = []
+    for length in args.lengths:
+        meta, messages = make_session(length, rng)
+        for fmt, compression in CODECS:
+            try:
+                codec = Codec(fmt, compression, args.threshold)
+            except CodecError as e:
+                print(f"skipping {fmt}+{compression}: {e}")
+                continue
+            results.append({"messages": length, **measure(codec, meta, messages, args.repeat)})
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--threshold", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
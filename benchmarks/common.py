@@ -0,0 +1,48 @@
+"""Helpers shared by the benchmark scripts.
+
+Benchmarks run in-process against local stand-ins, so importing this
+module fills in the settings that are otherwise required from the
+environment.
+"""
+import os
+import statistics
+from typing import Dict, List, Optional
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-gemini-key")
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples``"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+async def make_redis(url: Optional[str] = None):
+    """A real Redis connection if ``url`` is given, otherwise fakeredis"""
+    if url:
+        import redis.asyncio as redis
+        return await redis.from_url(url, decode_responses=False)
+
+    import fakeredis
+    return fakeredis.FakeAsyncRedis(decode_responses=False)
+
+def make_mongo(url: Optional[str] = None):
+    """A Motor client for ``url`` if given, otherwise an in-memory mongomock one"""
+    if url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        return AsyncIOMotorClient(url)
+
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()
@@ -0,0 +1,343 @@
+"""In-process load test of the chat API against local stand-ins.
+
+The ASGI app runs in this process behind httpx's ASGI transport, with
+fakeredis (or --redis-url), an in-memory Mongo (or --mongo-url) and a
+fake LLM whose latency is drawn from --llm-latency. Workers drive a
+weighted mix of operations at fixed concurrency; per-route throughput
+and latency percentiles are printed as JSON and optionally saved, and
+two saved runs can be compared to flag regressions.
+
+    python -m benchmarks.load run --concurrency 32 --requests 2000 --out base.json
+    python -m benchmarks.load compare base.json new.json --threshold 10
+"""
+from benchmarks import common
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from app.core.security import create_access_token
+from app.db.mongodb import CHAT_SESSIONS_COLLECTION, ensure_indexes, mongodb
+from app.db.redis import redis_client
+from app.main import app
+from app.schemas.chat import MessageRole
+from app.services.archiver import session_archiver
+from app.services.gemini_service import gemini_service
+from app.services.llm_provider import GeminiProvider
+from app.services.rate_limiter import rate_limiter
+from app.services.session_service import session_service
+
+BENCH_DB = "chat_benchmark"
+DEFAULT_MIX = "new=2,turn=8,long=2,stream=2,list=3,end=1"
+
+USER = {"firstName": "Sara", "fitnessLevel": "intermediate", "fitnessGoal": "lose fat"}
+WORDS = "protein squat recovery sleep calories cardio mobility hydration plan week reps sets".split()
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Seconds sampler from "fixed:S", "uniform:LO:HI" or "lognormal:MEDIAN:SIGMA" """
+    kind, *params = spec.split(":")
+    try:
+        values = [float(p) for p in params]
+        if kind == "fixed" and len(values) == 1:
+            return lambda rng: values[0]
+        if kind == "uniform" and len(values) == 2:
+            return lambda rng: rng.uniform(values[0], values[1])
+        if kind == "lognormal" and len(values) == 2:
+            mu = math.log(values[0])
+            return lambda rng: rng.lognormvariate(mu, values[1])
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency spec '{spec}'")
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}', expected one of {sorted(OPERATIONS)}")
+        mix[name] = float(weight)
+    return mix
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel; sleeps instead of calling the API.
+
+    Called from the service's executor threads, so the shared RNG is locked.
+    A streamed reply spreads the sampled latency evenly over its chunks.
+    """
+
+    def __init__(self, latency: Callable[[random.Random], float], reply_words: int = 120, chunks: int = 8, seed: int = 0):
+        self.latency = latency
+        self.reply_words = reply_words
+        self.chunks = chunks
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, stream: bool = False, request_options: dict = None):
+        with self._lock:
+            total = self.latency(self._rng)
+            text = " ".join(self._rng.choice(WORDS) for _ in range(self.reply_words))
+        if not stream:
+            time.sleep(total)
+            return SimpleNamespace(text=text)
+        return self._stream(text, total)
+
+    def _stream(self, text: str, total: float):
+        words = text.split(" ")
+        step = max(1, len(words) // self.chunks)
+        pieces = [" ".join(words[i:i + step]) + " " for i in range(0, len(words), step)]
+        for piece in pieces:
+            time.sleep(total / len(pieces))
+            yield SimpleNamespace(text=piece)
+
+class Worker:
+    """One virtual user issuing operations back to back"""
+
+    def __init__(self, index: int, client: httpx.AsyncClient, user_id: str, token: str, long_session: Optional[str], seed: int):
+        self.index = index
+        self.client = client
+        self.user_id = user_id
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.long_session = long_session
+        self.session_id: Optional[str] = None
+        self.rng = random.Random(seed)
+
+    def _message(self) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(5, 30))) + "?"
+
+    async def _post_message(self, session_id: Optional[str]) -> httpx.Response:
+        body = {"message": self._message(), "user_id": self.user_id, "user": USER}
+        if session_id:
+            body["session_id"] = session_id
+        return await self.client.post("/chat/message", json=body, headers=self.headers)
+
+    async def new(self) -> int:
+        response = await self._post_message(None)
+        if response.status_code == 200:
+            self.session_id = response.json()["session_id"]
+        return response.status_code
+
+    async def turn(self) -> int:
+        return (await self._post_message(self.session_id)).status_code
+
+    async def long(self) -> int:
+        return (await self._post_message(self.long_session)).status_code
+
+    async def stream(self) -> int:
+        body = {"message": self._message(), "user_id": self.user_id, "session_id": self.session_id, "user": USER}
+        response = await self.client.post("/chat/message/stream", json=body, headers=self.headers)
+        # An LLM failure mid-stream still answers 200; count it as an error
+        if response.status_code == 200 and "event: error" in response.text:
+            return 599
+        return response.status_code
+
+    async def list(self) -> int:
+        response = await self.client.get(f"/chat/sessions/{self.user_id}", params={"limit": 20}, headers=self.headers)
+        return response.status_code
+
+    async def end(self) -> int:
+        response = await self.client.post("/chat/end", json={"session_id": self.session_id}, headers=self.headers)
+        self.session_id = None
+        return response.status_code
+
+OPERATIONS = {"new", "turn", "long", "stream", "list", "end"}
+# Operations on the worker's current session start one first if it has none
+NEEDS_SESSION = {"turn", "stream", "end"}
+
+async def _seed(users: List[str], long_sessions: int, long_turns: int, archived: int) -> List[str]:
+    """Long-running sessions in Redis and already-archived ones in Mongo"""
+    session_ids = []
+    for i in range(long_sessions):
+        session_id = await session_service.create_session(users[i % len(users)])
+        for n in range(long_turns):
+            turn = await session_service.load_turn(session_id, history_limit=0)
+            turn.add_message(MessageRole.USER, f"question {n} " + "x" * 200)
+            turn.add_message(MessageRole.ASSISTANT, f"answer {n} " + "y" * 800)
+            await turn.commit()
+        session_ids.append(session_id)
+
+    started = datetime.utcnow() - timedelta(days=30)
+    documents = [
+        {
+            "session_id": f"archived-{user_id}-{n}",
+            "user_id": user_id,
+            "user": USER,
+            "started_at": (started + timedelta(minutes=n)).isoformat(),
+            "ended_at": (started + timedelta(minutes=n + 5)).isoformat(),
+            "status": "ended",
+            "messages": [{"role": "user", "content": "hello"}, {"role": "assistant", "content": "hi"}],
+        }
+        for user_id in users
+        for n in range(archived)
+    ]
+    if documents:
+        await mongodb.database[CHAT_SESSIONS_COLLECTION].insert_many(documents)
+    return session_ids
+
+async def _setup(args):
+    redis_client.redis = await common.make_redis(args.redis_url)
+    await redis_client.redis.flushdb()
+    mongodb.client = common.make_mongo(args.mongo_url)
+    mongodb.database = mongodb.client[BENCH_DB]
+    await mongodb.database[CHAT_SESSIONS_COLLECTION].drop()
+    await ensure_indexes()
+    # Every worker is one user hammering the API; limits would dominate
+    rate_limiter.enabled = False
+    gemini_service.provider = GeminiProvider(FakeModel(parse_latency(args.llm_latency), seed=args.seed))
+    session_archiver.start()
+
+async def _teardown():
+    await session_archiver.stop()
+    await redis_client.disconnect()
+    mongodb.client.close()
+
+async def run(args) -> Dict:
+    mix = parse_mix(args.mix)
+    await _setup(args)
+    users = [f"bench-user-{i}" for i in range(args.users)]
+    long_sessions = await _seed(users, args.concurrency if "long" in mix else 0, args.long_turns, args.archived)
+    names, weights = list(mix), list(mix.values())
+
+    samples: Dict[str, List[float]] = {}
+    statuses: Dict[str, Dict[str, int]] = {}
+    remaining = args.requests
+
+    async def drive(worker: Worker):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            name = worker.rng.choices(names, weights)[0]
+            if name in NEEDS_SESSION and worker.session_id is None:
+                name = "new"
+            started = time.perf_counter()
+            code = await getattr(worker, name)()
+            samples.setdefault(name, []).append(time.perf_counter() - started)
+            counts = statuses.setdefault(name, {})
+            counts[str(code)] = counts.get(str(code), 0) + 1
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            workers = [
+                Worker(
+                    i, client, users[i % len(users)],
+                    create_access_token({"sub": users[i % len(users)]}, expires_delta=timedelta(hours=1)),
+                    long_sessions[i] if long_sessions else None,
+                    seed=args.seed + i
+                )
+                for i in range(args.concurrency)
+            ]
+            started = time.perf_counter()
+            await asyncio.gather(*(drive(worker) for worker in workers))
+            wall = time.perf_counter() - started
+    finally:
+        await _teardown()
+
+    routes = {}
+    for name, latencies in sorted(samples.items()):
+        errors = sum(count for code, count in statuses[name].items() if not code.startswith("2"))
+        routes[name] = {
+            **common.summarize(latencies),
+            "throughput_rps": len(latencies) / wall,
+            "errors": errors,
+            "statuses": statuses[name],
+        }
+    return {
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "mix": args.mix,
+            "llm_latency": args.llm_latency,
+            "users": args.users,
+            "long_turns": args.long_turns,
+            "archived": args.archived,
+            "seed": args.seed,
+            "redis": "server" if args.redis_url else "fakeredis",
+            "mongo": "server" if args.mongo_url else "mongomock",
+        },
+        "wall_seconds": wall,
+        "throughput_rps": args.requests / wall,
+        "routes": routes,
+    }
+
+def compare(baseline: Dict, current: Dict, threshold: float, min_delta_ms: float = 1.0) -> Dict:
+    """Per-route changes from ``baseline`` to ``current``, with regressions flagged.
+
+    A route regresses when its p95 or p99 grows, or its throughput falls, by
+    more than ``threshold`` percent, or its error rate rises by more than one
+    point. Latency changes under ``min_delta_ms`` are treated as noise.
+    """
+    routes, regressions = {}, []
+    for name in sorted(set(baseline["routes"]) & set(current["routes"])):
+        before, after = baseline["routes"][name], current["routes"][name]
+        change = {}
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            change[key] = {
+                "before": before[key],
+                "after": after[key],
+                "change_pct": (after[key] - before[key]) / before[key] * 100 if before[key] else 0.0,
+            }
+        for key in ("p95_ms", "p99_ms"):
+            if change[key]["change_pct"] > threshold and after[key] - before[key] >= min_delta_ms:
+                regressions.append(f"{name}: {key} {before[key]:.1f} -> {after[key]:.1f}")
+        if change["throughput_rps"]["change_pct"] < -threshold:
+            regressions.append(
+                f"{name}: throughput {before['throughput_rps']:.1f} -> {after['throughput_rps']:.1f} rps"
+            )
+        error_rates = [r["errors"] / r["count"] if r["count"] else 0.0 for r in (before, after)]
+        if error_rates[1] - error_rates[0] > 0.01:
+            regressions.append(f"{name}: error rate {error_rates[0]:.1%} -> {error_rates[1]:.1%}")
+        routes[name] = change
+    if baseline["config"] != current["config"]:
+        print("Warning: runs used different configurations", file=sys.stderr)
+    return {"routes": routes, "regressions": regressions}
+
+async def main(args):
+    result = await run(args)
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Drive the workload and report per-route latency")
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--requests", type=int, default=2000)
+    run_parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights, e.g. " + DEFAULT_MIX)
+    run_parser.add_argument("--llm-latency", default="lognormal:0.3:0.5", help="fixed:S, uniform:LO:HI or lognormal:MEDIAN:SIGMA")
+    run_parser.add_argument("--users", type=int, default=100)
+    run_parser.add_argument("--long-turns", type=int, default=200, help="Turns already in each long session")
+    run_parser.add_argument("--archived", type=int, default=50, help="Archived sessions per user in Mongo")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--redis-url", default=None)
+    run_parser.add_argument("--mongo-url", default=None)
+    run_parser.add_argument("--out", default=None, help="Also write the result JSON here")
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions between two saved runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="Allowed change in percent")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=1.0)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        asyncio.run(main(args))
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        report = compare(baseline, current, args.threshold, args.min_delta_ms)
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if report["regressions"] else 0)
@@ -0,0 +1,64 @@
+"""Chat-turn Redis latency with the hot-session cache on and off.
+
+Each turn is the send_message storage path under the default queue lock
+policy: take the session lock, load_turn with its fence (a cache hit
+still costs one round trip to check the version), commit two messages
+and release the lock. fakeredis has no network round trip, so use
+--redis-url against a real server for representative numbers.
+
+    python -m benchmarks.session_cache --sessions 50 --turns 2000
+"""
+from benchmarks import common
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from app.db.redis import redis_client
+from app.schemas.chat import MessageRole
+from app.services.session_service import session_service
+
+LEASE_MS = 30_000
+
+async def run(sessions: int, turns: int, cache: bool, redis_url: str = None) -> dict:
+    redis_client.redis = await common.make_redis(redis_url)
+    await redis_client.redis.flushdb()
+    redis_client.cache = None
+    if cache:
+        redis_client.enable_cache()
+
+    session_ids = [await session_service.create_session(f"user-{i}") for i in range(sessions)]
+    rng = random.Random(42)
+    samples = []
+    for i in range(turns):
+        session_id = rng.choice(session_ids)
+        started = time.perf_counter()
+        fence = await redis_client.acquire_lock(session_id, LEASE_MS)
+        turn = await session_service.load_turn(session_id, fence=fence)
+        turn.add_message(MessageRole.USER, f"question {i} " + "x" * 200)
+        turn.add_message(MessageRole.ASSISTANT, f"answer {i} " + "y" * 800)
+        await turn.commit()
+        await redis_client.release_lock(session_id, fence)
+        samples.append(time.perf_counter() - started)
+
+    result = {"cache": cache, **common.summarize(samples)}
+    if redis_client.cache:
+        result["cache_stats"] = redis_client.cache.stats()
+    await redis_client.disconnect()
+    redis_client.cache = None
+    return result
+
+async def main(args):
+    results = [
+        await run(args.sessions, args.turns, cache=False, redis_url=args.redis_url),
+        await run(args.sessions, args.turns, cache=True, redis_url=args.redis_url),
+    ]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--redis-url", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,214 @@
+"""How SessionService's Redis-backed methods scale with session length.
+
+For every combination of --lengths (messages already in the session) and
+--sizes (characters per message) this measures each method's latency,
+the bytes it moves over the Redis connection, and the session's Redis
+memory. Memory comes from MEMORY USAGE on a real server; fakeredis lacks
+the command, so there it is estimated from the stored payload sizes.
+Results are tabulated per method and can be saved as JSON to serve as
+the baseline for storage layout changes.
+
+    python -m benchmarks.session_scaling --lengths 50 500 5000 --sizes 200 2000
+"""
+from benchmarks import common
+import argparse
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from app.db.redis import redis_client
+from app.schemas.chat import MessageRole, UserInfo
+from app.services.session_service import _build_message, session_service
+
+USER = UserInfo(firstName="Sara", fitnessLevel="intermediate", fitnessGoal="lose fat")
+
+class ByteMeter:
+    """Counts bytes written to and payload bytes read from Redis connections"""
+
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+
+    def reset(self):
+        self.sent = self.received = 0
+
+    def install(self, client):
+        """Swap the client's connection class for a counting subclass (before first use)"""
+        meter = self
+        pool = client.connection_pool
+
+        class CountingConnection(pool.connection_class):
+            async def send_packed_command(self, command, *args, **kwargs):
+                chunks = [command] if isinstance(command, (bytes, str)) else command
+                meter.sent += sum(len(chunk) for chunk in chunks)
+                return await super().send_packed_command(command, *args, **kwargs)
+
+            async def read_response(self, *args, **kwargs):
+                response = await super().read_response(*args, **kwargs)
+                meter.received += _payload_size(response)
+                return response
+
+        pool.connection_class = CountingConnection
+
+def _payload_size(value) -> int:
+    """Bytes of data in a decoded reply; framing overhead is not counted"""
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_payload_size(k) + _payload_size(v) for k, v in value.items())
+    return 8 if value is not None else 0
+
+async def _populate(user_id: str, length: int, size: int, batch: int = 500) -> str:
+    session_id = await session_service.create_session(user_id, USER)
+    for start in range(0, length, batch):
+        messages = [
+            _build_message(
+                MessageRole.USER if n % 2 == 0 else MessageRole.ASSISTANT,
+                f"message {n} " + "x" * size,
+                USER if n % 2 == 0 else None
+            )
+            for n in range(start, min(length, start + batch))
+        ]
+        await redis_client.append_messages(session_id, messages)
+    return session_id
+
+async def _memory(session_id: str) -> Dict:
+    keys = [redis_client._meta_key(session_id), redis_client._messages_key(session_id)]
+    try:
+        used = sum([await redis_client.redis.memory_usage(key, samples=0) or 0 for key in keys])
+        return {"memory_bytes": used, "memory_source": "MEMORY USAGE"}
+    except Exception:
+        items = await redis_client.redis.lrange(keys[1], 0, -1)
+        meta = await redis_client.redis.hgetall(keys[0])
+        return {"memory_bytes": _payload_size(items) + _payload_size(meta), "memory_source": "estimate"}
+
+async def _trim(session_id: str, count: int):
+    """Undo a measured append so the session length stays fixed"""
+    await redis_client.redis.rpop(redis_client._messages_key(session_id), count)
+
+def _operations(size: int) -> Dict[str, Callable[[str], Awaitable[int]]]:
+    """Measured operations; each returns how many messages it appended"""
+    content = "y" * size
+
+    async def add_message(session_id):
+        await session_service.add_message(session_id, MessageRole.USER, content, USER)
+        return 1
+
+    async def load_turn(session_id):
+        await session_service.load_turn(session_id)
+        return 0
+
+    async def turn_commit(session_id):
+        turn = await session_service.load_turn(session_id)
+        turn.add_message(MessageRole.USER, content, USER)
+        turn.add_message(MessageRole.ASSISTANT, content)
+        await turn.commit()
+        return 2
+
+    async def get_session(session_id):
+        await session_service.get_session(session_id)
+        return 0
+
+    async def get_session_messages(session_id):
+        await session_service.get_session(session_id, include_messages=True)
+        return 0
+
+    async def get_conversation_history(session_id):
+        await session_service.get_conversation_history(session_id)
+        return 0
+
+    async def end_session(session_id):
+        await session_service.end_session(session_id)
+        return 0
+
+    return {
+        "add_message": add_message,
+        "load_turn": load_turn,
+        "load_turn+commit": turn_commit,
+        "get_session": get_session,
+        "get_session(include_messages)": get_session_messages,
+        "get_conversation_history": get_conversation_history,
+        "end_session": end_session,
+    }
+
+async def _measure(meter: ByteMeter, op, session_id: str) -> Dict:
+    meter.reset()
+    started = time.perf_counter()
+    appended = await op(session_id)
+    elapsed = time.perf_counter() - started
+    sample = {"seconds": elapsed, "sent": meter.sent, "received": meter.received}
+    if appended:
+        await _trim(session_id, appended)
+    return sample
+
+def _summarize(samples: List[Dict]) -> Dict:
+    return {
+        **common.summarize([s["seconds"] for s in samples]),
+        "bytes_sent": sum(s["sent"] for s in samples) / len(samples),
+        "bytes_received": sum(s["received"] for s in samples) / len(samples),
+    }
+
+async def run(lengths: List[int], sizes: List[int], repeats: int, redis_url: str = None) -> List[Dict]:
+    redis_client.redis = await common.make_redis(redis_url)
+    redis_client.cache = None
+    meter = ByteMeter()
+    meter.install(redis_client.redis)
+    await redis_client.redis.flushdb()
+
+    results = []
+    for size in sizes:
+        operations = _operations(size)
+        for length in lengths:
+            session_id = await _populate("scaling-user", length, size)
+            result = {"length": length, "size": size, **await _memory(session_id), "operations": {}}
+            for name, op in operations.items():
+                samples = []
+                for _ in range(repeats):
+                    # Ending is one-way, so each sample gets its own session
+                    target = await _populate("scaling-user", length, size) if name == "end_session" else session_id
+                    samples.append(await _measure(meter, op, target))
+                result["operations"][name] = _summarize(samples)
+            results.append(result)
+            await redis_client.redis.flushdb()
+
+    await redis_client.disconnect()
+    return results
+
+def tabulate(results: List[Dict]) -> str:
+    """One table per method: latency and bytes moved for each length and size"""
+    lines = []
+    header = f"{'length':>8} {'size':>6} {'p50 ms':>9} {'p95 ms':>9} {'sent B':>10} {'recv B':>12}"
+    for name in results[0]["operations"]:
+        lines += ["", name, header]
+        for result in results:
+            op = result["operations"][name]
+            lines.append(
+                f"{result['length']:>8} {result['size']:>6} {op['p50_ms']:>9.3f} {op['p95_ms']:>9.3f}"
+                f" {op['bytes_sent']:>10.0f} {op['bytes_received']:>12.0f}"
+            )
+    lines += ["", f"redis memory ({results[0]['memory_source']})", f"{'length':>8} {'size':>6} {'bytes':>12} {'per msg':>9}"]
+    for result in results:
+        lines.append(
+            f"{result['length']:>8} {result['size']:>6} {result['memory_bytes']:>12}"
+            f" {result['memory_bytes'] / max(1, result['length']):>9.0f}"
+        )
+    return "\n".join(lines)
+
+async def main(args):
+    results = await run(args.lengths, args.sizes, args.repeats, args.redis_url)
+    print(tabulate(results))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 2000])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--out", default=None, help="Also write the results as JSON here")
+    asyncio.run(main(parser.parse_args()))